@@ -1,12 +1,11 @@
 import streamlit as st
 import os
-import re
-from datetime import datetime
-from PIL import Image
-import io
-import base64
-from pathlib import Path
-from media_downloader import YouTubeVideoDownloader, YouTubeAudioDownloader, SoundCloudDownloader
+import uuid
+from canonical_url import canonicalizar
+from file_server import ServidorArchivos
+from job_manager import clase_descargador, GestorTrabajos, COMPLETADO, FALLIDO, EN_COLA, DESCARGANDO, POSTPROCESANDO
+from telemetry import BUFFER, METRICAS, TELEMETRIA, SumideroJSONL
+from thumbnail_cache import ANCHO_FICHA, ANCHO_VISTA_PREVIA, CacheMiniaturas
 
 # Configuración de la página
 st.set_page_config(
@@ -126,66 +125,230 @@ def main():
         """)
 
     # Crear pestañas para diferentes tipos de descarga
-    tab1, tab2, tab3 = st.tabs(["🎥 YouTube Video", "🎵 YouTube Audio", "🎧 SoundCloud"])
+    tab1, tab2, tab3, tab4 = st.tabs(["🎥 YouTube Video", "🎵 YouTube Audio", "🎧 SoundCloud", "📃 Playlist / Lote"])
 
     with tab1:
         st.markdown("### Descargar Video de YouTube")
         url_video = st.text_input("URL del video de YouTube", placeholder="https://www.youtube.com/watch?v=...", key="video_url")
+        if url_video:
+            mostrar_vista_previa("video", url_video)
         
+        fragmento_video = opciones_fragmento("video", url_video)
         if st.button("Descargar Video", type="primary", key="download_video"):
             if url_video:
-                with st.spinner("Procesando video..."):
-                    downloader = YouTubeVideoDownloader()
-                    try:
-                        video_info = downloader.descargar(url_video)
-                        if video_info:
-                            st.success("¡Video descargado exitosamente!")
-                            # Mostrar información y botón de descarga
-                            mostrar_info_archivo(video_info, "video")
-                    except Exception as e:
-                        st.error(f"Error al descargar el video: {str(e)}")
+                encolar_descarga("video", url_video, **fragmento_video)
 
     with tab2:
         st.markdown("### Descargar Audio de YouTube")
         url_audio = st.text_input("URL del video de YouTube", placeholder="https://www.youtube.com/watch?v=...", key="audio_url")
+        if url_audio:
+            mostrar_vista_previa("audio", url_audio)
         
+        fragmento_audio = opciones_fragmento("audio", url_audio)
         if st.button("Descargar Audio", type="primary", key="download_audio"):
             if url_audio:
-                with st.spinner("Procesando audio..."):
-                    downloader = YouTubeAudioDownloader()
-                    try:
-                        audio_info = downloader.descargar(url_audio)
-                        if audio_info:
-                            st.success("¡Audio descargado exitosamente!")
-                            # Mostrar información y botón de descarga
-                            mostrar_info_archivo(audio_info, "audio")
-                    except Exception as e:
-                        st.error(f"Error al descargar el audio: {str(e)}")
+                encolar_descarga("audio", url_audio, **fragmento_audio)
 
     with tab3:
         st.markdown("### Descargar Audio de SoundCloud")
         url_soundcloud = st.text_input("URL de SoundCloud", placeholder="https://soundcloud.com/...", key="soundcloud_url")
+        if url_soundcloud:
+            mostrar_vista_previa("soundcloud", url_soundcloud)
         
         if st.button("Descargar Audio", type="primary", key="download_soundcloud"):
             if url_soundcloud:
-                with st.spinner("Procesando audio de SoundCloud..."):
-                    downloader = SoundCloudDownloader()
-                    try:
-                        audio_info = downloader.descargar(url_soundcloud)
-                        if audio_info:
-                            st.success("¡Audio descargado exitosamente!")
-                            # Mostrar información y botón de descarga
-                            mostrar_info_archivo(audio_info, "audio")
-                    except Exception as e:
-                        st.error(f"Error al descargar el audio: {str(e)}")
+                encolar_descarga("soundcloud", url_soundcloud)
+
+    with tab4:
+        st.markdown("### Descargar una Playlist, un Canal o varias URLs")
+        tipo_lote = st.radio(
+            "Tipo de descarga",
+            ["video", "audio", "soundcloud"],
+            format_func={"video": "🎥 Video MP4", "audio": "🎵 Audio MP3", "soundcloud": "🎧 SoundCloud MP3"}.get,
+            horizontal=True,
+            key="lote_tipo"
+        )
+        urls_lote = st.text_area(
+            "URL de la playlist o canal, o varias URLs (una por línea)",
+            placeholder="https://www.youtube.com/playlist?list=...",
+            key="lote_urls"
+        )
+        
+        if st.button("Descargar Lote", type="primary", key="download_lote"):
+            if urls_lote.strip():
+                encolar_descarga(tipo_lote, urls_lote, lote=True)
+
+    mostrar_trabajos()
+
+@st.cache_resource
+def obtener_gestor():
+    """Gestor de trabajos compartido por todas las sesiones de la aplicación"""
+    if os.environ.get("TUBEGRAB_TELEMETRIA_JSONL"):
+        TELEMETRIA.agregar(SumideroJSONL(os.environ["TUBEGRAB_TELEMETRIA_JSONL"]))
+    gestor = GestorTrabajos(max_trabajadores=int(os.environ.get("TUBEGRAB_TRABAJADORES", "4")))
+    # Otras réplicas pueden haber caído con descargas a medias en la carpeta compartida
+    gestor.vigilar_huerfanos()
+    return gestor
+
+def opciones_fragmento(tipo, url):
+    """Campos opcionales para descargar solo un fragmento; el inicio se toma del ?t= de la URL"""
+    canonica = canonicalizar(url) if url else None
+    inicio_url = canonica.inicio if canonica else None
+    with st.expander("✂️ Descargar solo un fragmento", expanded=bool(inicio_url)):
+        col1, col2 = st.columns(2)
+        with col1:
+            inicio = st.text_input("Inicio", value=formatear_duracion(inicio_url) if inicio_url else "",
+                                   placeholder="1:30", key=f"{tipo}_inicio")
+        with col2:
+            fin = st.text_input("Fin", placeholder="2:00 (vacío = hasta el final)", key=f"{tipo}_fin")
+        corte_preciso = st.checkbox("Corte exacto al segundo (re-codifica los extremos, más lento)",
+                                    key=f"{tipo}_corte_preciso")
+    return {'inicio': inicio.strip() or None, 'fin': fin.strip() or None, 'corte_preciso': corte_preciso}
+
+def encolar_descarga(tipo, url, lote=False, **fragmento):
+    """Envía la descarga al gestor y guarda el id del trabajo en la sesión"""
+    # Identificador de la sesión para repartir los turnos de la cola entre usuarios
+    sesion = st.session_state.setdefault("sesion", uuid.uuid4().hex)
+    try:
+        trabajo_id = obtener_gestor().enviar(tipo, url, lote=lote, sesion=sesion, **fragmento)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    st.session_state.setdefault("trabajos", []).append(trabajo_id)
+    st.toast("Descarga añadida a la cola")
+
+def mostrar_vista_previa(tipo, url):
+    """Muestra título, duración y miniatura antes de descargar (y deja la descarga preparada)"""
+    downloader = clase_descargador(tipo)()
+    try:
+        with st.spinner("Obteniendo información..."):
+            info = downloader.obtener_info(url)
+    except Exception as e:
+        st.warning(f"No se pudo obtener la información: {str(e)}")
+        return
+
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        if info.get('thumbnail'):
+            st.image(miniatura(info, ANCHO_VISTA_PREVIA))
+    with col2:
+        st.markdown(f"**{info['titulo']}**")
+        detalles = [f"⏱️ {formatear_duracion(info.get('duracion'))}", f"👁️ {info['vistas']}"]
+        if info.get('autor'):
+            detalles.insert(0, f"👤 {info['autor']}")
+        st.caption(" · ".join(detalles))
+        descargados = downloader.descargados(url)
+        if descargados:
+            formatos = ", ".join(dict.fromkeys(d.get('formato', '?') for d in descargados))
+            st.caption(f"✅ Ya descargado en {formatos}")
+
+@st.cache_resource
+def obtener_miniaturas():
+    """Caché local de miniaturas redimensionadas, compartida por todas las sesiones"""
+    return CacheMiniaturas("descargas")
+
+def miniatura(info, ancho):
+    """Copia local de la miniatura al ancho pedido; la URL remota si no se pudo preparar a tiempo"""
+    if not info.get('url'):
+        return info['thumbnail']
+    return obtener_miniaturas().obtener(info['url'], ancho, remota=info['thumbnail']) or info['thumbnail']
+
+def mostrar_trabajos():
+    """Muestra los trabajos de la sesión: progreso de los activos y resultado de los terminados"""
+    trabajos = obtener_gestor().listar(st.session_state.get("trabajos", []))
+    if not trabajos:
+        return
+
+    st.markdown("---")
+    st.markdown("### 📋 Mis descargas")
+
+    activos = sum(trabajo.activo for trabajo in trabajos)
+    if activos:
+        panel_progreso(activos)
+
+    for trabajo in reversed(trabajos):
+        tipo = "video" if trabajo.tipo == "video" else "audio"
+        if trabajo.lote and not trabajo.activo:
+            mostrar_lote(trabajo, tipo)
+        elif trabajo.estado == COMPLETADO:
+            with st.expander(f"✅ {trabajo.resultado['titulo']}", expanded=True):
+                mostrar_info_archivo(trabajo.resultado, tipo)
+        elif trabajo.estado == FALLIDO:
+            reintentos = (trabajo.estadisticas or {}).get('reintentos')
+            detalle = f" (tras {reintentos} reintentos)" if reintentos else ""
+            st.error(f"Error al descargar {trabajo.url}{detalle}: {trabajo.error}")
+
+def mostrar_lote(trabajo, tipo):
+    """Muestra el resumen y los archivos de un lote terminado"""
+    completados = [e for e in trabajo.elementos if e['estado'] == 'completado']
+    omitidos = [e for e in trabajo.elementos if e['estado'] == 'omitido']
+    fallidos = [e for e in trabajo.elementos if e['estado'] == 'fallido']
+    if trabajo.estado == FALLIDO:
+        st.error(f"Error al procesar el lote: {trabajo.error}")
+    resumen = f"📃 Lote: {len(completados)} descargados, {len(omitidos)} ya descargados antes, {len(fallidos)} con error"
+    with st.expander(resumen, expanded=True):
+        for elemento in completados + omitidos:
+            mostrar_info_archivo(elemento['info'], tipo)
+        for elemento in fallidos:
+            st.error(f"{elemento.get('titulo') or elemento['url']}: {elemento['error']}")
+
+ETIQUETAS_ESTADO = {
+    EN_COLA: "⏳ En cola",
+    DESCARGANDO: "⬇️ Descargando",
+    POSTPROCESANDO: "⚙️ Procesando",
+}
+
+ETIQUETAS_PIPELINE = {
+    "sin_conversion": "Sin conversión",
+    "remux": "Cambio de contenedor (sin re-codificar)",
+    "transcodificacion": "Re-codificado",
+}
+
+@st.fragment(run_every=1)
+def panel_progreso(activos_iniciales):
+    """Refresca el progreso de los trabajos activos sin bloquear la página"""
+    gestor = obtener_gestor()
+    trabajos = gestor.listar(st.session_state.get("trabajos", []))
+    activos = [trabajo for trabajo in trabajos if trabajo.activo]
+    if len(activos) < activos_iniciales:
+        # Algún trabajo ha terminado: recargar la página para mostrar su resultado
+        st.rerun()
+
+    for trabajo in activos:
+        urls = trabajo.url.split()
+        texto = f"{ETIQUETAS_ESTADO[trabajo.estado]} · {urls[0]}{' …' if len(urls) > 1 else ''}"
+        if trabajo.estado == EN_COLA:
+            delante = gestor.posicion(trabajo.id)
+            if delante:
+                texto += f" · {delante} por delante"
+            texto += f" · esperando {trabajo.espera:.0f} s"
+        if trabajo.lote:
+            texto += f" · {len(trabajo.elementos)}/{trabajo.total_elementos or '?'} elementos"
+        if trabajo.velocidad and trabajo.estado == DESCARGANDO:
+            texto += f" · {trabajo.velocidad / 1024 / 1024:.1f} MB/s"
+        st.progress(trabajo.progreso, text=texto)
+        if trabajo.lote:
+            # Una barra por cada elemento del lote que se está descargando ahora mismo
+            for descarga in BUFFER.en_curso(trabajo=trabajo.id):
+                total = descarga.get('total') or 0
+                progreso = min((descarga.get('descargado') or 0) / total, 1.0) if total else 0.0
+                detalle = f" · {descarga['velocidad'] / 1024 / 1024:.1f} MB/s" if descarga.get('velocidad') else ""
+                st.progress(progreso, text=f"↳ {descarga['url']}{detalle}")
+
+def detalle_recorte(info):
+    """Línea de la ficha con el fragmento descargado, si no es el archivo entero"""
+    if not info.get('recorte'):
+        return ""
+    inicio, fin = info['recorte']
+    return f"\n            <p>✂️ Fragmento: {formatear_duracion(inicio) if inicio else '00:00'} – {formatear_duracion(fin) if fin else 'final'}</p>"
 
 def mostrar_info_archivo(info, tipo):
-    """Muestra la información del archivo descargado y el botón de descarga"""
+    """Muestra la información del archivo descargado, el preview y el enlace de descarga"""
     col1, col2 = st.columns([1, 2])
     
     with col1:
         if info.get('thumbnail'):
-            st.image(info['thumbnail'], caption="Miniatura")
+            st.image(miniatura(info, ANCHO_FICHA), caption="Miniatura")
     
     with col2:
         st.markdown(f"### {info['titulo']}")
@@ -194,18 +357,61 @@ def mostrar_info_archivo(info, tipo):
             <p>⏱️ Duración: {info.get('duracion', 'N/A')}</p>
             <p>👁️ Vistas: {info.get('vistas', 'N/A')}</p>
             <p>📁 Formato: {info.get('formato', 'MP3' if tipo == 'audio' else 'MP4')}</p>
+            <p>⚙️ Proceso: {ETIQUETAS_PIPELINE.get(info.get('pipeline'), 'N/A')}</p>{detalle_recorte(info)}
         </div>
         """, unsafe_allow_html=True)
         
-        if 'archivo' in info:
-            with open(info['archivo'], 'rb') as f:
-                mime_type = "audio/mp3" if tipo == "audio" else "video/mp4"
-                st.download_button(
-                    label=f"⬇️ Descargar {info.get('formato', 'MP3' if tipo == 'audio' else 'MP4')}",
-                    data=f,
-                    file_name=os.path.basename(info['archivo']),
-                    mime=mime_type
+        if 'archivo' in info and os.path.exists(info['archivo']):
+            servidor = obtener_servidor_archivos()
+            base = url_servidor_archivos(servidor)
+            if base is None:
+                # Entregarlo con st.download_button lo cargaría entero en memoria por cada usuario
+                st.warning(
+                    "El archivo está descargado, pero el servidor de archivos solo escucha en la máquina "
+                    "de la aplicación. Pon un proxy delante del puerto "
+                    f"{servidor.puerto} e indica su URL (o una ruta del mismo dominio, como `/archivos`) "
+                    "en la variable de entorno `TUBEGRAB_ARCHIVOS_URL`."
                 )
+                return
+            # El archivo se sirve por el servidor de archivos: Streamlit nunca lo carga en memoria
+            url_archivo = base + servidor.ruta_url(info['archivo'])
+            if tipo == "audio":
+                st.audio(url_archivo)
+            else:
+                st.video(url_archivo)
+            st.link_button(
+                f"⬇️ Descargar {info.get('formato', 'MP3' if tipo == 'audio' else 'MP4')}",
+                url_archivo + "?descargar=1",
+                use_container_width=True
+            )
+
+@st.cache_resource
+def obtener_servidor_archivos():
+    """Servidor HTTP con soporte de Range que entrega los archivos de la carpeta de descargas
+
+    No tiene autenticación: solo escucha fuera de esta máquina si hay un proxy en otra máquina
+    (TUBEGRAB_ARCHIVOS_URL con una URL absoluta) o se pide expresamente con TUBEGRAB_ARCHIVOS_HOST.
+    Una ruta relativa en TUBEGRAB_ARCHIVOS_URL es un proxy en el mismo dominio que la app.
+    """
+    url_publica = os.environ.get("TUBEGRAB_ARCHIVOS_URL", "")
+    host_defecto = "0.0.0.0" if "://" in url_publica else "127.0.0.1"
+    servidor = ServidorArchivos(
+        "descargas",
+        host=os.environ.get("TUBEGRAB_ARCHIVOS_HOST", host_defecto),
+        puerto=int(os.environ.get("TUBEGRAB_ARCHIVOS_PUERTO", "8502")),
+        metricas=METRICAS
+    )
+    return servidor.iniciar()
+
+def url_servidor_archivos(servidor):
+    """URL (o ruta del mismo dominio) del servidor de archivos para el navegador, o None si no puede llegar a él"""
+    url_publica = os.environ.get("TUBEGRAB_ARCHIVOS_URL")
+    if url_publica:
+        return url_publica.rstrip("/")
+    host = st.context.headers.get("Host", "localhost").split(":")[0]
+    if servidor.solo_local and host not in ("localhost", "127.0.0.1"):
+        return None
+    return f"http://{host}:{servidor.puerto}"
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""Benchmark: tiempo de arranque en frío de la aplicación web y de la línea de comandos.
+
+Importa en un intérprete nuevo los módulos que carga app.py (salvo Streamlit) y youtube_converter,
+mide con `python -X importtime` cuánto cuestan y qué módulos pesados que solo hacen falta al
+descargar (yt-dlp, tqdm, PIL, mutagen) se cargan. tests/test_arranque.py vigila que no se cargue
+ninguno; el tiempo se mide solo aquí, porque depende de la máquina.
+
+    python benchmarks/bench_arranque.py
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Solo deben importarse cuando empieza una descarga
+PESADOS = ('yt_dlp', 'tqdm', 'PIL', 'mutagen')
+# Milisegundos de importación que puede costar cada punto de entrada
+PRESUPUESTO_MS = 100.0
+
+
+def modulos_de_app():
+    """Módulos importados por app.py en el nivel superior, sin contar Streamlit."""
+    with open(os.path.join(RAIZ, 'app.py'), encoding='utf-8') as f:
+        arbol = ast.parse(f.read())
+    modulos = []
+    for nodo in arbol.body:
+        if isinstance(nodo, ast.Import):
+            modulos += [alias.name for alias in nodo.names]
+        elif isinstance(nodo, ast.ImportFrom) and nodo.module:
+            modulos.append(nodo.module)
+    return [m for m in dict.fromkeys(modulos) if m.split('.')[0] != 'streamlit']
+
+
+def medir(modulos):
+    """Importa los módulos en un proceso nuevo; devuelve (milisegundos, módulos pesados cargados)."""
+    codigo = (f"import sys, json; import {', '.join(modulos)}; "
+              f"print(json.dumps([m for m in {PESADOS!r} if m in sys.modules]))")
+    proceso = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo], cwd=RAIZ,
+                             capture_output=True, text=True, check=True)
+    microsegundos = 0
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        _, acumulado, nombre = linea[len('import time:'):].split('|')
+        # Solo las importaciones de primer nivel de los módulos pedidos (las anidadas ya van incluidas)
+        if nombre.rstrip() in {f' {m}' for m in modulos}:
+            microsegundos += int(acumulado)
+    return microsegundos / 1000, json.loads(proceso.stdout)
+
+
+def puntos_de_entrada():
+    return {
+        'app.py (sin Streamlit)': modulos_de_app(),
+        'youtube_converter.py': ['youtube_converter'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    objetivos = {**puntos_de_entrada(), 'referencia: yt_dlp': ['yt_dlp']}
+    print(f"{'punto de entrada':>26} {'ms (mín.)':>10}  pesados cargados")
+    for nombre, modulos in objetivos.items():
+        mediciones = [medir(modulos) for _ in range(args.repeticiones)]
+        milisegundos = min(ms for ms, _ in mediciones)
+        pesados = mediciones[0][1]
+        print(f"{nombre:>26} {milisegundos:>10.1f}  {', '.join(pesados) or '-'}")
+    print(f"presupuesto: {PRESUPUESTO_MS:.0f} ms por punto de entrada")
+
+
+if __name__ == '__main__':
+    main()
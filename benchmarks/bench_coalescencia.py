@@ -0,0 +1,79 @@
+"""Prueba de carga: N peticiones idénticas simultáneas que comparten una sola descarga.
+
+El servidor local de medios entrega un archivo lentamente y cuenta las peticiones que recibe;
+N hilos piden la misma URL a la vez y se informa de cuánto tardan y de cuántas peticiones recibe el
+servidor frente a una sola descarga (la comprobación está en tests/test_coalescencia.py).
+
+    python benchmarks/bench_coalescencia.py --peticiones 32
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from media_downloader import MediaDownloader  # noqa: E402
+from servidor_medios import ServidorMedios  # noqa: E402
+
+
+class DescargadorPrueba(MediaDownloader):
+    def validar_url(self, url):
+        return True
+
+    async def _descargar(self, url, intentos_maximos=1, recorte=None):
+        ydl_opts = {
+            'outtmpl': '%(title)s.%(ext)s',
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+        }
+        return await self._procesar_descarga(url, ydl_opts, intentos_maximos, recorte)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--peticiones', type=int, default=16)
+    parser.add_argument('--tamaño', type=int, default=2 * 1024 * 1024)
+    parser.add_argument('--duracion', type=float, default=1.0, help='segundos que tarda el servidor en entregar')
+    args = parser.parse_args()
+
+    servidor = ServidorMedios().iniciar()
+    # Entrega lenta para que todas las peticiones coincidan en el tiempo
+    lento = {'tamaño': args.tamaño, 'velocidad': args.tamaño / args.duracion}
+    contador = servidor.contador
+    carpeta = tempfile.mkdtemp(prefix='tubegrab-bench-')
+    eventos = []
+
+    def pedir(url):
+        downloader = DescargadorPrueba(carpeta, progreso=eventos.append)
+        return downloader.descargar(url)
+
+    try:
+        # Peticiones que genera una descarga aislada
+        with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo), contextlib.redirect_stderr(nulo):
+            pedir(servidor.url('/archivo/referencia.mp4', **lento))
+        por_descarga = contador['GET']
+        servidor.reiniciar_contador()
+
+        url = servidor.url('/archivo/video.mp4', **lento)
+        inicio = time.perf_counter()
+        with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo), contextlib.redirect_stderr(nulo):
+            with ThreadPoolExecutor(max_workers=args.peticiones) as pool:
+                resultados = list(pool.map(pedir, [url] * args.peticiones))
+        duracion = time.perf_counter() - inicio
+        archivos = {r['archivo'] for r in resultados if r}
+        print(f"{args.peticiones} peticiones en {duracion:.2f} s · GET al servidor: {contador['GET']} "
+              f"(una descarga aislada hace {por_descarga}) · "
+              f"archivos distintos: {len(archivos)} · eventos de progreso: {len(eventos)}")
+    finally:
+        servidor.cerrar()
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark: rendimiento de la descarga HLS según el número de fragmentos en paralelo.
+
+Usa el servidor local de medios con una latencia fija por petición (simulando el RTT de un CDN) y descarga la misma lista con distintos valores de fragmentos_concurrentes.
+
+    python benchmarks/bench_fragmentos.py --fragmentos 40 --latencia 0.05
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from media_downloader import MediaDownloader  # noqa: E402
+from servidor_medios import ServidorMedios  # noqa: E402
+
+
+class DescargadorBenchmark(MediaDownloader):
+    def validar_url(self, url):
+        return True
+
+    async def _descargar(self, url, intentos_maximos=1, recorte=None):
+        ydl_opts = {
+            'outtmpl': '%(id)s.%(ext)s',
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            'fixup': 'never',
+        }
+        return await self._procesar_descarga(url, ydl_opts, intentos_maximos, recorte)
+
+
+def medir(url, paralelos, total_bytes):
+    carpeta = tempfile.mkdtemp(prefix='tubegrab-bench-')
+    try:
+        downloader = DescargadorBenchmark(carpeta, cache=False, fragmentos_concurrentes=paralelos)
+        inicio = time.perf_counter()
+        with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo), contextlib.redirect_stderr(nulo):
+            downloader.descargar(url)
+        duracion = time.perf_counter() - inicio
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+    return {'paralelos': paralelos, 'segundos': duracion, 'mb_s': total_bytes / duracion / 1024 / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fragmentos', type=int, default=40)
+    parser.add_argument('--tamaño', type=int, default=256 * 1024, help='bytes por fragmento')
+    parser.add_argument('--latencia', type=float, default=0.05, help='segundos de latencia por fragmento')
+    parser.add_argument('--paralelos', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    servidor = ServidorMedios().iniciar()
+    url = servidor.url('/hls/bench/lista.m3u8', fragmentos=args.fragmentos, tamaño_fragmento=args.tamaño,
+                       latencia=args.latencia)
+    total = args.fragmentos * args.tamaño
+    print(f"{'paralelos':>10} {'segundos':>10} {'MB/s':>10}")
+    for paralelos in args.paralelos:
+        resultado = medir(url, paralelos, total)
+        print(f"{resultado['paralelos']:>10} {resultado['segundos']:>10.2f} {resultado['mb_s']:>10.1f}")
+    servidor.cerrar()
+
+
+if __name__ == '__main__':
+    main()
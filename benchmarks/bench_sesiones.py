@@ -0,0 +1,78 @@
+"""Benchmark: conexiones TCP abiertas con y sin el pool de instancias de YoutubeDL.
+
+El servidor local de medios (HTTP/1.1 con keep-alive) sirve varios archivos y cuenta las
+conexiones que acepta. Se descargan todos en secuencia (caché desactivada, para que cada uno se
+extraiga y se descargue de verdad) primero creando una instancia por descarga y después con el pool.
+
+    python benchmarks/bench_sesiones.py --descargas 20
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import media_downloader  # noqa: E402
+from media_downloader import MediaDownloader  # noqa: E402
+from servidor_medios import ServidorMedios  # noqa: E402
+from session_pool import PoolSesiones  # noqa: E402
+
+
+class DescargadorBenchmark(MediaDownloader):
+    def validar_url(self, url):
+        return True
+
+    async def _descargar(self, url, intentos_maximos=1, recorte=None):
+        ydl_opts = {
+            'outtmpl': '%(title)s.%(ext)s',
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+        }
+        return await self._procesar_descarga(url, ydl_opts, intentos_maximos, recorte)
+
+
+def medir(servidor, descargas, tamaño, pool, ronda):
+    media_downloader.POOL = pool
+    carpeta = tempfile.mkdtemp(prefix='tubegrab-bench-')
+    servidor.reiniciar_contador()
+    try:
+        downloader = DescargadorBenchmark(carpeta, cache=False, cache_info=False)
+        inicio = time.perf_counter()
+        with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo), contextlib.redirect_stderr(nulo):
+            for i in range(descargas):
+                downloader.descargar(servidor.url(f'/archivo/{ronda}-{i}.mp4', tamaño=tamaño))
+        return time.perf_counter() - inicio, dict(servidor.contador)
+    finally:
+        pool.cerrar()
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--descargas', type=int, default=20)
+    parser.add_argument('--tamaño', type=int, default=256 * 1024)
+    args = parser.parse_args()
+
+    servidor = ServidorMedios().iniciar()
+    try:
+        # max_por_perfil=0: cada instancia se cierra al devolverla, como antes del pool
+        sin_pool = medir(servidor, args.descargas, args.tamaño, PoolSesiones(max_por_perfil=0), 'sin')
+        con_pool = medir(servidor, args.descargas, args.tamaño, PoolSesiones(), 'con')
+    finally:
+        servidor.cerrar()
+
+    print(f"{'':>10} {'segundos':>9} {'peticiones':>11} {'conexiones':>11}")
+    for nombre, (segundos, cuenta) in (('sin pool', sin_pool), ('con pool', con_pool)):
+        print(f"{nombre:>10} {segundos:>9.2f} {cuenta['peticiones']:>11} {cuenta['conexiones']:>11}")
+    ok = con_pool[1]['conexiones'] < sin_pool[1]['conexiones']
+    print("✓ el pool reutiliza las conexiones" if ok else "✗ el pool no ha reducido las conexiones")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark: canonicalización masiva de URLs.
+
+Mide cuántas URLs por segundo procesa canonicalizar() sobre una lista grande generada a partir
+del corpus de variantes (el mismo que comprueba tests/test_canonical_url.py).
+
+    python benchmarks/bench_urls.py --urls 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from canonical_url import URLCanonica, canonicalizar  # noqa: E402
+
+V = 'dQw4w9WgXcQ'
+YT = lambda video_id=V, playlist_id=None, inicio=None: URLCanonica('youtube', video_id, playlist_id, inicio)  # noqa: E731
+SC = lambda track_id=None, playlist_id=None, inicio=None: URLCanonica('soundcloud', track_id, playlist_id, inicio)  # noqa: E731
+
+CORPUS = [
+    # watch
+    (f'https://www.youtube.com/watch?v={V}', YT()),
+    (f'http://www.youtube.com/watch?v={V}', YT()),
+    (f'https://youtube.com/watch?v={V}', YT()),
+    (f'www.youtube.com/watch?v={V}', YT()),
+    (f'youtube.com/watch?v={V}', YT()),
+    (f'https://m.youtube.com/watch?v={V}', YT()),
+    (f'https://music.youtube.com/watch?v={V}&feature=share', YT()),
+    (f'https://WWW.YouTube.com/watch?v={V}', YT()),
+    (f'https://www.youtube.com/watch?feature=youtu.be&v={V}', YT()),
+    (f'https://www.youtube.com/watch?v={V}&ab_channel=RickAstley', YT()),
+    (f'  https://www.youtube.com/watch?v={V}  ', YT()),
+    # youtu.be
+    (f'https://youtu.be/{V}', YT()),
+    (f'youtu.be/{V}', YT()),
+    (f'https://youtu.be/{V}?si=AbCdEfGh', YT()),
+    (f'https://youtu.be/{V}?t=42', YT(inicio=42)),
+    (f'https://youtu.be/{V}?si=x&t=1m30s', YT(inicio=90)),
+    (f'https://youtu.be/{V}/', YT()),
+    # rutas alternativas
+    (f'https://www.youtube.com/shorts/{V}', YT()),
+    (f'https://youtube.com/shorts/{V}?feature=share', YT()),
+    (f'https://www.youtube.com/embed/{V}', YT()),
+    (f'https://www.youtube.com/embed/{V}?start=30', YT(inicio=30)),
+    (f'https://www.youtube-nocookie.com/embed/{V}', YT()),
+    (f'https://www.youtube.com/live/{V}?si=abc', YT()),
+    (f'https://www.youtube.com/v/{V}', YT()),
+    (f'https://www.youtube.com/e/{V}', YT()),
+    # tiempos
+    (f'https://www.youtube.com/watch?v={V}&t=90', YT(inicio=90)),
+    (f'https://www.youtube.com/watch?v={V}&t=90s', YT(inicio=90)),
+    (f'https://www.youtube.com/watch?v={V}&t=1h2m3s', YT(inicio=3723)),
+    (f'https://www.youtube.com/watch?v={V}#t=2m', YT(inicio=120)),
+    (f'https://www.youtube.com/watch?v={V}&time_continue=15', YT(inicio=15)),
+    (f'https://www.youtube.com/watch?v={V}&t=abc', YT()),
+    # playlists y canales
+    (f'https://www.youtube.com/watch?v={V}&list=PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI',
+     YT(playlist_id='PLFgquLnL59alCl_2TQvOiD5Vgm1hCaGSI')),
+    (f'https://youtu.be/{V}?list=PLabc123', YT(playlist_id='PLabc123')),
+    ('https://www.youtube.com/playlist?list=PLabc123', YT(None, 'PLabc123')),
+    ('https://m.youtube.com/playlist?list=OLAK5uy_abc', YT(None, 'OLAK5uy_abc')),
+    ('https://music.youtube.com/playlist?list=RDCLAK5uy_x', YT(None, 'RDCLAK5uy_x')),
+    ('https://www.youtube.com/@mkbhd', YT(None, '@mkbhd')),
+    ('https://www.youtube.com/@mkbhd/videos', YT(None, '@mkbhd')),
+    ('https://www.youtube.com/channel/UCBJycsmduvYEL83R_U4JriQ', YT(None, 'channel/UCBJycsmduvYEL83R_U4JriQ')),
+    ('https://www.youtube.com/c/mkbhd', YT(None, 'c/mkbhd')),
+    ('https://www.youtube.com/user/marquesbrownlee/videos', YT(None, 'user/marquesbrownlee')),
+    # clips: válidos, pero solo los resuelve su extractor
+    ('https://www.youtube.com/clip/UgkxU2HSeGL_NvmDJ-nQJrlLwllwMDBdGZFs', YT(None)),
+    ('https://youtube.com/clip/UgkxU2HSeGL_NvmDJ-nQJrlLwllwMDBdGZFs?si=abc', YT(None)),
+    # SoundCloud
+    ('https://soundcloud.com/artista/cancion', SC('artista/cancion')),
+    ('soundcloud.com/artista/cancion', SC('artista/cancion')),
+    ('https://www.soundcloud.com/artista/cancion', SC('artista/cancion')),
+    ('https://m.soundcloud.com/artista/cancion', SC('artista/cancion')),
+    ('https://soundcloud.com/artista/cancion?in=artista/sets/album', SC('artista/cancion')),
+    ('https://soundcloud.com/artista/cancion?utm_source=clipboard&si=1', SC('artista/cancion')),
+    ('https://soundcloud.com/artista/cancion#t=1:30', SC('artista/cancion', inicio=90)),
+    ('https://soundcloud.com/artista/cancion#t=1:02:03', SC('artista/cancion', inicio=3723)),
+    ('https://soundcloud.com/artista/cancion/s-AbC123xYz', SC('artista/cancion/s-AbC123xYz')),
+    ('https://soundcloud.com/artista/cancion/s-AbC123xYz?si=1&utm_source=clipboard',
+     SC('artista/cancion/s-AbC123xYz')),
+    ('https://soundcloud.com/artista/sets/album/s-QwErTy9', SC(None, 'artista/sets/album/s-QwErTy9')),
+    ('https://soundcloud.com/artista/sets/album', SC(None, 'artista/sets/album')),
+    ('https://soundcloud.com/artista', SC(None, 'artista')),
+    ('https://soundcloud.com/artista/tracks', SC(None, 'artista/tracks')),
+    ('https://soundcloud.com/artista/likes', SC(None, 'artista/likes')),
+    ('https://on.soundcloud.com/AbC123', SC()),
+    # no soportadas
+    ('', None),
+    ('no es una url', None),
+    ('https://vimeo.com/123456', None),
+    ('https://www.youtube.com/', None),
+    ('https://www.youtube.com/watch', None),
+    ('https://www.youtube.com/watch?v=corto', None),
+    (f'https://www.youtube.com.evil.com/watch?v={V}', None),
+    (f'https://notyoutube.com/watch?v={V}', None),
+    (f'ftp://youtube.com/watch?v={V}', None),
+    ('https://soundcloud.com/', None),
+    ('https://soundcloud.com/discover', None),
+    ('https://soundcloud.com/search?q=x', None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--urls', type=int, default=200000)
+    args = parser.parse_args()
+
+    urls = [url for url, _ in random.choices(CORPUS, k=args.urls)]
+    inicio = time.perf_counter()
+    ids = {canonica.id for canonica in map(canonicalizar, urls) if canonica}
+    duracion = time.perf_counter() - inicio
+    print(f"{args.urls} URLs en {duracion:.3f} s · {args.urls / duracion:,.0f} URLs/s · {len(ids)} ids distintos")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Descargadores de TubeGrab que usan el extractor de prueba del servidor local de medios.
+
+Los comparten la suite de benchmarks y los tests.
+"""
+import yt_dlp
+
+from media_downloader import AudioDownloader, MediaDownloader, YouTubeVideoDownloader
+from retry_policy import PoliticaReintentos
+from servidor_medios import MedioFalsoIE
+
+
+class ConExtractorFalso:
+    """Registra MedioFalsoIE delante de los extractores de yt-dlp en las instancias del pool.
+
+    Por defecto reintenta con esperas cortas.
+    """
+
+    def __init__(self, carpeta_destino, **kwargs):
+        kwargs.setdefault('politica_reintentos', PoliticaReintentos(base=0.01, maximo=0.05))
+        super().__init__(carpeta_destino, **kwargs)
+
+    def validar_url(self, url):
+        return True
+
+    def normalizar_url(self, url):
+        return url
+
+    def _crear_ydl(self, ydl_opts):
+        ydl = yt_dlp.YoutubeDL(ydl_opts, auto_init=False)
+        ydl.add_info_extractor(MedioFalsoIE())
+        ydl.add_default_info_extractors()
+        return ydl
+
+
+class DescargadorPrueba(ConExtractorFalso, MediaDownloader):
+    """Descarga el formato tal cual, sin post-procesado."""
+
+    def _opciones_descarga(self):
+        return {'outtmpl': '%(id)s.%(ext)s', 'quiet': True, 'no_warnings': True, 'noprogress': True,
+                'fixup': 'never'}
+
+    async def _descargar(self, url, intentos_maximos=3, recorte=None):
+        return await self._procesar_descarga(url, self._opciones_descarga(), intentos_maximos, recorte)
+
+
+class VideoPrueba(ConExtractorFalso, YouTubeVideoDownloader):
+    """El descargador de video real (remux o re-codificación a MP4) sobre el servidor local."""
+
+
+class AudioPrueba(ConExtractorFalso, AudioDownloader):
+    """El descargador de audio real (MP3 con etiquetas) sobre el servidor local."""
+
+    def _opciones_descarga(self):
+        return {**self._opciones_audio(), 'outtmpl': '%(id)s.%(ext)s', 'noprogress': True}
+
+    async def _descargar(self, url, intentos_maximos=3, recorte=None):
+        return await self._procesar_descarga(url, self._opciones_descarga(), intentos_maximos, recorte)
@@ -0,0 +1,296 @@
+"""Servidor HTTP local de medios generados y extractor de prueba para los benchmarks.
+
+Rutas (todas aceptan `latencia` en segundos por petición, `velocidad` en bytes/s y fallos
+periódicos con `fallo=503|corte` y `fallo_cada=N`: fallan la 1.ª, la N+1.ª... petición a cada
+ruta de medios, así que el reintento siguiente funciona). Los parámetros de /api pasan a las URLs
+de los formatos y de los fragmentos:
+
+    /archivo/<nombre>.<ext>?tamaño=N        descarga progresiva con soporte de Range
+    /hls/<nombre>/lista.m3u8?fragmentos=N   lista HLS y sus fragmentos segK.ts
+    /dash/<nombre>/segK.m4s                 fragmentos DASH (los lista el extractor de prueba)
+    /real/<nombre>                          medios reales generados con ffmpeg (si está instalado)
+    /miniatura/<nombre>.jpg?ancho=N&alto=N  miniatura JPEG real (generada con Pillow)
+    /ver/<id>?perfil=...                    página del extractor de prueba (MedioFalsoIE); perfiles:
+                                            progresivo, hls, dash, audio_webm y los de REALES
+    /api/<id>?perfil=...                    información que devuelve el extractor de prueba
+
+Los medios generados son bytes aleatorios deterministas: sirven para medir red, reintentos,
+caché y coalescencia, no para post-procesar. Para el post-procesado están los medios reales.
+"""
+import http.server
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qs, urlencode
+
+from yt_dlp.extractor.common import InfoExtractor
+
+TAMAÑO = 2 * 1024 * 1024
+FRAGMENTOS = 20
+TAMAÑO_FRAGMENTO = 128 * 1024
+BLOQUE = 16 * 1024
+
+TIPOS = {
+    'mp4': 'video/mp4', 'm4a': 'audio/mp4', 'webm': 'video/webm', 'mkv': 'video/x-matroska',
+    'ts': 'video/mp2t', 'm4s': 'video/iso.segment', 'jpg': 'image/jpeg',
+}
+
+# Medios reales para medir remux frente a re-codificación: (archivo, vcodec, acodec, argumentos de ffmpeg)
+REALES = {
+    'remux': ('h264_aac.mkv', 'avc1.64001f', 'mp4a.40.2', ['-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac']),
+    'transcodificacion': ('vp9_opus.webm', 'vp9', 'opus', ['-c:v', 'libvpx-vp9', '-deadline', 'realtime',
+                                                            '-cpu-used', '8', '-c:a', 'libopus']),
+    'audio': ('opus.webm', 'none', 'opus', ['-vn', '-c:a', 'libopus']),
+}
+
+
+class MedioFalsoIE(InfoExtractor):
+    """Extractor de prueba: pide al servidor local la información (formatos incluidos) del medio."""
+    IE_NAME = 'medio_falso'
+    _VALID_URL = r'https?://127\.0\.0\.1:\d+/ver/(?P<id>[^/?#]+)'
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        return self._download_json(url.replace('/ver/', '/api/', 1), video_id)
+
+
+class ServidorMedios:
+    """Servidor de medios de prueba que cuenta conexiones y peticiones."""
+
+    def __init__(self):
+        self.contador = Counter()
+        self.reales = {}
+        self._datos = {}
+        self._por_ruta = Counter()
+        self._lock = threading.Lock()
+        self._servidor = None
+
+    def iniciar(self):
+        manejador = type('Manejador', (_Manejador,), {'medios': self})
+        self._servidor = _Servidor(('127.0.0.1', 0), manejador)
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return self
+
+    def cerrar(self):
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+
+    @property
+    def puerto(self):
+        return self._servidor.server_port
+
+    def url(self, ruta, **parametros):
+        consulta = urlencode({k: v for k, v in parametros.items() if v is not None})
+        return f'http://127.0.0.1:{self.puerto}{ruta}' + (f'?{consulta}' if consulta else '')
+
+    def reiniciar_contador(self):
+        with self._lock:
+            self.contador.clear()
+            self._por_ruta.clear()
+
+    def contar(self, *claves):
+        with self._lock:
+            for clave in claves:
+                self.contador[clave] += 1
+
+    def numero_peticion(self, ruta):
+        with self._lock:
+            self._por_ruta[ruta] += 1
+            return self._por_ruta[ruta]
+
+    def datos(self, tamaño):
+        """Bytes deterministas del tamaño pedido (se generan una vez)."""
+        with self._lock:
+            if tamaño not in self._datos:
+                self._datos[tamaño] = random.Random(tamaño).randbytes(tamaño)
+            return self._datos[tamaño]
+
+    def miniatura(self, ancho, alto):
+        """JPEG real del tamaño pedido (se genera una vez)."""
+        from PIL import Image
+
+        with self._lock:
+            if ('miniatura', ancho, alto) not in self._datos:
+                imagen = Image.linear_gradient('L').resize((ancho, alto)).convert('RGB')
+                salida = io.BytesIO()
+                imagen.save(salida, 'JPEG', quality=90)
+                self._datos['miniatura', ancho, alto] = salida.getvalue()
+            return self._datos['miniatura', ancho, alto]
+
+    def generar_reales(self, carpeta, duracion=10):
+        """Genera con ffmpeg los medios de REALES; devuelve los perfiles disponibles (vacío sin ffmpeg)."""
+        if not shutil.which('ffmpeg'):
+            return []
+        for perfil, (nombre, _, _, codecs) in REALES.items():
+            ruta = os.path.join(carpeta, nombre)
+            comando = ['ffmpeg', '-y', '-loglevel', 'error',
+                       '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={duracion}',
+                       '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duracion}',
+                       *codecs, '-shortest', ruta]
+            if subprocess.run(comando, capture_output=True).returncode == 0:
+                self.reales[perfil] = ruta
+        return list(self.reales)
+
+    def info(self, video_id, parametros):
+        """Información del medio para el extractor de prueba según `perfil`."""
+        perfil = parametros.pop('perfil', 'progresivo')
+        info = {
+            'id': video_id,
+            'title': f'Medio de prueba {video_id}',
+            'duration': 30,
+            'view_count': 1000,
+            'uploader': 'TubeGrab',
+            'thumbnail': self.url(f'/miniatura/{video_id}.jpg'),
+        }
+        codecs = {'vcodec': 'avc1.4d401f', 'acodec': 'mp4a.40.2'}
+        if perfil == 'hls':
+            formato = {'url': self.url(f'/hls/{video_id}/lista.m3u8', **parametros),
+                       'protocol': 'm3u8_native', 'ext': 'mp4', **codecs}
+        elif perfil == 'dash':
+            fragmentos = int(parametros.get('fragmentos', FRAGMENTOS))
+            consulta = urlencode(parametros)
+            formato = {'url': self.url(f'/dash/{video_id}/'), 'protocol': 'http_dash_segments', 'ext': 'mp4',
+                       'fragment_base_url': self.url(f'/dash/{video_id}/'),
+                       'fragments': [{'path': f'seg{i}.m4s' + (f'?{consulta}' if consulta else ''), 'duration': 2}
+                                     for i in range(fragmentos)],
+                       **codecs}
+        elif perfil == 'audio_webm':
+            formato = {'url': self.url(f'/archivo/{video_id}.webm', **parametros), 'ext': 'webm',
+                       'filesize': int(parametros.get('tamaño', TAMAÑO)), 'vcodec': 'none', 'acodec': 'opus'}
+        elif perfil in REALES:
+            nombre, vcodec, acodec, _ = REALES[perfil]
+            formato = {'url': self.url(f'/real/{perfil}', **parametros), 'ext': nombre.rsplit('.', 1)[1],
+                       'vcodec': vcodec, 'acodec': acodec}
+        else:
+            formato = {'url': self.url(f'/archivo/{video_id}.mp4', **parametros), 'ext': 'mp4',
+                       'filesize': int(parametros.get('tamaño', TAMAÑO)), **codecs}
+        info['formats'] = [{'format_id': perfil, **formato}]
+        return info
+
+
+class _Servidor(http.server.ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Los clientes cortan conexiones a propósito (cancelaciones, modo inestable): no es un error del servidor
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _Manejador(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    medios = None
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.medios.contar('conexiones')
+
+    def do_HEAD(self):
+        self._responder(cuerpo=False)
+
+    def do_GET(self):
+        self._responder(cuerpo=True)
+
+    def _responder(self, cuerpo):
+        ruta, _, consulta = self.path.partition('?')
+        parametros = {k: v[0] for k, v in parse_qs(consulta).items()}
+        self.medios.contar('peticiones', self.command)
+        partes = ruta.strip('/').split('/')
+
+        fallo, cada = parametros.get('fallo'), int(parametros.get('fallo_cada', 0) or 0)
+        corte = False
+        if fallo and cada and partes[0] not in ('api', 'ver') and (self.medios.numero_peticion(ruta) - 1) % cada == 0:
+            self.medios.contar('fallos')
+            if fallo == '503':
+                return self._enviar(b'', 'text/plain', cuerpo, estado=503)
+            corte = True
+        time.sleep(float(parametros.get('latencia', 0)))
+        velocidad = float(parametros.get('velocidad', 0))
+
+        if partes[0] == 'archivo' and len(partes) == 2:
+            extension = partes[1].rsplit('.', 1)[-1]
+            datos = self.medios.datos(int(parametros.get('tamaño', TAMAÑO)))
+            return self._enviar(datos, TIPOS.get(extension, 'application/octet-stream'), cuerpo, velocidad, corte)
+        if partes[0] == 'miniatura' and len(partes) == 2:
+            self.medios.contar('miniaturas')
+            datos = self.medios.miniatura(int(parametros.get('ancho', 1280)), int(parametros.get('alto', 720)))
+            return self._enviar(datos, TIPOS['jpg'], cuerpo, velocidad, corte)
+        if partes[0] == 'hls' and len(partes) == 3:
+            if partes[2] == 'lista.m3u8':
+                return self._enviar(self._lista_hls(parametros), 'application/vnd.apple.mpegurl', cuerpo)
+            datos = self.medios.datos(int(parametros.get('tamaño_fragmento', TAMAÑO_FRAGMENTO)))
+            return self._enviar(datos, TIPOS['ts'], cuerpo, velocidad, corte)
+        if partes[0] == 'dash' and len(partes) == 3:
+            datos = self.medios.datos(int(parametros.get('tamaño_fragmento', TAMAÑO_FRAGMENTO)))
+            return self._enviar(datos, TIPOS['m4s'], cuerpo, velocidad, corte)
+        if partes[0] == 'real' and len(partes) == 2 and partes[1] in self.medios.reales:
+            with open(self.medios.reales[partes[1]], 'rb') as f:
+                datos = f.read()
+            extension = self.medios.reales[partes[1]].rsplit('.', 1)[-1]
+            return self._enviar(datos, TIPOS[extension], cuerpo, velocidad, corte)
+        if partes[0] == 'api' and len(partes) == 2:
+            self.medios.contar('extracciones')
+            datos = json.dumps(self.medios.info(partes[1], parametros)).encode()
+            return self._enviar(datos, 'application/json', cuerpo)
+        if partes[0] == 'ver' and len(partes) == 2:
+            return self._enviar(b'<html><body>TubeGrab</body></html>', 'text/html', cuerpo)
+        return self._enviar(b'', 'text/plain', cuerpo, estado=404)
+
+    def _lista_hls(self, parametros):
+        fragmentos = int(parametros.get('fragmentos', FRAGMENTOS))
+        consulta = urlencode(parametros)
+        lineas = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:2', '#EXT-X-MEDIA-SEQUENCE:0']
+        for i in range(fragmentos):
+            lineas += ['#EXTINF:2.0,', f'seg{i}.ts' + (f'?{consulta}' if consulta else '')]
+        lineas.append('#EXT-X-ENDLIST')
+        return ('\n'.join(lineas) + '\n').encode()
+
+    def _enviar(self, datos, tipo, cuerpo, velocidad=0.0, corte=False, estado=200):
+        inicio, fin = 0, len(datos)
+        rango = self.headers.get('Range', '')
+        if estado == 200 and rango.startswith('bytes='):
+            self.medios.contar('rangos')
+            desde, _, hasta = rango[len('bytes='):].partition('-')
+            inicio = int(desde or 0)
+            fin = min(int(hasta) + 1, len(datos)) if hasta else len(datos)
+            if inicio >= len(datos):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(datos)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            estado = 206
+        self.send_response(estado)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(fin - inicio))
+        self.send_header('Accept-Ranges', 'bytes')
+        if estado == 206:
+            self.send_header('Content-Range', f'bytes {inicio}-{fin - 1}/{len(datos)}')
+        self.end_headers()
+        if not cuerpo:
+            return
+        if corte:
+            # Se corta la conexión a mitad del cuerpo, como un CDN que resetea
+            fin = inicio + (fin - inicio) // 2
+            self.close_connection = True
+        try:
+            comienzo = time.monotonic()
+            for posicion in range(inicio, fin, BLOQUE):
+                self.wfile.write(datos[posicion:min(posicion + BLOQUE, fin)])
+                if velocidad:
+                    adelanto = (posicion + BLOQUE - inicio) / velocidad - (time.monotonic() - comienzo)
+                    if adelanto > 0:
+                        time.sleep(adelanto)
+            self.wfile.flush()
+        except OSError:
+            self.close_connection = True
@@ -0,0 +1,325 @@
+"""Suite de benchmarks con resultados en JSON para comparar ejecuciones.
+
+Todo se descarga de un servidor local (benchmarks/servidor_medios.py) a través de un extractor
+de prueba, así que los números no dependen de internet ni de YouTube. Escenarios:
+
+    unica_progresiva, unica_hls, unica_dash   latencia de una descarga aislada por protocolo
+    concurrencia                              N descargas a la vez con la velocidad por conexión limitada
+    cache                                     primera descarga frente a aciertos de la caché
+    inestable                                 servidor que corta conexiones y responde 503
+    postprocesado                             remux frente a re-codificación (necesita ffmpeg)
+    audio_flujo                               MP3 convertido durante la descarga frente a en dos fases,
+                                              y un lote que solapa post-procesado y descarga (necesita ffmpeg)
+
+Las métricas que acaban en `_segundos` son mejores cuanto más bajas y las que acaban en `_mb_s`
+cuanto más altas; son las que se comparan con --comparar. El resto son informativas.
+
+    python benchmarks/suite.py --salida base.json
+    python benchmarks/suite.py --comparar base.json --tolerancia 0.25
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp  # noqa: E402
+
+from descargadores_prueba import AudioPrueba, DescargadorPrueba, VideoPrueba  # noqa: E402
+from retry_policy import PoliticaReintentos  # noqa: E402
+from servidor_medios import ServidorMedios  # noqa: E402
+from telemetry import Telemetria  # noqa: E402
+
+VERSION = 1
+MB = 1024 * 1024
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano (None sin valores)."""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def resumen(prefijo, valores):
+    return {f'{prefijo}_p50_segundos': percentil(valores, 50), f'{prefijo}_p95_segundos': percentil(valores, 95)}
+
+
+class Contexto:
+    """Servidor, carpetas y telemetría compartidos por los escenarios."""
+
+    def __init__(self, args):
+        self.args = args
+        self.servidor = ServidorMedios().iniciar()
+        self.carpeta = tempfile.mkdtemp(prefix='tubegrab-suite-')
+        self.eventos = []
+        self.telemetria = Telemetria([self.eventos.append])
+        self._ids = 0
+
+    def cerrar(self):
+        self.servidor.cerrar()
+        shutil.rmtree(self.carpeta, ignore_errors=True)
+
+    def nuevo_id(self, prefijo):
+        """Id único: cada descarga es nueva para la caché y la coalescencia."""
+        self._ids += 1
+        return f'{prefijo}{self._ids}'
+
+    def descargador(self, clase=DescargadorPrueba, **kwargs):
+        carpeta = tempfile.mkdtemp(dir=self.carpeta)
+        kwargs.setdefault('cache', False)
+        kwargs.setdefault('cache_info', False)
+        return clase(carpeta, telemetria=self.telemetria,
+                     politica_reintentos=PoliticaReintentos(base=0.05, maximo=0.2), **kwargs)
+
+    def eventos_de(self, tipo, desde):
+        return [e for e in self.eventos[desde:] if e['evento'] == tipo]
+
+
+def cronometrar(downloader, url):
+    inicio = time.perf_counter()
+    resultado = downloader.descargar(url)
+    return time.perf_counter() - inicio, resultado
+
+
+def escenario_unica(ctx, perfil):
+    args = ctx.args
+    parametros = {'perfil': perfil, 'latencia': args.latencia}
+    if perfil == 'progresivo':
+        parametros['tamaño'] = args.tamaño
+        total = args.tamaño
+    else:
+        parametros['fragmentos'] = args.tamaño // (128 * 1024)
+        total = parametros['fragmentos'] * 128 * 1024
+    downloader = ctx.descargador()
+    # La primera descarga crea la sesión del pool y calienta el servidor: no cuenta
+    cronometrar(downloader, ctx.servidor.url(f'/ver/{ctx.nuevo_id(perfil)}', **parametros))
+    desde = len(ctx.eventos)
+    duraciones = []
+    for _ in range(args.repeticiones):
+        duracion, _ = cronometrar(downloader, ctx.servidor.url(f'/ver/{ctx.nuevo_id(perfil)}', **parametros))
+        duraciones.append(duracion)
+    ttfb = [e['ttfb'] for e in ctx.eventos_de('primer_byte', desde)]
+    extraccion = [e['fases'].get('extraccion', 0.0) for e in ctx.eventos_de('fin', desde)]
+    return {
+        **resumen('latencia', duraciones),
+        **resumen('primer_byte', ttfb),
+        **resumen('extraccion', extraccion),
+        'rendimiento_mb_s': total / MB / percentil(duraciones, 50),
+        'bytes': total,
+    }
+
+
+def escenario_concurrencia(ctx):
+    args = ctx.args
+    downloader = ctx.descargador()
+    urls = [ctx.servidor.url(f'/ver/{ctx.nuevo_id("c")}', tamaño=args.tamaño, velocidad=args.velocidad * MB)
+            for _ in range(args.concurrencia)]
+
+    async def una(url):
+        inicio = time.perf_counter()
+        await downloader.descargar_async(url)
+        return time.perf_counter() - inicio
+
+    async def todas():
+        return await asyncio.gather(*(una(url) for url in urls))
+
+    ctx.servidor.reiniciar_contador()
+    inicio = time.perf_counter()
+    duraciones = asyncio.run(todas())
+    total = time.perf_counter() - inicio
+    return {
+        'descargas': args.concurrencia,
+        'total_segundos': total,
+        **resumen('latencia', duraciones),
+        'agregado_mb_s': args.concurrencia * args.tamaño / MB / total,
+        'conexiones': ctx.servidor.contador['conexiones'],
+    }
+
+
+def escenario_cache(ctx):
+    args = ctx.args
+    downloader = ctx.descargador(cache=True, cache_info=True)
+    cronometrar(downloader, ctx.servidor.url(f'/ver/{ctx.nuevo_id("k")}', tamaño=args.tamaño))
+    fallos, aciertos, peticiones = [], [], 0
+    for _ in range(args.repeticiones):
+        url = ctx.servidor.url(f'/ver/{ctx.nuevo_id("k")}', tamaño=args.tamaño, latencia=args.latencia)
+        fallos.append(cronometrar(downloader, url)[0])
+        ctx.servidor.reiniciar_contador()
+        aciertos.append(cronometrar(downloader, url)[0])
+        peticiones += ctx.servidor.contador['peticiones']
+    return {
+        **resumen('fallo', fallos),
+        **resumen('acierto', aciertos),
+        'peticiones_en_aciertos': peticiones,
+    }
+
+
+def escenario_inestable(ctx):
+    args = ctx.args
+    downloader = ctx.descargador()
+    desde = len(ctx.eventos)
+    ctx.servidor.reiniciar_contador()
+    duraciones, fallidas = [], 0
+    for i in range(args.repeticiones):
+        # Alterna conexiones cortadas a mitad del cuerpo y respuestas 503
+        modo = 'corte' if i % 2 == 0 else '503'
+        url = ctx.servidor.url(f'/ver/{ctx.nuevo_id("f")}', tamaño=args.tamaño, fallo=modo, fallo_cada=2)
+        try:
+            duraciones.append(cronometrar(downloader, url)[0])
+        except Exception:
+            fallidas += 1
+    return {
+        **resumen('latencia', duraciones),
+        'fallos_servidor': ctx.servidor.contador['fallos'],
+        'reintentos': len(ctx.eventos_de('reintento', desde)),
+        'fallidas': fallidas,
+    }
+
+
+def escenario_postprocesado(ctx):
+    if not shutil.which('ffmpeg'):
+        return {'omitido': 'ffmpeg no está instalado'}
+    disponibles = ctx.servidor.generar_reales(ctx.carpeta)
+    resultado = {}
+    for perfil in (p for p in disponibles if p != 'audio'):
+        downloader = ctx.descargador(VideoPrueba)
+        desde = len(ctx.eventos)
+        duraciones = []
+        for _ in range(ctx.args.repeticiones):
+            duraciones.append(cronometrar(downloader, ctx.servidor.url(f'/ver/{ctx.nuevo_id(perfil)}',
+                                                                       perfil=perfil))[0])
+        postprocesado = [e['fases'].get('postprocesado', 0.0) for e in ctx.eventos_de('fin', desde)]
+        resultado.update(resumen(f'{perfil}_total', duraciones))
+        resultado.update(resumen(f'{perfil}_ffmpeg', postprocesado))
+    return resultado or {'omitido': 'ffmpeg no pudo generar los medios de prueba'}
+
+
+def escenario_audio_flujo(ctx):
+    if not shutil.which('ffmpeg'):
+        return {'omitido': 'ffmpeg no está instalado'}
+    if 'audio' not in ctx.servidor.generar_reales(ctx.carpeta):
+        return {'omitido': 'ffmpeg no pudo generar el audio de prueba'}
+    # Velocidad limitada para que la descarga dure lo bastante como para solaparla con ffmpeg
+    velocidad = os.path.getsize(ctx.servidor.reales['audio']) / 2
+    resultado = {}
+    for nombre, flujo in (('dos_fases', False), ('flujo', True)):
+        downloader = ctx.descargador(AudioPrueba, flujo=flujo)
+        duraciones = [cronometrar(downloader, ctx.servidor.url(f'/ver/{ctx.nuevo_id(nombre)}', perfil='audio',
+                                                               velocidad=velocidad))[0]
+                      for _ in range(ctx.args.repeticiones)]
+        resultado.update(resumen(nombre, duraciones))
+
+    downloader = ctx.descargador(AudioPrueba, flujo=False)
+    elementos = [{'url': ctx.servidor.url(f'/ver/{ctx.nuevo_id("lote")}', perfil='audio', velocidad=velocidad)}
+                 for _ in range(ctx.args.repeticiones)]
+    inicio = time.perf_counter()
+    estados = [r['estado'] for r in downloader.descargar_lote(elementos, max_trabajadores=1)]
+    resultado['lote_segundos'] = time.perf_counter() - inicio
+    resultado['lote_fallidos'] = estados.count('fallido')
+    return resultado
+
+
+ESCENARIOS = {
+    'unica_progresiva': lambda ctx: escenario_unica(ctx, 'progresivo'),
+    'unica_hls': lambda ctx: escenario_unica(ctx, 'hls'),
+    'unica_dash': lambda ctx: escenario_unica(ctx, 'dash'),
+    'concurrencia': escenario_concurrencia,
+    'cache': escenario_cache,
+    'inestable': escenario_inestable,
+    'postprocesado': escenario_postprocesado,
+    'audio_flujo': escenario_audio_flujo,
+}
+
+
+def entorno():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'yt_dlp': yt_dlp.version.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'ffmpeg': bool(shutil.which('ffmpeg')),
+        'commit': commit,
+    }
+
+
+def comparar(base, actual, tolerancia):
+    """Métricas que empeoran más de `tolerancia` (fracción) respecto a la ejecución base."""
+    regresiones = []
+    for escenario, metricas in actual['escenarios'].items():
+        anteriores = base.get('escenarios', {}).get(escenario, {})
+        for nombre, valor in metricas.items():
+            anterior = anteriores.get(nombre)
+            if not isinstance(valor, (int, float)) or not isinstance(anterior, (int, float)) or not anterior:
+                continue
+            if nombre.endswith('_segundos'):
+                cambio = valor / anterior - 1
+            elif nombre.endswith('_mb_s'):
+                cambio = anterior / valor - 1 if valor else math.inf
+            else:
+                continue
+            if cambio > tolerancia:
+                regresiones.append({'escenario': escenario, 'metrica': nombre, 'base': anterior,
+                                    'actual': valor, 'cambio': cambio})
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--escenarios', nargs='+', choices=list(ESCENARIOS), default=list(ESCENARIOS))
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--tamaño', type=int, default=4 * MB, help='bytes por descarga')
+    parser.add_argument('--velocidad', type=float, default=4.0, help='MB/s por conexión en el escenario de concurrencia')
+    parser.add_argument('--latencia', type=float, default=0.01, help='segundos de latencia por petición')
+    parser.add_argument('--salida', help='archivo JSON de resultados (por defecto, la salida estándar)')
+    parser.add_argument('--comparar', help='resultados JSON de una ejecución anterior')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='empeoramiento admitido (0.25 = 25 %%)')
+    args = parser.parse_args()
+
+    ctx = Contexto(args)
+    resultados = {'version': VERSION, 'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                  'entorno': entorno(), 'escenarios': {}}
+    try:
+        for nombre in args.escenarios:
+            print(f"Escenario {nombre}...", file=sys.stderr)
+            with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo), contextlib.redirect_stderr(nulo):
+                resultados['escenarios'][nombre] = ESCENARIOS[nombre](ctx)
+    finally:
+        ctx.cerrar()
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            resultados['regresiones'] = comparar(json.load(f), resultados, args.tolerancia)
+
+    texto = json.dumps(resultados, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+
+    for regresion in resultados.get('regresiones', []):
+        print(f"✗ {regresion['escenario']}.{regresion['metrica']}: {regresion['base']:.3f} → "
+              f"{regresion['actual']:.3f} ({regresion['cambio']:+.0%})", file=sys.stderr)
+    sys.exit(1 if resultados.get('regresiones') else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""Canonicalización de URLs de YouTube y SoundCloud: plataforma, id, playlist y segundo de inicio."""
+import re
+from collections import namedtuple
+from urllib.parse import parse_qs, urlsplit
+
+URLCanonica = namedtuple('URLCanonica', ['plataforma', 'id', 'playlist_id', 'inicio'])
+
+
+class Recorte(namedtuple('Recorte', ['inicio', 'fin', 'preciso'])):
+    """Fragmento de una descarga en segundos (fin None = hasta el final).
+
+    Con `preciso` se re-codifican los extremos para cortar en el segundo exacto en lugar de en
+    el fotograma clave más cercano.
+    """
+    __slots__ = ()
+
+    @property
+    def rango(self):
+        """Intervalo para download_ranges de yt-dlp."""
+        return self.inicio, float('inf') if self.fin is None else self.fin
+
+    @property
+    def etiqueta(self):
+        """Sufijo para el nombre del archivo, p. ej. '90s-120s'."""
+        return f"{self.inicio:g}s-{'fin' if self.fin is None else f'{self.fin:g}s'}"
+
+YOUTUBE = 'youtube'
+SOUNDCLOUD = 'soundcloud'
+
+_ESQUEMA = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*://')
+_HOST_YOUTUBE = re.compile(r'^(?:(?:www|m|music|gaming)\.)?(?:youtube\.com|youtube-nocookie\.com)$')
+_HOST_YOUTU_BE = re.compile(r'^(?:www\.)?youtu\.be$')
+_HOST_SOUNDCLOUD = re.compile(r'^(?:(?:www|m)\.)?soundcloud\.com$')
+_HOST_SOUNDCLOUD_CORTO = re.compile(r'^on\.soundcloud\.com$')
+_ID_VIDEO = re.compile(r'^[0-9A-Za-z_-]{11}$')
+_ID_PLAYLIST = re.compile(r'^[0-9A-Za-z_-]{2,}$')
+_RUTA_VIDEO = re.compile(r'^/(?:shorts|embed|live|v|e)/([0-9A-Za-z_-]{11})(?:[/?#]|$)')
+# Los clips se resuelven con su extractor (el id del clip no es el del video)
+_RUTA_CLIP = re.compile(r'^/clip/[0-9A-Za-z_-]+/?$')
+_RUTA_CANAL = re.compile(r'^/(@[^/?#]+|channel/[^/?#]+|c/[^/?#]+|user/[^/?#]+)')
+# Token de los enlaces de pistas y listas privadas de SoundCloud (/usuario/pista/s-XXXX)
+_TOKEN_SOUNDCLOUD = re.compile(r'^s-[0-9A-Za-z]+$')
+_TIEMPO = re.compile(r'^(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s?)?$')
+_TIEMPO_RELOJ = re.compile(r'^(?:(\d+):)?(\d+):(\d+)$')
+# Rutas de soundcloud.com que no son perfiles de usuario
+_RUTAS_SOUNDCLOUD_RESERVADAS = frozenset((
+    'discover', 'stream', 'search', 'upload', 'you', 'charts', 'settings', 'messages', 'notifications',
+    'pages', 'mobile', 'terms-of-use', 'jobs', 'imprint', 'popular', 'tags',
+))
+
+
+def segundos(valor):
+    """Convierte '90', '90s', '1m30s', '1h2m3s' o '1:30' a segundos."""
+    if not valor:
+        return None
+    valor = valor.strip().lower()
+    coincidencia = _TIEMPO_RELOJ.match(valor)
+    if coincidencia:
+        horas, minutos, segundos = coincidencia.groups()
+        return int(horas or 0) * 3600 + int(minutos) * 60 + int(segundos)
+    coincidencia = _TIEMPO.match(valor)
+    if coincidencia and any(coincidencia.groups()):
+        horas, minutos, segundos = coincidencia.groups()
+        return int(horas or 0) * 3600 + int(minutos or 0) * 60 + int(segundos or 0)
+    return None
+
+
+def recorte_temporal(inicio=None, fin=None, preciso=False):
+    """Valida un fragmento dado en segundos o como '1:30', '2m'...; None si abarca el archivo entero."""
+    def a_segundos(valor):
+        if valor is None or valor == '':
+            return None
+        resultado = valor if isinstance(valor, (int, float)) else segundos(str(valor))
+        if resultado is None or resultado < 0:
+            raise ValueError(f"Tiempo no válido: {valor}")
+        return resultado
+
+    inicio, fin = a_segundos(inicio), a_segundos(fin)
+    if not inicio and fin is None:
+        return None
+    if fin is not None and fin <= (inicio or 0):
+        raise ValueError("El final del fragmento debe ser posterior al inicio")
+    return Recorte(inicio or 0, fin, bool(preciso))
+
+
+def _inicio(consulta, fragmento):
+    for clave in ('t', 'start', 'time_continue'):
+        if clave in consulta:
+            return segundos(consulta[clave][0])
+    if fragmento.startswith('t='):
+        return segundos(fragmento[2:])
+    return None
+
+
+def _youtube(host, ruta, consulta, fragmento):
+    playlist_id = consulta.get('list', [None])[0]
+    if playlist_id and not _ID_PLAYLIST.match(playlist_id):
+        playlist_id = None
+    inicio = _inicio(consulta, fragmento)
+
+    if _HOST_YOUTU_BE.match(host):
+        video_id = ruta.strip('/').split('/')[0]
+        if not _ID_VIDEO.match(video_id):
+            return None
+        return URLCanonica(YOUTUBE, video_id, playlist_id, inicio)
+
+    video_id = consulta.get('v', [None])[0] if ruta in ('/watch', '/watch/') else None
+    if video_id is None:
+        coincidencia = _RUTA_VIDEO.match(ruta)
+        video_id = coincidencia.group(1) if coincidencia else None
+    if video_id is not None:
+        return URLCanonica(YOUTUBE, video_id, playlist_id, inicio) if _ID_VIDEO.match(video_id) else None
+
+    if ruta.rstrip('/') == '/playlist' and playlist_id:
+        return URLCanonica(YOUTUBE, None, playlist_id, None)
+    if _RUTA_CLIP.match(ruta):
+        # Como los enlaces cortos de SoundCloud: se acepta, pero la URL se deja tal cual
+        return URLCanonica(YOUTUBE, None, None, None)
+    coincidencia = _RUTA_CANAL.match(ruta)
+    if coincidencia:
+        return URLCanonica(YOUTUBE, None, coincidencia.group(1), None)
+    return None
+
+
+def _soundcloud(ruta, consulta, fragmento):
+    partes = [parte for parte in ruta.split('/') if parte]
+    if not partes or partes[0] in _RUTAS_SOUNDCLOUD_RESERVADAS:
+        return None
+    usuario = partes[0]
+    if len(partes) == 1 or partes[1] in ('tracks', 'albums', 'sets', 'reposts', 'likes', 'popular-tracks'):
+        if len(partes) >= 3 and partes[1] == 'sets':
+            return URLCanonica(SOUNDCLOUD, None, _con_token(f"{usuario}/sets/{partes[2]}", partes[3:]), None)
+        return URLCanonica(SOUNDCLOUD, None, '/'.join(partes[:2]), None)
+    return URLCanonica(SOUNDCLOUD, _con_token(f"{usuario}/{partes[1]}", partes[2:]), None, _inicio(consulta, fragmento))
+
+
+def _con_token(ruta, resto):
+    # Sin el token secreto una pista o lista privada no se puede descargar
+    if resto and _TOKEN_SOUNDCLOUD.match(resto[0]):
+        return f"{ruta}/{resto[0]}"
+    return ruta
+
+
+def canonicalizar(url):
+    """Devuelve URLCanonica(plataforma, id, playlist_id, inicio), o None si la URL no es de una plataforma soportada.
+
+    Para videos sueltos playlist_id es None; para playlists, canales y perfiles id es None.
+    """
+    if not url:
+        return None
+    url = url.strip()
+    if not _ESQUEMA.match(url):
+        url = f"https://{url}"
+    try:
+        partes = urlsplit(url)
+        host = (partes.hostname or '').lower()
+    except ValueError:
+        return None
+    if partes.scheme not in ('http', 'https'):
+        return None
+    consulta = parse_qs(partes.query)
+
+    if _HOST_YOUTUBE.match(host) or _HOST_YOUTU_BE.match(host):
+        return _youtube(host, partes.path, consulta, partes.fragment)
+    if _HOST_SOUNDCLOUD.match(host):
+        return _soundcloud(partes.path, consulta, partes.fragment)
+    if _HOST_SOUNDCLOUD_CORTO.match(host) and partes.path.strip('/'):
+        # Enlace corto: solo se resuelve siguiendo la redirección, el id no se conoce sin red
+        return URLCanonica(SOUNDCLOUD, None, None, None)
+    return None
+
+
+def url_canonica(canonica):
+    """URL estable para una URLCanonica: la misma para todas las variantes del mismo contenido.
+
+    Devuelve None si la URL no identifica el contenido por sí sola (enlaces cortos de SoundCloud,
+    clips de YouTube).
+    """
+    if not canonica.id and not canonica.playlist_id:
+        return None
+    if canonica.plataforma == YOUTUBE:
+        if canonica.id:
+            return f"https://www.youtube.com/watch?v={canonica.id}"
+        if canonica.playlist_id.startswith(('@', 'channel/', 'c/', 'user/')):
+            return f"https://www.youtube.com/{canonica.playlist_id}"
+        return f"https://www.youtube.com/playlist?list={canonica.playlist_id}"
+    return f"https://soundcloud.com/{canonica.id or canonica.playlist_id}"
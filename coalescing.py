@@ -0,0 +1,216 @@
+"""Coalescencia de descargas idénticas en curso (single-flight) y bloqueos de archivo entre procesos."""
+import asyncio
+import contextlib
+import hashlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class _Vuelo:
+    """Una descarga en curso a la que se pueden unir otras peticiones idénticas."""
+
+    def __init__(self):
+        self.terminado = threading.Event()
+        self.resultado = None
+        self.error = None
+        self.suscriptores = []
+        self.ultimo_evento = None
+        self.esperando = []
+        self.lock = threading.Lock()
+
+    def suscribir(self, progreso):
+        with self.lock:
+            self.suscriptores.append(progreso)
+            ultimo = self.ultimo_evento
+        if ultimo is not None:
+            # Quien se une tarde ve enseguida el progreso actual
+            progreso(ultimo)
+
+    def emitir(self, d):
+        with self.lock:
+            self.ultimo_evento = d
+            suscriptores = list(self.suscriptores)
+        for progreso in suscriptores:
+            try:
+                progreso(d)
+            except Exception:
+                pass
+
+    def esperar_async(self):
+        """Futuro del bucle actual que se resuelve al terminar, sin ocupar un hilo mientras tanto."""
+        bucle = asyncio.get_running_loop()
+        futuro = bucle.create_future()
+        with self.lock:
+            if not self.terminado.is_set():
+                self.esperando.append((bucle, futuro))
+                return futuro
+        futuro.set_result(None)
+        return futuro
+
+    def terminar(self, resultado=None, error=None):
+        with self.lock:
+            self.resultado, self.error = resultado, error
+            self.terminado.set()
+            esperando, self.esperando = self.esperando, []
+        for bucle, futuro in esperando:
+            # Quien espera puede estar en el bucle de otro hilo
+            try:
+                bucle.call_soon_threadsafe(_resolver, futuro)
+            except RuntimeError:
+                pass  # bucle ya cerrado
+
+    def resultado_compartido(self):
+        if isinstance(self.error, asyncio.CancelledError):
+            # Cancelar al líder no cancela a quien se unió: para este es un fallo normal
+            raise RuntimeError("La descarga compartida se canceló") from self.error
+        if self.error is not None:
+            raise self.error
+        return dict(self.resultado) if isinstance(self.resultado, dict) else self.resultado
+
+
+def _resolver(futuro):
+    if not futuro.done():
+        futuro.set_result(None)
+
+
+class VuelosCompartidos:
+    """Ejecuta una sola vez cada clave en curso; las peticiones repetidas esperan y reciben el mismo resultado."""
+
+    def __init__(self):
+        self._vuelos = {}
+        self._lock = threading.Lock()
+
+    def _unirse(self, clave, progreso):
+        with self._lock:
+            vuelo = self._vuelos.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._vuelos[clave] = _Vuelo()
+        for suscriptor in progreso:
+            if suscriptor is not None:
+                vuelo.suscribir(suscriptor)
+        return vuelo, lider
+
+    def _aterrizar(self, clave, vuelo, resultado=None, error=None):
+        with self._lock:
+            del self._vuelos[clave]
+        vuelo.terminar(resultado, error)
+
+    def ejecutar(self, clave, funcion, progreso=None):
+        """Llama a funcion(emitir) si nadie está ya con esta clave; si no, se une a esa ejecución.
+
+        `emitir` reparte los eventos de progreso entre todas las peticiones unidas.
+        """
+        vuelo, lider = self._unirse(clave, [progreso])
+        if not lider:
+            vuelo.terminado.wait()
+            return vuelo.resultado_compartido()
+
+        try:
+            resultado = funcion(vuelo.emitir)
+        except BaseException as e:
+            self._aterrizar(clave, vuelo, error=e)
+            raise
+        self._aterrizar(clave, vuelo, resultado)
+        return resultado
+
+    async def ejecutar_async(self, clave, funcion, progreso=()):
+        """Versión asíncrona de ejecutar(): `funcion(emitir)` es una corrutina.
+
+        Las peticiones unidas esperan en su propio bucle de eventos, que puede ser de otro hilo.
+        """
+        vuelo, lider = self._unirse(clave, progreso)
+        if not lider:
+            await vuelo.esperar_async()
+            return vuelo.resultado_compartido()
+
+        try:
+            resultado = await funcion(vuelo.emitir)
+        except BaseException as e:
+            self._aterrizar(clave, vuelo, error=e)
+            raise
+        self._aterrizar(clave, vuelo, resultado)
+        return resultado
+
+
+def _ruta_bloqueo(carpeta, nombre):
+    carpeta_locks = os.path.join(carpeta, '.locks')
+    os.makedirs(carpeta_locks, exist_ok=True)
+    return os.path.join(carpeta_locks, hashlib.sha256(nombre.encode('utf-8')).hexdigest()[:32] + '.lock')
+
+
+def _intentar_bloquear(f):
+    """Intenta tomar el bloqueo sin esperar; devuelve si se consiguió."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _desbloquear(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _vigente(f, ruta):
+    """Indica si el archivo abierto sigue siendo el de la ruta: quien soltó el bloqueo pudo borrarlo."""
+    try:
+        return os.path.samestat(os.fstat(f.fileno()), os.stat(ruta))
+    except OSError:
+        return False
+
+
+def _soltar(f, ruta):
+    """Suelta el bloqueo y borra su archivo para que .locks no crezca con cada descarga."""
+    if fcntl is not None:
+        # Se borra antes de soltarlo: quien espera en el archivo viejo lo nota en _vigente y reabre
+        with contextlib.suppress(OSError):
+            os.remove(ruta)
+        _desbloquear(f)
+        f.close()
+    else:
+        _desbloquear(f)
+        f.close()
+        # Windows no borra un archivo que otro proceso tiene abierto, es decir, si alguien espera
+        with contextlib.suppress(OSError):
+            os.remove(ruta)
+
+
+@contextlib.asynccontextmanager
+async def bloqueo_archivo_async(carpeta, nombre, espera_maxima=0.5):
+    """Bloqueo exclusivo entre procesos asociado a `nombre` dentro de carpeta/.locks.
+
+    Espera sondeando con asyncio.sleep (con retroceso hasta `espera_maxima`) en lugar de bloquear
+    el hilo del bucle.
+    """
+    ruta = _ruta_bloqueo(carpeta, nombre)
+    espera = 0.01
+    while True:
+        f = open(ruta, 'a+b')
+        if _intentar_bloquear(f):
+            if _vigente(f, ruta):
+                break
+            _desbloquear(f)
+            f.close()
+            continue
+        f.close()
+        await asyncio.sleep(espera)
+        espera = min(espera * 2, espera_maxima)
+    try:
+        yield
+    finally:
+        _soltar(f, ruta)
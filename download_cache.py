@@ -0,0 +1,51 @@
+"""Caché de descargas terminadas, direccionada por contenido (extractor, id, formato, post-procesado)."""
+import hashlib
+import json
+import os
+
+from registry import Registro
+
+
+def calcular_checksum(ruta, tamaño_bloque=1024 * 1024):
+    """Calcula el SHA-256 de un archivo leyéndolo por bloques."""
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(tamaño_bloque), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+class CacheDescargas:
+    """Archivos ya descargados, guardados como artefactos del registro compartido.
+
+    La cuota de disco la aplica el Almacenamiento; aquí solo se olvida una entrada cuando se
+    pide y su archivo ya no existe.
+    """
+
+    def __init__(self, carpeta_destino, registro=None):
+        self.carpeta_destino = carpeta_destino
+        self.registro = registro or Registro(carpeta_destino)
+
+    @staticmethod
+    def clave(extractor, video_id, formato, postprocesado):
+        """Construye la clave de caché a partir de todo lo que determina el archivo final."""
+        datos = json.dumps([extractor, video_id, formato, postprocesado], sort_keys=True, default=str)
+        return hashlib.sha256(datos.encode('utf-8')).hexdigest()
+
+    def obtener(self, clave):
+        """Devuelve el media_info guardado si el archivo sigue intacto, o None."""
+        artefacto = self.registro.artefacto(clave)
+        if artefacto is None:
+            return None
+        archivo = artefacto['ruta']
+        if not os.path.exists(archivo) or os.path.getsize(archivo) != artefacto['tamaño']:
+            self.registro.borrar_artefacto(clave)
+            return None
+        self.registro.tocar_artefacto(clave)
+        return artefacto['media_info']
+
+    def guardar(self, clave, media_info, extractor=None, video_id=None):
+        """Registra un archivo terminado."""
+        archivo = media_info['archivo']
+        self.registro.guardar_artefacto(clave, media_info, os.path.getsize(archivo), calcular_checksum(archivo),
+                                        extractor=extractor, video_id=video_id, formato=media_info.get('formato'))
@@ -0,0 +1,147 @@
+"""Servidor HTTP ligero que entrega los archivos descargados por bloques, con soporte de Range."""
+import mimetypes
+import os
+import re
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit, parse_qs
+
+PATRON_RANGE = re.compile(r'bytes=(\d*)-(\d*)$')
+
+
+class _ManejadorArchivos(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    carpeta = None
+    metricas = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._servir(enviar_cuerpo=False)
+
+    def do_GET(self):
+        self._servir(enviar_cuerpo=True)
+
+    def _resolver(self, ruta_url):
+        """Traduce la ruta de la URL a un archivo dentro de la carpeta servida."""
+        relativa = unquote(ruta_url).lstrip('/')
+        if any(parte.startswith('.') for parte in relativa.split('/')):
+            # Ni rutas relativas ni la caché interna (.cache, .tmp...)
+            return None
+        ruta = os.path.realpath(os.path.join(self.carpeta, relativa))
+        if os.path.commonpath([ruta, self.carpeta]) != self.carpeta or not os.path.isfile(ruta):
+            return None
+        return ruta
+
+    def _rango(self, cabecera, tamaño):
+        """Devuelve (inicio, fin) inclusivos del Range pedido, None si no hay Range o False si no es satisfacible."""
+        if not cabecera:
+            return None
+        coincidencia = PATRON_RANGE.match(cabecera.strip())
+        if not coincidencia or coincidencia.groups() == ('', ''):
+            return None
+        inicio, fin = coincidencia.groups()
+        if inicio == '':
+            # Sufijo: los últimos N bytes
+            inicio, fin = max(tamaño - int(fin), 0), tamaño - 1
+        else:
+            inicio, fin = int(inicio), min(int(fin), tamaño - 1) if fin else tamaño - 1
+        if inicio >= tamaño or inicio > fin:
+            return False
+        return inicio, fin
+
+    def _servir(self, enviar_cuerpo):
+        partes = urlsplit(self.path)
+        if partes.path == '/metrics' and self.metricas is not None:
+            self._servir_metricas(enviar_cuerpo)
+            return
+        ruta = self._resolver(partes.path)
+        if ruta is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        tamaño = os.path.getsize(ruta)
+        rango = self._rango(self.headers.get('Range'), tamaño)
+        if rango is False:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header('Content-Range', f'bytes */{tamaño}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        inicio, fin = rango or (0, tamaño - 1)
+        longitud = fin - inicio + 1 if tamaño else 0
+        self.send_response(HTTPStatus.PARTIAL_CONTENT if rango else HTTPStatus.OK)
+        self.send_header('Content-Type', mimetypes.guess_type(ruta)[0] or 'application/octet-stream')
+        self.send_header('Content-Length', str(longitud))
+        self.send_header('Accept-Ranges', 'bytes')
+        if rango:
+            self.send_header('Content-Range', f'bytes {inicio}-{fin}/{tamaño}')
+        if 'descargar' in parse_qs(partes.query):
+            nombre = os.path.basename(ruta)
+            self.send_header('Content-Disposition', f"attachment; filename*=UTF-8''{quote(nombre)}")
+        self.end_headers()
+
+        if enviar_cuerpo and longitud:
+            with open(ruta, 'rb') as f:
+                self._enviar(f, inicio, longitud)
+
+    def _servir_metricas(self, enviar_cuerpo):
+        cuerpo = self.metricas.texto().encode('utf-8')
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        if enviar_cuerpo:
+            self.wfile.write(cuerpo)
+
+    def _enviar(self, f, inicio, longitud):
+        """Envía el tramo pedido sin cargarlo en memoria (socket.sendfile usa os.sendfile si existe)."""
+        try:
+            self.wfile.flush()
+            self.connection.sendfile(f, inicio, longitud)
+        except (BrokenPipeError, ConnectionResetError):
+            # El navegador cancela peticiones al saltar de posición en los previews
+            self.close_connection = True
+
+
+class ServidorArchivos:
+    """Sirve la carpeta de descargas en un hilo aparte, fuera de la memoria de Streamlit.
+
+    No tiene autenticación: por defecto solo escucha en la propia máquina. Si se le pasan
+    métricas (MetricasPrometheus), las expone además en /metrics.
+    """
+
+    def __init__(self, carpeta="descargas", host="127.0.0.1", puerto=8502, metricas=None):
+        self.carpeta = os.path.realpath(carpeta)
+        manejador = type('ManejadorArchivos', (_ManejadorArchivos,), {'carpeta': self.carpeta, 'metricas': metricas})
+        self._servidor = ThreadingHTTPServer((host, puerto), manejador)
+        self._servidor.daemon_threads = True
+        self._hilo = None
+
+    @property
+    def puerto(self):
+        return self._servidor.server_address[1]
+
+    @property
+    def solo_local(self):
+        """True si solo acepta conexiones desde esta máquina."""
+        return self._servidor.server_address[0] in ('127.0.0.1', '::1')
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._servidor.serve_forever, name="tubegrab-archivos", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+        self._hilo = None
+
+    def ruta_url(self, archivo, descargar=False):
+        """Ruta URL (sin host) de un archivo de la carpeta servida."""
+        relativa = os.path.relpath(os.path.realpath(archivo), self.carpeta).replace(os.sep, '/')
+        return '/' + quote(relativa) + ('?descargar=1' if descargar else '')
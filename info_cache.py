@@ -0,0 +1,119 @@
+"""Caché con TTL de la información extraída (metadatos y formatos), en memoria y en disco."""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Campos voluminosos que TubeGrab nunca usa
+CAMPOS_DESCARTADOS = {
+    'automatic_captions', 'subtitles', 'heatmap', 'thumbnails', 'description', 'chapters',
+    'tags', 'categories', 'storyboards', 'comments', 'requested_subtitles',
+}
+
+_MEMORIA = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def aligerar_info(info):
+    """Copia JSON-serializable de la información sin los campos voluminosos ni los privados de yt-dlp."""
+    def filtrar(valor):
+        if isinstance(valor, dict):
+            return {k: filtrar(v) for k, v in valor.items()
+                    if k not in CAMPOS_DESCARTADOS and not k.startswith('__')}
+        if isinstance(valor, (list, tuple)):
+            return [filtrar(v) for v in valor]
+        if valor is None or isinstance(valor, (str, int, float, bool)):
+            return valor
+        return str(valor)
+
+    info = filtrar(info)
+    if info.get('formats'):
+        # Los storyboards (miniaturas de la barra de progreso) no son descargables como media
+        info['formats'] = [f for f in info['formats'] if f.get('ext') != 'mhtml']
+    return info
+
+
+class CacheInfo:
+    """Caché de dos niveles: un LRU en memoria compartido por el proceso y archivos JSON en disco."""
+
+    def __init__(self, carpeta_destino, ttl=3600, max_entradas=500):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.carpeta = os.path.join(carpeta_destino, '.cache', 'info')
+
+    @staticmethod
+    def clave(extractor, video_id):
+        return hashlib.sha256(f"{extractor}:{video_id}".encode('utf-8')).hexdigest()
+
+    def obtener(self, clave):
+        ahora = time.time()
+        with _LOCK:
+            entrada = _MEMORIA.get((self.carpeta, clave))
+            if entrada and entrada[0] > ahora:
+                _MEMORIA.move_to_end((self.carpeta, clave))
+                return entrada[1]
+
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                entrada = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entrada['expira'] <= ahora:
+            self.invalidar(clave)
+            return None
+        self._recordar(clave, entrada['expira'], entrada['info'])
+        return entrada['info']
+
+    def guardar(self, clave, info):
+        """Guarda la información aligerada y la devuelve."""
+        info = aligerar_info(info)
+        expira = time.time() + self.ttl
+        self._recordar(clave, expira, info)
+
+        os.makedirs(self.carpeta, exist_ok=True)
+        ruta = self._ruta(clave)
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({'expira': expira, 'info': info}, f, ensure_ascii=False)
+        os.replace(temporal, ruta)
+        self._podar_disco()
+        return info
+
+    def invalidar(self, clave):
+        with _LOCK:
+            _MEMORIA.pop((self.carpeta, clave), None)
+        try:
+            os.remove(self._ruta(clave))
+        except OSError:
+            pass
+
+    def _recordar(self, clave, expira, info):
+        with _LOCK:
+            _MEMORIA[(self.carpeta, clave)] = (expira, info)
+            _MEMORIA.move_to_end((self.carpeta, clave))
+            while len(_MEMORIA) > self.max_entradas:
+                _MEMORIA.popitem(last=False)
+
+    def _podar_disco(self):
+        """Borra las entradas caducadas y, si sobran, las más antiguas."""
+        try:
+            archivos = [os.path.join(self.carpeta, n) for n in os.listdir(self.carpeta) if n.endswith('.json')]
+        except OSError:
+            return
+        if len(archivos) <= self.max_entradas:
+            return
+        limite = time.time() - self.ttl
+        archivos.sort(key=lambda ruta: os.path.getmtime(ruta) if os.path.exists(ruta) else 0)
+        sobrantes = len(archivos) - self.max_entradas
+        for i, ruta in enumerate(archivos):
+            try:
+                if i < sobrantes or os.path.getmtime(ruta) < limite:
+                    os.remove(ruta)
+            except OSError:
+                pass
+
+    def _ruta(self, clave):
+        return os.path.join(self.carpeta, f"{clave}.json")
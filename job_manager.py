@@ -0,0 +1,266 @@
+"""Gestor de trabajos en segundo plano para las descargas de TubeGrab."""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from canonical_url import recorte_temporal
+from registry import Registro
+from scheduler import ColaJusta, PRIORIDAD_AUDIO, PRIORIDAD_VIDEO
+from telemetry import TELEMETRIA
+
+EN_COLA = 'en_cola'
+DESCARGANDO = 'descargando'
+POSTPROCESANDO = 'postprocesando'
+COMPLETADO = 'completado'
+FALLIDO = 'fallido'
+
+ESTADOS_ACTIVOS = (EN_COLA, DESCARGANDO, POSTPROCESANDO)
+
+# Nombres de las clases de media_downloader: el módulo (y con él yt-dlp) se importa con la primera descarga
+DESCARGADORES = {
+    'video': 'YouTubeVideoDownloader',
+    'audio': 'YouTubeAudioDownloader',
+    'soundcloud': 'SoundCloudDownloader',
+}
+
+# Las descargas de audio adelantan en la cola a los videos, que pueden acabar en una re-codificación larga
+PRIORIDADES = {
+    'video': PRIORIDAD_VIDEO,
+    'audio': PRIORIDAD_AUDIO,
+    'soundcloud': PRIORIDAD_AUDIO,
+}
+
+
+def clase_descargador(tipo):
+    """Devuelve la clase de descargador para un tipo de trabajo, importándola al usarla."""
+    import media_downloader
+    return getattr(media_downloader, DESCARGADORES[tipo])
+
+
+@dataclass
+class Trabajo:
+    id: str
+    tipo: str
+    url: str
+    estado: str = EN_COLA
+    progreso: float = 0.0
+    descargado: int = 0
+    total: int = 0
+    velocidad: float = 0.0
+    resultado: dict = None
+    error: str = None
+    lote: bool = False
+    elementos: list = field(default_factory=list)
+    total_elementos: int = 0
+    estadisticas: dict = None
+    sesion: str = None
+    prioridad: int = PRIORIDAD_VIDEO
+    inicio: str = None
+    fin: str = None
+    corte_preciso: bool = False
+    # Descarga huérfana del registro que se reclamó para este trabajo (se libera al terminar)
+    clave_huerfano: str = None
+    creado: float = field(default_factory=time.time)
+    iniciado: float = None
+    actualizado: float = field(default_factory=time.time)
+
+    @property
+    def activo(self):
+        return self.estado in ESTADOS_ACTIVOS
+
+    @property
+    def espera(self):
+        """Segundos en cola antes de empezar (hasta ahora, si sigue esperando)."""
+        return (self.iniciado or time.time()) - self.creado
+
+
+class GestorTrabajos:
+    """Cola de descargas compartida por todas las sesiones, con un pool de hilos acotado.
+
+    Los trabajos esperan en una cola justa (ver scheduler.ColaJusta): cada hilo libre toma el
+    siguiente de la sesión con menos descargas en marcha, dando preferencia al audio.
+    """
+
+    def __init__(self, max_trabajadores=4, carpeta_destino="descargas", max_historial=200, registro=True):
+        self.carpeta_destino = carpeta_destino
+        self.max_historial = max_historial
+        self.registro = Registro(carpeta_destino) if registro is True else registro or None
+        self._pool = ThreadPoolExecutor(max_workers=max_trabajadores, thread_name_prefix="tubegrab")
+        self._cola = ColaJusta()
+        self._trabajos = {}
+        self._lock = threading.Lock()
+
+    def enviar(self, tipo, url, lote=False, sesion=None, inicio=None, fin=None, corte_preciso=False,
+               clave_huerfano=None):
+        """Encola una descarga (o un lote/playlist) y devuelve el id del trabajo sin esperar a que termine.
+
+        `inicio` y `fin` limitan la descarga a un fragmento (no se aplican a los lotes).
+        `clave_huerfano` es la descarga del registro reclamada por reanudar_huerfanos.
+        """
+        if tipo not in DESCARGADORES:
+            raise ValueError(f"Tipo de descarga no soportado: {tipo}")
+        recorte_temporal(inicio, fin)  # tiempos no válidos: error ahora, no al llegarle el turno
+        trabajo = Trabajo(id=uuid.uuid4().hex, tipo=tipo, url=url, lote=lote, sesion=sesion,
+                          prioridad=PRIORIDADES[tipo], inicio=inicio, fin=fin, corte_preciso=corte_preciso,
+                          clave_huerfano=clave_huerfano)
+        with self._lock:
+            self._trabajos[trabajo.id] = trabajo
+            self._podar_historial()
+        self._cola.poner(trabajo, sesion=sesion, prioridad=trabajo.prioridad)
+        TELEMETRIA.emitir('cola', cola='trabajos', profundidad=len(self._cola))
+        # Cada tarea del pool ejecuta el trabajo que toque cuando le llegue el turno, no este en concreto
+        self._pool.submit(self._siguiente)
+        return trabajo.id
+
+    def reanudar_huerfanos(self, espera_cola=600.0):
+        """Vuelve a encolar las descargas que dejó a medias una réplica caída (lease caducado).
+
+        Se reclaman para `espera_cola` segundos, lo que pueden tardar en llegar a ejecutarse, para
+        que otra réplica no las encole también. Devuelve los ids de los trabajos creados.
+        """
+        if not self.registro:
+            return []
+        tipos = {clase: tipo for tipo, clase in DESCARGADORES.items()}
+        ids = []
+        for huerfano in self.registro.adoptar_huerfanos(espera_cola):
+            tipo = tipos.get(huerfano['descargador'])
+            try:
+                if tipo is None:
+                    # Descargadores de scripts propios: no se sabe recrearlos
+                    raise ValueError(f"descargador desconocido: {huerfano['descargador']}")
+                print(f"Reanudando la descarga abandonada de {huerfano['url']}")
+                ids.append(self.enviar(tipo, huerfano['url'], clave_huerfano=huerfano['clave'], **huerfano['opciones']))
+            except ValueError as e:
+                print(f"No se pudo reanudar {huerfano['url']}: {str(e)}")
+                self.registro.liberar(huerfano['clave'])
+        return ids
+
+    def vigilar_huerfanos(self, intervalo=60.0):
+        """Busca descargas huérfanas ahora y después cada `intervalo` segundos, en un hilo aparte."""
+        def vigilar():
+            while True:
+                try:
+                    self.reanudar_huerfanos()
+                except Exception as e:
+                    print(f"Error al buscar descargas huérfanas: {str(e)}")
+                time.sleep(intervalo)
+
+        threading.Thread(target=vigilar, name="tubegrab-huerfanos", daemon=True).start()
+
+    def en_cola(self):
+        """Trabajos pendientes en el orden en que empezarán."""
+        return self._cola.orden()
+
+    def posicion(self, trabajo_id):
+        """Cuántos trabajos pendientes van por delante de este (None si ya no está en cola)."""
+        for i, trabajo in enumerate(self._cola.orden()):
+            if trabajo.id == trabajo_id:
+                return i
+        return None
+
+    def obtener(self, trabajo_id):
+        with self._lock:
+            return self._trabajos.get(trabajo_id)
+
+    def listar(self, ids=None):
+        with self._lock:
+            if ids is None:
+                return list(self._trabajos.values())
+            return [self._trabajos[i] for i in ids if i in self._trabajos]
+
+    def cerrar(self, esperar=False):
+        self._pool.shutdown(wait=esperar, cancel_futures=True)
+
+    def _podar_historial(self):
+        """Descarta los trabajos terminados más antiguos cuando se supera el historial."""
+        terminados = [t for t in self._trabajos.values() if not t.activo]
+        exceso = len(self._trabajos) - self.max_historial
+        for trabajo in sorted(terminados, key=lambda t: t.actualizado)[:max(exceso, 0)]:
+            del self._trabajos[trabajo.id]
+
+    def _actualizar(self, trabajo, **cambios):
+        with self._lock:
+            for clave, valor in cambios.items():
+                setattr(trabajo, clave, valor)
+            trabajo.actualizado = time.time()
+
+    def _hook(self, trabajo):
+        def hook(d):
+            if 'postprocessor' in d or d['status'] == 'finished':
+                self._actualizar(trabajo, estado=POSTPROCESANDO)
+            elif d['status'] == 'downloading' and trabajo.lote:
+                # En los lotes el progreso se mide en elementos terminados
+                self._actualizar(trabajo, estado=DESCARGANDO, velocidad=d.get('speed') or 0.0)
+            elif d['status'] == 'downloading':
+                total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+                descargado = d.get('downloaded_bytes') or 0
+                self._actualizar(
+                    trabajo,
+                    estado=DESCARGANDO,
+                    descargado=descargado,
+                    total=total,
+                    velocidad=d.get('speed') or 0.0,
+                    progreso=min(descargado / total, 1.0) if total else 0.0,
+                )
+        return hook
+
+    def _crear_descargador(self, trabajo):
+        # Los eventos de telemetría llevan el id del trabajo para poder filtrarlos en la interfaz
+        return clase_descargador(trabajo.tipo)(self.carpeta_destino, progreso=self._hook(trabajo),
+                                                  telemetria=TELEMETRIA.con(trabajo=trabajo.id, tipo=trabajo.tipo))
+
+    def _siguiente(self):
+        # El futuro del pool no lo espera nadie: un error aquí se perdería sin avisar
+        try:
+            trabajo = self._cola.tomar()
+            if trabajo is None:
+                return
+            try:
+                self._actualizar(trabajo, iniciado=time.time())
+                TELEMETRIA.emitir('cola', cola='trabajos', profundidad=len(self._cola), espera=trabajo.espera,
+                                  tipo_trabajo=trabajo.tipo)
+                (self._ejecutar_lote if trabajo.lote else self._ejecutar)(trabajo)
+            except Exception as e:
+                self._actualizar(trabajo, estado=FALLIDO, error=str(e))
+                raise
+            finally:
+                self._cola.terminar(trabajo.sesion)
+                if trabajo.clave_huerfano and self.registro:
+                    # Acabe como acabe (caché, error, otra clave), la reclamación no debe quedar colgada
+                    self.registro.liberar(trabajo.clave_huerfano)
+        except Exception as e:
+            print(f"Error en el gestor de trabajos: {type(e).__name__}: {str(e)}")
+
+    def _ejecutar(self, trabajo):
+        self._actualizar(trabajo, estado=DESCARGANDO)
+        downloader = self._crear_descargador(trabajo)
+        try:
+            resultado = downloader.descargar(trabajo.url, inicio=trabajo.inicio, fin=trabajo.fin,
+                                             corte_preciso=trabajo.corte_preciso)
+        except Exception as e:
+            estadisticas = getattr(e, 'estadisticas', None) or getattr(e.__cause__, 'estadisticas', None)
+            self._actualizar(trabajo, estado=FALLIDO, error=str(e), estadisticas=estadisticas)
+            return
+        if resultado:
+            self._actualizar(trabajo, estado=COMPLETADO, progreso=1.0, resultado=resultado,
+                             estadisticas=resultado.get('estadisticas'))
+        else:
+            self._actualizar(trabajo, estado=FALLIDO, error="No se encontró el archivo descargado")
+
+    def _ejecutar_lote(self, trabajo, max_paralelos=3):
+        self._actualizar(trabajo, estado=DESCARGANDO)
+        downloader = self._crear_descargador(trabajo)
+        try:
+            elementos = downloader.expandir_lote(trabajo.url)
+            self._actualizar(trabajo, total_elementos=len(elementos))
+            for resultado in downloader.descargar_lote(elementos, max_trabajadores=max_paralelos):
+                with self._lock:
+                    trabajo.elementos.append(resultado)
+                self._actualizar(trabajo, estado=DESCARGANDO,
+                                 progreso=len(trabajo.elementos) / max(len(elementos), 1))
+        except Exception as e:
+            self._actualizar(trabajo, estado=FALLIDO, error=str(e))
+            return
+        self._actualizar(trabajo, estado=COMPLETADO, progreso=1.0)
@@ -1,47 +1,205 @@
 from abc import ABC, abstractmethod
+import asyncio
+import contextlib
+import contextvars
 import yt_dlp
 import os
-import re
+import shutil
+import threading
 import time
-from tqdm import tqdm
-import subprocess
-import mutagen
-from mutagen.easyid3 import EasyID3
-from mutagen.mp3 import MP3
-
-class ProgressHook:
-    def __init__(self):
-        self.pbar = None
-
-    def __call__(self, d):
-        if d['status'] == 'downloading':
-            if self.pbar is None:
-                total = d.get('total_bytes', 0) or d.get('total_bytes_estimate', 0)
-                self.pbar = tqdm(total=total, unit='B', unit_scale=True, desc="Descargando")
-            
-            downloaded = d.get('downloaded_bytes', 0)
-            self.pbar.update(downloaded - self.pbar.n)
-            
-        elif d['status'] == 'finished':
-            if self.pbar:
-                self.pbar.close()
-                self.pbar = None
-            print("\nDescarga completada, procesando archivo...")
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import IncompleteRead
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessorError
+from coalescing import VuelosCompartidos, bloqueo_archivo_async
+from download_cache import CacheDescargas
+from info_cache import CacheInfo
+from canonical_url import canonicalizar, recorte_temporal, url_canonica, YOUTUBE, SOUNDCLOUD
+from postprocessors import AudioEtiquetadoPP, ContenedorMP4PP
+from registry import Registro
+from scheduler import PLANIFICADOR, PRIORIDAD_AUDIO, PRIORIDAD_VIDEO
+from session_pool import PoolSesiones
+from storage import Almacenamiento, PATRON_PARCIAL
+from retry_policy import (PoliticaReintentos, PERMANENTE, circuito_para, clasificar_error, es_error_de_formato,
+                          estado_http)
+from telemetry import EXTRACCION, TELEMETRIA
+from thumbnail_cache import CacheMiniaturas
+
+# Descargas en curso en este proceso, compartidas por todas las instancias
+VUELOS = VuelosCompartidos()
+# Instancias de YoutubeDL (con sus conexiones keep-alive) que se reutilizan entre descargas
+POOL = PoolSesiones()
+# Receptor del progreso de la llamada a descargar_async en curso (se hereda en los hilos auxiliares)
+_PROGRESO = contextvars.ContextVar('progreso_descarga', default=None)
+# Aviso de un lote de que la descarga en curso ya no usa la red (ver descargar_lote)
+_FIN_TRANSFERENCIA = contextvars.ContextVar('fin_transferencia', default=None)
+# Elemento de un lote que se está descargando (su URL y su extractor ya los resolvió expandir_lote)
+_ELEMENTO_LOTE = contextvars.ContextVar('elemento_lote', default=None)
+# Información completa extraída en la llamada a descargar en curso, por URL (ver _extraer_info_descarga)
+_INFO_DESCARGA = contextvars.ContextVar('info_descarga', default=None)
+# Cada cuánto se vuelve a mirar una descarga que tiene en marcha otra réplica (con backoff hasta este máximo)
+ESPERA_MAXIMA_REPLICA = 5.0
+# Contenedores que ffmpeg lee de una tubería sin volver atrás (un MP4/M4A puede tener el índice al final)
+CONTENEDORES_EN_FLUJO = ('webm', 'weba', 'mp3', 'ogg', 'opus', 'aac', 'flac', 'wav')
+# Niveles de playlists dentro de playlists que se recorren en un lote (canal → pestaña → videos)
+PROFUNDIDAD_MAXIMA_LOTE = 3
+# Bytes que se leen de la red en cada bloque al convertir en flujo
+TAMAÑO_BLOQUE_FLUJO = 256 * 1024
+# Veces seguidas que se reanuda un rango cortado antes de dar el intento por fallido
+INTENTOS_RANGO_FLUJO = 5
+
+
+class DescargaCancelada(Exception):
+    """Se lanza desde los hooks de yt-dlp para cortar una transferencia cuya tarea se canceló."""
+
+
+class DescargaAsync:
+    """Descarga en curso devuelta por descargar_async.
+
+    Se espera con `await` para obtener el resultado y se recorre con `async for` para recibir los
+    eventos de progreso (los mismos dicts que recibe el callback `progreso`). cancel() la detiene:
+    corta la transferencia y mata el ffmpeg en curso borrando su salida a medias.
+
+    La extracción y la transferencia de yt-dlp son síncronas: mientras avanzan ocupan un hilo del
+    ejecutor por defecto del bucle (asyncio.to_thread), así que ese ejecutor limita cuántas corren
+    a la vez. Las esperas (bloqueos, reintentos, turnos de ffmpeg) y ffmpeg no ocupan hilo. La
+    cancelación es cooperativa: la transferencia se corta en el siguiente bloque que llega.
+    """
+
+    def __init__(self, corrutina):
+        self._bucle = asyncio.get_running_loop()
+        self._cola = asyncio.Queue()
+        self._terminada = False
+        self._tarea = self._bucle.create_task(self._ejecutar(corrutina))
+        self._tarea.add_done_callback(lambda _: self._cola.put_nowait(None))
+
+    async def _ejecutar(self, corrutina):
+        # Cada tarea tiene su propia copia del contexto: el receptor no se filtra a otras descargas
+        _PROGRESO.set(self._publicar)
+        return await corrutina
+
+    def _publicar(self, d):
+        # Los hooks de yt-dlp se llaman desde el hilo de la transferencia
+        self._bucle.call_soon_threadsafe(self._cola.put_nowait, d)
+
+    def __await__(self):
+        return self._tarea.__await__()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._terminada:
+            raise StopAsyncIteration
+        evento = await self._cola.get()
+        if evento is None:
+            self._terminada = True
+            raise StopAsyncIteration
+        return evento
+
+    def cancel(self):
+        return self._tarea.cancel()
+
+    def done(self):
+        return self._tarea.done()
+
 
 class MediaDownloader(ABC):
-    def __init__(self, carpeta_destino="descargas"):
+    PLATAFORMA = None
+    # Turno en el pool de ffmpeg frente a otras descargas (ver scheduler)
+    PRIORIDAD = PRIORIDAD_VIDEO
+
+    def __init__(self, carpeta_destino="descargas", progreso=None, cache=True,
+                 fragmentos_concurrentes=4, tamaño_chunk_http=10 * 1024 * 1024, descargador_externo=None,
+                 politica_reintentos=None, cache_info=True, telemetria=None, almacenamiento=True,
+                 planificador=None, miniaturas=True, registro_compartido=True):
         self.carpeta_destino = carpeta_destino
+        self.progreso = progreso
+        self.telemetria = telemetria or TELEMETRIA
+        self.planificador = planificador or PLANIFICADOR
+        self.politica_reintentos = politica_reintentos or PoliticaReintentos()
+        self.fragmentos_concurrentes = fragmentos_concurrentes
+        self.tamaño_chunk_http = tamaño_chunk_http
+        self.descargador_externo = descargador_externo
+        self.registro_compartido = (Registro(carpeta_destino) if registro_compartido is True
+                                    else registro_compartido or None)
+        if cache is True:
+            # Los archivos terminados se guardan como artefactos del registro: sin él no hay caché de descargas
+            cache = self.registro_compartido and CacheDescargas(carpeta_destino, self.registro_compartido)
+        self.cache = cache or None
+        self.cache_info = CacheInfo(carpeta_destino) if cache_info is True else cache_info or None
+        self.miniaturas = CacheMiniaturas(carpeta_destino) if miniaturas is True else miniaturas or None
         if not os.path.exists(carpeta_destino):
             os.makedirs(carpeta_destino)
+        if almacenamiento is True:
+            # La cuota se lleva con los archivos que registra la caché, sin recorrer la carpeta
+            almacenamiento = Almacenamiento(carpeta_destino, registro=self.cache and self.cache.registro)
+        self.almacenamiento = almacenamiento or None
+        if self.almacenamiento:
+            self.almacenamiento.barrer_al_iniciar()
 
-    @abstractmethod
     def validar_url(self, url):
-        pass
+        canonica = canonicalizar(url)
+        return canonica is not None and canonica.plataforma == self.PLATAFORMA
+
+    def normalizar_url(self, url):
+        """Devuelve la misma URL para todas las variantes (youtu.be, shorts, m., music., ?si=...)."""
+        canonica = canonicalizar(url)
+        return (canonica and url_canonica(canonica)) or url
+
+    def _url_valida(self, url, mensaje):
+        """Normaliza la URL y lanza ValueError(mensaje) si no es de esta plataforma.
+
+        Las URLs de los elementos de un lote se aceptan tal cual: las devolvió el extractor de la
+        playlist y pueden no tener forma de enlace público (p. ej. las de api-v2 de un set de SoundCloud).
+        """
+        elemento = _ELEMENTO_LOTE.get()
+        if elemento is not None and elemento['url'] == url:
+            return url
+        url = self.normalizar_url(url)
+        if not self.validar_url(url):
+            raise ValueError(mensaje)
+        return url
 
     @abstractmethod
-    def descargar(self, url):
+    async def _descargar(self, url, intentos_maximos=3, recorte=None):
         pass
 
+    def descargar(self, url, intentos_maximos=3, inicio=None, fin=None, corte_preciso=False):
+        """Descarga bloqueando el hilo hasta terminar (envoltorio de la versión asíncrona).
+
+        Con `inicio` y/o `fin` (segundos o textos como '1:30' o '2m') solo se descarga y procesa
+        ese fragmento. Los cortes caen en el fotograma clave más cercano salvo con `corte_preciso`,
+        que re-codifica los extremos.
+        """
+        recorte = recorte_temporal(inicio, fin, corte_preciso)
+        return asyncio.run(self._descargar_con_info(url, intentos_maximos, recorte))
+
+    def descargar_async(self, url, intentos_maximos=3, inicio=None, fin=None, corte_preciso=False):
+        """Empieza la descarga en el bucle de eventos actual y devuelve una DescargaAsync."""
+        recorte = recorte_temporal(inicio, fin, corte_preciso)
+        return DescargaAsync(self._descargar_con_info(url, intentos_maximos, recorte))
+
+    async def _descargar_con_info(self, url, intentos_maximos, recorte):
+        # Los intentos y el formato alternativo de esta descarga comparten una sola extracción
+        token = _INFO_DESCARGA.set({})
+        try:
+            return await self._descargar(url, intentos_maximos, recorte)
+        finally:
+            _INFO_DESCARGA.reset(token)
+
+    def _opciones_recorte(self, ydl_opts, recorte):
+        """Opciones de yt-dlp para bajar solo el fragmento: rangos de descarga y un nombre de archivo propio."""
+        if recorte is None:
+            return ydl_opts
+        return {
+            **ydl_opts,
+            'download_ranges': yt_dlp.utils.download_range_func(None, [recorte.rango]),
+            'force_keyframes_at_cuts': recorte.preciso,
+            # El fragmento no debe pisar al archivo completo (ni a otros fragmentos) en la misma carpeta
+            'outtmpl': ydl_opts['outtmpl'].replace('.%(ext)s', f' [{recorte.etiqueta}].%(ext)s'),
+        }
+
     def formatear_tamaño(self, tamaño_bytes):
         if tamaño_bytes is None:
             return "N/A"
@@ -51,186 +209,836 @@ class MediaDownloader(ABC):
             tamaño_bytes /= 1024
         return f"{tamaño_bytes:.1f}TB"
 
-    def _procesar_descarga(self, url, ydl_opts, intentos_maximos):
+    def expandir_lote(self, urls_o_playlist):
+        """Convierte una URL, una lista de URLs o una playlist/canal en la lista plana de elementos a descargar.
+
+        Las playlists se extraen en modo plano (sin resolver cada video), que solo cuesta una
+        petición por página de la playlist. Las playlists anidadas, como las pestañas de un canal
+        (Videos, Shorts, Directos), se recorren también.
+        """
+        urls = urls_o_playlist.split() if isinstance(urls_o_playlist, str) else list(urls_o_playlist)
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': 'in_playlist',
+            'noplaylist': False,
+        }
+        elementos, vistos = [], set()
+        with self._sesion(ydl_opts) as ydl:
+            for url in urls:
+                vistos.add(url)
+                info = ydl.extract_info(url, download=False, process=False)
+                self._expandir(ydl, info, url, elementos, vistos)
+        return elementos
+
+    def _expandir(self, ydl, info, url, elementos, vistos, profundidad=0):
+        """Añade a `elementos` los videos de `info`, resolviendo redirecciones y playlists anidadas."""
+        if profundidad > PROFUNDIDAD_MAXIMA_LOTE:
+            return
+        tipo = info.get('_type', 'video')
+        if tipo in ('url', 'url_transparent') or (tipo == 'playlist' and info.get('entries') is None):
+            # Redirección o playlist sin entradas (p. ej. la pestaña de un canal): se extrae con su extractor
+            destino = info.get('url') or info.get('webpage_url')
+            if not destino or (profundidad and destino in vistos):
+                return
+            vistos.add(destino)
+            resuelta = ydl.extract_info(destino, ie_key=info.get('ie_key'), download=False, process=False)
+            self._expandir(ydl, resuelta, destino, elementos, vistos, profundidad + 1)
+            return
+        if tipo != 'playlist':
+            # Video suelto: la información ya extraída queda en la caché para la vista previa
+            if self.cache_info:
+                self.cache_info.guardar(self._clave_info(url), info)
+            elementos.append({'url': url, 'id': info.get('id'), 'extractor': info.get('extractor_key'),
+                              'ie_key': info.get('extractor_key'), 'titulo': info.get('title')})
+            return
+        for entrada in info.get('entries') or []:
+            if not entrada:
+                continue
+            url_entrada = entrada.get('url') or entrada.get('webpage_url')
+            anidada = entrada.get('_type') == 'playlist' or (
+                # Una entrada del mismo extractor que la playlist es otra playlist, no un video
+                entrada.get('_type') in ('url', 'url_transparent')
+                and entrada.get('ie_key') and entrada.get('ie_key') == info.get('extractor_key'))
+            if anidada:
+                self._expandir(ydl, entrada, url_entrada, elementos, vistos, profundidad + 1)
+            elif url_entrada and url_entrada not in vistos:
+                vistos.add(url_entrada)
+                elementos.append({'url': url_entrada, 'id': entrada.get('id'),
+                                  'extractor': entrada.get('ie_key') or info.get('extractor_key'),
+                                  'ie_key': entrada.get('ie_key'), 'titulo': entrada.get('title')})
+
+    def descargar_lote(self, urls_o_playlist, max_trabajadores=3, intentos_maximos=3):
+        """Descarga varias URLs o una playlist en paralelo y va devolviendo cada resultado al terminar.
+
+        Acepta también la lista ya expandida por expandir_lote. Los elementos que ya están en la caché
+        con las opciones de este descargador (y cuyo archivo sigue en disco) se devuelven como omitidos,
+        con su información, sin acceder a la red. `max_trabajadores` limita las descargas simultáneas:
+        un elemento que ya solo post-procesa cede su turno al siguiente.
+        """
+        if isinstance(urls_o_playlist, list) and all(isinstance(e, dict) for e in urls_o_playlist):
+            elementos = urls_o_playlist
+        else:
+            elementos = self.expandir_lote(urls_o_playlist)
+
+        pendientes = []
+        for elemento in elementos:
+            media_info = self._ya_descargado(elemento['url'])
+            if media_info:
+                yield {**elemento, 'estado': 'omitido', 'info': media_info}
+            else:
+                pendientes.append(elemento)
+
+        # Hasta max_trabajadores elementos descargando y otros tantos post-procesando a la vez
+        turnos = threading.BoundedSemaphore(max_trabajadores)
+        pool = ThreadPoolExecutor(max_workers=2 * max_trabajadores, thread_name_prefix="tubegrab-lote")
+        try:
+            futuros = [pool.submit(self._descargar_elemento, e, intentos_maximos, turnos) for e in pendientes]
+            for futuro in as_completed(futuros):
+                yield futuro.result()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _descargar_elemento(self, elemento, intentos_maximos, turnos=None):
+        pendiente = threading.Lock()
+
+        def liberar():
+            # Una sola vez por elemento: al acabar la transferencia o, si no llega a avisar, al terminar
+            if turnos is not None and pendiente.acquire(blocking=False):
+                turnos.release()
+
+        if turnos is not None:
+            turnos.acquire()
+        token = _FIN_TRANSFERENCIA.set(liberar)
+        token_elemento = _ELEMENTO_LOTE.set(elemento)
+        try:
+            media_info = self.descargar(elemento['url'], intentos_maximos=intentos_maximos)
+        except Exception as e:
+            return {**elemento, 'estado': 'fallido', 'error': str(e)}
+        finally:
+            _ELEMENTO_LOTE.reset(token_elemento)
+            _FIN_TRANSFERENCIA.reset(token)
+            liberar()
+        if not media_info:
+            return {**elemento, 'estado': 'fallido', 'error': "No se encontró el archivo descargado"}
+        return {**elemento, 'estado': 'completado', 'info': media_info}
+
+    def _ya_descargado(self, url):
+        """media_info del archivo en caché para esta URL con las opciones de este descargador, o None.
+
+        No accede a la red. Si el archivo se borró (p. ej. por la cuota de disco), la caché olvida
+        la entrada y el elemento se vuelve a descargar.
+        """
+        ydl_opts = self._opciones_descarga()
+        if not self.cache or ydl_opts is None:
+            return None
+        return self.cache.obtener(self._clave_cache(url, ydl_opts))
+
+    def _opciones_descarga(self):
+        """Opciones de yt-dlp con las que se descarga normalmente (None si no se conocen de antemano)."""
+        return None
+
+    def obtener_info(self, url):
+        """Información básica para el panel de vista previa; tras la primera vez sale de la caché."""
+        info = self._extraer_info(self.normalizar_url(url))
+        return {
+            'titulo': info.get('title'),
+            'duracion': info.get('duration'),
+            'vistas': f"{info.get('view_count') or 0:,}",
+            'thumbnail': info.get('thumbnail'),
+            'autor': info.get('uploader') or info.get('channel'),
+            'url': url,
+        }
+
+    def _clave_info(self, url):
+        return CacheInfo.clave(*self._identificar(url))
+
+    def _extraer_info(self, url):
+        """Información del video para la vista previa y la lista de formatos, desde la caché si se puede.
+
+        Es la copia aligerada de la caché (JSON, sin campos voluminosos): no sirve para descargar.
+        """
+        clave = self._clave_info(url) if self.cache_info else None
+        info = self.cache_info.obtener(clave) if clave else None
+        if info is not None:
+            return info
+        with self._sesion({'quiet': True, 'no_warnings': True, 'noplaylist': True}) as ydl:
+            info = self._extraer(ydl, url)
+        return self.cache_info.guardar(clave, info) if clave else info
+
+    def _extraer_info_descarga(self, url, ydl):
+        """Información completa del video para descargarlo, tal como la devuelve el extractor.
+
+        No sale de la caché: algunos formatos generan sus fragmentos al descargar (callables,
+        LazyList) y eso no sobrevive a la copia aligerada. Se extrae una vez por llamada a
+        descargar y, de paso, se refresca la caché de la vista previa.
+        """
+        extraidas = _INFO_DESCARGA.get()
+        if extraidas is not None and url in extraidas:
+            return extraidas[url]
+        info = self._extraer(ydl, url)
+        if self.cache_info:
+            self.cache_info.guardar(self._clave_info(url), info)
+        if extraidas is not None:
+            extraidas[url] = info
+        return info
+
+    @staticmethod
+    def _copia_info(info):
+        """Copia de la información que process_ie_result puede modificar sin tocar la extraída.
+
+        No es una copia profunda: los fragmentos generados pueden ser métodos del extractor
+        (y con él, de la instancia de YoutubeDL), que no se pueden ni se deben duplicar.
+        """
+        listas = {campo: [dict(e) for e in info[campo]] for campo in ('formats', 'thumbnails')
+                  if isinstance(info.get(campo), list)}
+        return {**info, **listas}
+
+    def _olvidar_info(self, url):
+        """Descarta la información extraída de la URL para que el siguiente intento la vuelva a pedir."""
+        extraidas = _INFO_DESCARGA.get()
+        if extraidas is not None:
+            extraidas.pop(url, None)
+        if self.cache_info:
+            self.cache_info.invalidar(self._clave_info(url))
+
+    def _extraer(self, ydl, url):
+        """Extrae la información del video sin resolver formatos."""
+        # Un elemento de lote se extrae con el extractor que indicó su playlist
+        elemento = _ELEMENTO_LOTE.get()
+        ie_key = elemento.get('ie_key') if elemento is not None and elemento['url'] == url else None
+        return ydl.extract_info(url, ie_key=ie_key, download=False, process=False)
+
+    def _descarga_final(self, info):
+        """Información del archivo descargado, como la reciben los post-procesadores de yt-dlp.
+
+        Las entradas de `requested_downloads` solo guardan lo propio del formato: el título, el
+        autor y las miniaturas escritas siguen en la información del video.
+        """
+        for descarga in info.get('requested_downloads') or []:
+            if descarga.get('filepath'):
+                return {**{k: v for k, v in info.items() if k != 'requested_downloads'}, **descarga}
+        return info
+
+    def _postprocesadores(self, ydl):
+        """Post-procesadores propios que se ejecutan tras los declarados en ydl_opts."""
+        return []
+
+    def _ajustes_postprocesado(self):
+        """Ajustes de los post-procesadores propios que influyen en el archivo final."""
+        return {}
+
+    def _opciones_motor(self):
+        """Opciones de yt-dlp del motor de descarga: fragmentos en paralelo, rangos HTTP y aria2c.
+
+        aria2c (`descargador_externo='aria2c'`, o 'auto' para usarlo si está instalado) no avisa
+        a los hooks en cada bloque: la cancelación espera a que termine y el límite de ancho de
+        banda es el que tocaba al arrancar. Por eso el motor por defecto es el de yt-dlp.
+        """
+        opciones = {
+            'concurrent_fragment_downloads': self.fragmentos_concurrentes,
+            'http_chunk_size': self.tamaño_chunk_http,
+        }
+        externo = self.descargador_externo
+        if externo == 'auto':
+            externo = 'aria2c' if shutil.which('aria2c') else None
+        if externo == 'aria2c':
+            conexiones = str(max(self.fragmentos_concurrentes, 1))
+            opciones['external_downloader'] = {'default': 'aria2c'}
+            opciones['external_downloader_args'] = {
+                'aria2c': ['-x', conexiones, '-s', conexiones, '-k', '1M', '--file-allocation=none'],
+            }
+        elif externo:
+            opciones['external_downloader'] = {'default': externo}
+        return opciones
+
+    def _sesion(self, ydl_opts, rutas=None, progreso=(), postprocesado=()):
+        """Presta del pool una instancia de YoutubeDL con estas opciones."""
+        perfil = PoolSesiones.perfil(ydl_opts, self._crear_ydl.__qualname__)
+        return POOL.sesion(perfil, self._crear_ydl, ydl_opts, rutas=rutas, progreso=progreso,
+                           postprocesado=postprocesado)
+
+    def _crear_ydl(self, ydl_opts):
+        """Construye una instancia nueva para el pool (las subclases pueden registrar extractores propios)."""
+        return yt_dlp.YoutubeDL(ydl_opts)
+
+    def _identificar(self, url):
+        """Obtiene (extractor, id) de la URL sin acceder a la red."""
+        canonica = canonicalizar(url)
+        if canonica and canonica.id:
+            return {YOUTUBE: 'Youtube', SOUNDCLOUD: 'Soundcloud'}[canonica.plataforma], canonica.id
+        for ie in yt_dlp.extractor.gen_extractor_classes():
+            if ie.suitable(url):
+                return ie.ie_key(), ie.get_temp_id(url) or url
+        return None, url
+
+    def _clave_cache(self, url, ydl_opts):
+        extractor, video_id = self._identificar(url)
+        postprocesado = {
+            'postprocessors': ydl_opts.get('postprocessors'),
+            'merge_output_format': ydl_opts.get('merge_output_format'),
+            'propios': self._ajustes_postprocesado(),
+        }
+        if ydl_opts.get('download_ranges'):
+            postprocesado['recorte'] = [repr(ydl_opts['download_ranges']), bool(ydl_opts.get('force_keyframes_at_cuts'))]
+        return CacheDescargas.clave(extractor, video_id, ydl_opts.get('format'), postprocesado)
+
+    async def _procesar_descarga(self, url, ydl_opts, intentos_maximos, recorte=None):
+        ydl_opts = self._opciones_recorte(ydl_opts, recorte)
+        clave = self._clave_cache(url, ydl_opts)
+        if self.cache:
+            media_info = self.cache.obtener(clave)
+            self.telemetria.emitir('cache', url=url, acierto=bool(media_info))
+            if media_info:
+                print(f"\nArchivo encontrado en caché: {media_info['archivo']}")
+                self._tocar(media_info)
+                return media_info
+
+        # Si otra petición idéntica ya está descargando, esta se une a ella en lugar de repetirla
+        return await VUELOS.ejecutar_async(
+            clave,
+            lambda emitir: self._descargar_en_exclusiva(url, ydl_opts, intentos_maximos, clave, emitir, recorte),
+            progreso=[self.progreso, _PROGRESO.get()],
+        )
+
+    async def _descargar_en_exclusiva(self, url, ydl_opts, intentos_maximos, clave, emitir, recorte=None):
+        # El bloqueo de archivo cubre a otros procesos de esta máquina; el registro, a otras réplicas
+        async with bloqueo_archivo_async(self.carpeta_destino, clave), \
+                self._turno_compartido(url, clave, recorte) as media_info:
+            if media_info:
+                print(f"\nArchivo descargado por otro proceso: {media_info['archivo']}")
+                self._tocar(media_info)
+                return media_info
+
+            medicion = self.telemetria.medicion(clave[:16], url=url, extractor=self._identificar(url)[0])
+            rutas = self._rutas(url)
+            cancelar = threading.Event()
+            vigilar = self._vigilante(cancelar)
+            postprocesado = [emitir, medicion.hook_postprocesado]
+
+            def frenar(d):
+                # Los hooks solo se llaman con la instancia ya prestada (ydl)
+                self.planificador.ancho.frenar(ydl.params, d)
+            # Una sola instancia para todos los intentos: los .part se reanudan en lugar de empezar de cero
+            ydl_opts = {**self._opciones_motor(), **ydl_opts, 'continuedl': True}
+            try:
+                # yt-dlp y los post-procesadores trabajan en el área temporal; el resultado se publica al final
+                with self._sesion(ydl_opts, rutas={'home': rutas.get('temp', rutas['home'])},
+                                  progreso=[vigilar, emitir, medicion.hook_progreso, frenar],
+                                  postprocesado=[vigilar, *postprocesado]) as ydl, \
+                        self.planificador.ancho.reparto(ydl.params):
+                    media_info = await self._descargar_con_reintentos(
+                        ydl, url, intentos_maximos, medicion, cancelar, postprocesado)
+                if media_info and 'archivo' in media_info:
+                    self._publicar(media_info, rutas)
+            except asyncio.CancelledError as e:
+                medicion.terminar(error=e, clasificacion='cancelada')
+                raise
+            except Exception as e:
+                medicion.terminar(error=e, clasificacion=clasificar_error(e))
+                raise
+            medicion.terminar()
+            if media_info and 'archivo' in media_info:
+                self._finalizar(media_info)
+                await asyncio.to_thread(self._guardar, clave, media_info, rutas)
+            return media_info
+
+    @contextlib.asynccontextmanager
+    async def _turno_compartido(self, url, clave, recorte=None):
+        """Turno de la descarga en el registro compartido entre réplicas.
+
+        Entrega el media_info si el archivo ya existe o lo termina otra réplica mientras se espera.
+        Si no, reclama el lease, late mientras dura el bloque y lo libera al salir. Si el proceso
+        muere, el lease caduca y otra réplica reanuda la descarga desde los .part.
+        """
+        # Lo necesario para volver a encolar la descarga si queda huérfana
+        opciones = {'inicio': recorte.inicio, 'fin': recorte.fin, 'corte_preciso': recorte.preciso} if recorte else {}
+        espera = 0.5
+        while True:
+            media_info = self.cache.obtener(clave) if self.cache else None
+            if media_info or not self.registro_compartido:
+                yield media_info
+                return
+            if await asyncio.to_thread(self.registro_compartido.reclamar, clave, url, type(self).__name__, opciones):
+                break
+            if espera == 0.5:
+                print("\nOtra réplica está descargando este archivo; esperando a que termine...")
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, ESPERA_MAXIMA_REPLICA)
+
+        latidos = asyncio.create_task(self._latir(clave))
+        try:
+            yield None
+        finally:
+            latidos.cancel()
+            await asyncio.to_thread(self.registro_compartido.liberar, clave)
+
+    async def _latir(self, clave):
+        """Renueva el lease de la descarga cada tercio de su duración."""
+        while True:
+            await asyncio.sleep(self.registro_compartido.duracion_lease / 3)
+            try:
+                if not await asyncio.to_thread(self.registro_compartido.latir, clave):
+                    print("\nAviso: el lease de la descarga caducó y otra réplica la ha reclamado")
+                    return
+            except Exception as e:
+                print(f"\nError al renovar el lease de la descarga: {str(e)}")
+
+    def descargados(self, url):
+        """Archivos ya descargados de este video por cualquier réplica, del último usado al primero."""
+        if not self.registro_compartido:
+            return []
+        artefactos = self.registro_compartido.artefactos_de(*self._identificar(self.normalizar_url(url)))
+        return [a['media_info'] for a in artefactos if os.path.exists(a['ruta'])]
+
+    def _guardar(self, clave, media_info, rutas):
+        """Registra el archivo en la caché y aplica la cuota de disco (va en un hilo)."""
+        if self.cache:
+            self.cache.guardar(clave, media_info, *self._identificar(media_info['url']))
+        if self.almacenamiento:
+            self.almacenamiento.limpiar_temporal(rutas)
+            self.almacenamiento.aplicar_cuota(proteger=[media_info['archivo']])
+
+    def _rutas(self, url):
+        """Carpeta final y temporal de la descarga (opción `paths` de yt-dlp)."""
+        if not self.almacenamiento:
+            return {'home': self.carpeta_destino}
+        return self.almacenamiento.rutas(*self._identificar(url))
+
+    def _publicar(self, media_info, rutas):
+        """Mueve con un rename el archivo terminado y sus miniaturas del área temporal a su carpeta final."""
+        origen = os.path.dirname(media_info['archivo'])
+        if 'temp' not in rutas or os.path.abspath(origen) == os.path.abspath(rutas['home']):
+            return
+        os.makedirs(rutas['home'], exist_ok=True)
+        base = os.path.splitext(os.path.basename(media_info['archivo']))[0]
+        for nombre in os.listdir(origen):
+            if not nombre.startswith(base + '.') or PATRON_PARCIAL.search(nombre):
+                continue
+            destino = os.path.join(rutas['home'], nombre)
+            os.replace(os.path.join(origen, nombre), destino)
+            if nombre == os.path.basename(media_info['archivo']):
+                media_info['archivo'] = destino
+
+    def _tocar(self, media_info):
+        if self.almacenamiento:
+            self.almacenamiento.tocar(media_info['archivo'])
+
+    def _finalizar(self, media_info):
+        """Último retoque del archivo antes de registrarlo en la caché."""
+
+    @staticmethod
+    def _vigilante(cancelar):
+        """Hook de yt-dlp que corta la transferencia en cuanto se pide cancelar la descarga."""
+        def vigilar(d):
+            if cancelar.is_set():
+                raise DescargaCancelada("Descarga cancelada")
+        return vigilar
+
+    @staticmethod
+    async def _en_hilo(cancelar, funcion, *args):
+        """Ejecuta en un hilo del ejecutor por defecto el trabajo bloqueante de yt-dlp.
+
+        Si se cancela la tarea, avisa al hilo (los hooks lanzan DescargaCancelada en el siguiente
+        bloque) y espera a que suelte los archivos antes de propagar la cancelación.
+        """
+        hilo = asyncio.ensure_future(asyncio.to_thread(funcion, *args))
+        try:
+            return await asyncio.shield(hilo)
+        except asyncio.CancelledError:
+            cancelar.set()
+            try:
+                await hilo
+            except Exception:
+                pass
+            raise
+
+    async def _descargar_con_reintentos(self, ydl, url, intentos_maximos, medicion, cancelar, postprocesado):
+        circuito = circuito_para(url)
+        estadisticas = {'intentos': 0, 'reintentos': 0, 'espera_total': 0.0}
         for intento in range(intentos_maximos):
+            estadisticas['intentos'] = intento + 1
             try:
                 print(f"\nIntento {intento + 1} de {intentos_maximos}")
-                
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    # Obtener información del video/audio
-                    info = ydl.extract_info(url, download=False)
-                    
-                    # Crear diccionario con la información
-                    media_info = {
-                        'titulo': info['title'],
-                        'duracion': info.get('duration', 'N/A'),
-                        'vistas': f"{info.get('view_count', 0):,}",
-                        'url': url,
-                        'thumbnail': info.get('thumbnail'),
-                        'formato': 'MP3' if 'audio' in ydl_opts.get('format', '') else 'MP4'
-                    }
-                    
-                    print(f"\nTítulo: {media_info['titulo']}")
-                    print(f"Duración: {media_info['duracion']} segundos")
-                    if media_info['vistas'] != '0':
-                        print(f"Vistas: {media_info['vistas']}")
-                    
-                    print("\nIniciando descarga...")
-                    ydl.download([url])
-                    
-                    # Obtener la ruta del archivo descargado
-                    extension = 'mp3' if 'audio' in ydl_opts.get('format', '') else 'mp4'
-                    archivo_descargado = os.path.join(self.carpeta_destino, f"{info['title']}.{extension}")
-                    
-                    if os.path.exists(archivo_descargado):
-                        media_info['archivo'] = archivo_descargado
-                        print(f"\n¡Descarga completada! El archivo se ha guardado en la carpeta '{self.carpeta_destino}'")
-                        return media_info
-                    
-                    return None
-                
+                circuito.comprobar()
+                media_info = await self._intento_descarga(ydl, url, medicion, cancelar, postprocesado)
+                circuito.registrar_exito()
+                if media_info:
+                    media_info['estadisticas'] = estadisticas
+                return media_info
+
             except Exception as e:
-                error_msg = str(e)
-                print(f"\nError en intento {intento + 1}: {error_msg}")
-                
-                if intento < intentos_maximos - 1:
-                    print("Reintentando en 3 segundos...")
-                    time.sleep(3)
-                else:
-                    print("\nSe agotaron los intentos de descarga.")
-                    raise e
+                e.estadisticas = estadisticas
+                print(f"\nError en intento {intento + 1}: {str(e)}")
+
+                espera = self.politica_reintentos.tras_fallo(e, intento, intentos_maximos, circuito)
+                if espera is None:
+                    if self.politica_reintentos.reintentable(e):
+                        print("\nSe agotaron los intentos de descarga.")
+                    else:
+                        print("El error no se soluciona reintentando.")
+                    raise
+                if estado_http(e) == 403:
+                    # Las URLs firmadas de los formatos pueden haber caducado: volver a extraer
+                    self._olvidar_info(url)
+
+                medicion.reintento(intento + 1, espera, e, clasificar_error(e))
+                print(f"Reintentando en {espera:.1f} segundos...")
+                await asyncio.sleep(espera)
+                estadisticas['reintentos'] += 1
+                estadisticas['espera_total'] += espera
+
+    async def _intento_descarga(self, ydl, url, medicion, cancelar, postprocesado):
+        # Obtener información del video/audio (se reutiliza entre intentos)
+        with medicion.fase(EXTRACCION):
+            info = await self._en_hilo(cancelar, self._extraer_info_descarga, url, ydl)
+
+        # Crear diccionario con la información
+        media_info = {
+            'titulo': info['title'],
+            'duracion': info.get('duration', 'N/A'),
+            'vistas': f"{info.get('view_count') or 0:,}",
+            'url': url,
+            'thumbnail': info.get('thumbnail'),
+            'formato': 'MP3' if 'audio' in ydl.params.get('format', '') else 'MP4'
+        }
+
+        print(f"\nTítulo: {media_info['titulo']}")
+        print(f"Duración: {media_info['duracion']} segundos")
+        if media_info['vistas'] != '0':
+            print(f"Vistas: {media_info['vistas']}")
+
+        print("\nIniciando descarga...")
+        # Nadie más puede escribir en la misma ruta de salida (.part, intermedios y archivo final)
+        ruta_salida = os.path.splitext(ydl.prepare_filename(info))[0]
+        async with bloqueo_archivo_async(self.carpeta_destino, os.path.abspath(ruta_salida)):
+            # Descargar a partir de la información ya extraída, sin volver a extraerla
+            medicion.iniciar_descarga()
+            final = None
+            if self._postprocesador_en_flujo(ydl):
+                final = await self._descargar_en_flujo(ydl, url, info, cancelar, postprocesado)
+            if final is None:
+                # Tras un intento cuyo post-procesado falló, la instancia vuelve al reparto de ancho de banda
+                self.planificador.ancho.entrar(ydl.params)
+                resultado = await self._en_hilo(cancelar, ydl.process_ie_result, self._copia_info(info), True)
+                self._avisar_fin_transferencia(ydl)
+                descarga = self._descarga_final(resultado)
+                self._preparar_miniatura(url, descarga)
+                final = await self._postprocesar(ydl, descarga, postprocesado)
+
+        # Obtener la ruta real del archivo descargado
+        archivo_descargado = final.get('filepath')
+
+        if archivo_descargado and os.path.exists(archivo_descargado):
+            media_info['archivo'] = archivo_descargado
+            if final.get('pipeline'):
+                media_info['pipeline'] = final['pipeline']
+            if final.get('section_start') is not None:
+                media_info['recorte'] = (final['section_start'], final.get('section_end'))
+            media_info['formato'] = os.path.splitext(archivo_descargado)[1].lstrip('.').upper()
+            print(f"\n¡Descarga completada! El archivo se ha guardado en la carpeta '{self.carpeta_destino}'")
+            return media_info
+
+        return None
+
+    def _postprocesador_en_flujo(self, ydl):
+        """Post-procesador capaz de convertir el medio mientras se descarga, o None."""
+        return None
+
+    async def _descargar_en_flujo(self, ydl, url, info, cancelar, hooks):
+        """Descarga y convierte a la vez: los bytes pasan de la red a la entrada estándar de ffmpeg.
+
+        El original no se escribe en disco. Devuelve None si el formato elegido necesita una
+        entrada con saltos (MP4/M4A), va por fragmentos o hay que unir varios, o si ffmpeg no
+        pudo leerlo; entonces se sigue por la descarga completa.
+        """
+        elegido = await self._en_hilo(cancelar, ydl.process_ie_result, self._copia_info(info), False)
+        if (elegido.get('requested_formats') or elegido.get('fragments') or not elegido.get('url')
+                or elegido.get('protocol', 'https') not in ('http', 'https')
+                or elegido.get('ext') not in CONTENEDORES_EN_FLUJO):
+            return None
+        elegido['filepath'] = ydl.prepare_filename(elegido)
+        # La portada la escribe yt-dlp al descargar; aquí hay que pedirla antes de lanzar ffmpeg
+        await self._en_hilo(cancelar, ydl._write_thumbnails, 'video', elegido, elegido['filepath'])
+        self._preparar_miniatura(url, elegido)
+        pp = self._postprocesador_en_flujo(ydl)
+        # Mientras espera turno de ffmpeg no descarga: vuelve al reparto con el primer bloque
+        self.planificador.ancho.salir(ydl.params)
+        self._avisar(hooks, 'started', pp, elegido)
+        try:
+            borrar, final = await pp.ejecutar_async(elegido, turno_cpu=self._turno_cpu,
+                                                    bloques=self._bloques(ydl, elegido, cancelar))
+        except FFmpegPostProcessorError as e:
+            # La portada ya escrita la aprovecha la descarga completa
+            print(f"\nNo se pudo convertir durante la descarga ({str(e)}); se descarga el archivo completo")
+            return None
+        self._avisar_fin_transferencia(ydl)
+        for archivo in borrar:
+            self._borrar_archivo(archivo)
+        self._avisar(hooks, 'finished', pp, final)
+        return final
+
+    async def _bloques(self, ydl, formato, cancelar):
+        """Lee el formato por HTTP con la sesión de yt-dlp y entrega los bytes según llegan.
+
+        Como el HttpFD de yt-dlp, pide el archivo en rangos de `http_chunk_size` (googlevideo
+        limita la velocidad de las peticiones sin rango) y, si una petición falla a medias, la
+        repite desde el último byte recibido: ffmpeg sigue leyendo sin notar el corte. Avisa a los
+        hooks de progreso igual que yt-dlp; el del planificador limita su velocidad.
+        """
+        self.planificador.ancho.entrar(ydl.params)
+        tamaño_rango = ((formato.get('downloader_options') or {}).get('http_chunk_size')
+                        or ydl.params.get('http_chunk_size') or 0)
+        estado = {'status': 'downloading', 'filename': formato['filepath'], 'info_dict': formato,
+                  'total_bytes': formato.get('filesize'), 'downloaded_bytes': 0, 'elapsed': 0.0}
+        inicio = time.monotonic()
+        fallos = 0
+
+        def leer(respuesta, tamaño=TAMAÑO_BLOQUE_FLUJO):
+            bloque = respuesta.read(tamaño)
+            descargado = estado['downloaded_bytes'] + len(bloque)
+            transcurrido = time.monotonic() - inicio
+            velocidad = descargado / transcurrido if transcurrido else None
+            total = estado['total_bytes']
+            estado.update(downloaded_bytes=descargado, elapsed=transcurrido, speed=velocidad,
+                          eta=(total - descargado) / velocidad if total and velocidad else None)
+            if bloque:
+                for hook in ydl.params.get('progress_hooks') or []:
+                    hook(estado)
+            return bloque
+
+        while not estado['total_bytes'] or estado['downloaded_bytes'] < estado['total_bytes']:
+            desde = estado['downloaded_bytes']
+            hasta = desde + tamaño_rango - 1 if tamaño_rango else None
+            cabeceras = dict(formato.get('http_headers') or {})
+            if desde or hasta is not None:
+                cabeceras['Range'] = f"bytes={desde}-{'' if hasta is None else hasta}"
+            try:
+                respuesta = await self._en_hilo(cancelar, ydl.urlopen, Request(formato['url'], headers=cabeceras))
+                try:
+                    estado['total_bytes'] = self._tamaño_total(respuesta) or estado['total_bytes']
+                    if desde and respuesta.status == 200:
+                        # El servidor no admite rangos: se descarta lo que ffmpeg ya recibió
+                        await self._en_hilo(cancelar, self._saltar, respuesta, desde)
+                    while bloque := await self._en_hilo(cancelar, leer, respuesta):
+                        yield bloque
+                finally:
+                    respuesta.close()
+                recibidos = estado['downloaded_bytes'] - desde
+                total = estado['total_bytes']
+                if total and estado['downloaded_bytes'] < total and (hasta is None or recibidos < hasta - desde + 1):
+                    raise IncompleteRead(estado['downloaded_bytes'], total)
+            except DescargaCancelada:
+                raise
+            except Exception as e:
+                if estado_http(e) == 416 and desde and not estado['total_bytes']:
+                    break  # el rango anterior acababa justo en el final del archivo
+                fallos += 1
+                if fallos >= INTENTOS_RANGO_FLUJO or estado_http(e) == 403 or clasificar_error(e) == PERMANENTE:
+                    # Un 403 suele ser una URL firmada caducada: hay que volver a extraer
+                    raise
+                espera = self.politica_reintentos.espera(fallos - 1, e)
+                print(f"\nError al leer el audio ({str(e)}); se reanuda desde el byte {estado['downloaded_bytes']} "
+                      f"en {espera:.1f} segundos")
+                await asyncio.sleep(espera)
+                continue
+            fallos = 0
+            if not recibidos or (not estado['total_bytes'] and (hasta is None or recibidos < hasta - desde + 1)):
+                break  # sin tamaño conocido, el final es una respuesta vacía o más corta que el rango
+
+        for hook in ydl.params.get('progress_hooks') or []:
+            hook({**estado, 'status': 'finished', 'total_bytes': estado['downloaded_bytes']})
+
+    @staticmethod
+    def _tamaño_total(respuesta):
+        """Tamaño completo del archivo según Content-Range (o Content-Length si no hubo rango)."""
+        rango = respuesta.headers.get('Content-Range') or ''
+        total = rango.rpartition('/')[2]
+        if total.isdigit():
+            return int(total)
+        if respuesta.status == 200 and respuesta.headers.get('Content-Length', '').isdigit():
+            return int(respuesta.headers['Content-Length'])
+        return None
+
+    @staticmethod
+    def _saltar(respuesta, cantidad):
+        while cantidad > 0:
+            bloque = respuesta.read(min(cantidad, TAMAÑO_BLOQUE_FLUJO))
+            if not bloque:
+                raise IncompleteRead(0, cantidad)
+            cantidad -= len(bloque)
+
+    def _avisar_fin_transferencia(self, ydl):
+        """Cede la red: la parte del ancho de banda y el turno del lote pasan a las demás descargas.
+
+        El post-procesado y la espera de turno de ffmpeg ya no cuentan como descarga activa.
+        """
+        self.planificador.ancho.salir(ydl.params)
+        aviso = _FIN_TRANSFERENCIA.get()
+        if aviso:
+            aviso()
+
+    @staticmethod
+    def _borrar_archivo(ruta):
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+    def _preparar_miniatura(self, url, info):
+        """Pasa a la caché de miniaturas la que acaba de escribir yt-dlp, antes de que se incruste y se borre."""
+        if not self.miniaturas:
+            return
+        for miniatura in reversed(info.get('thumbnails') or []):
+            if miniatura.get('filepath') and os.path.exists(miniatura['filepath']):
+                self.miniaturas.preparar(url, origen=miniatura['filepath'])
+                return
+
+    async def _postprocesar(self, ydl, info, hooks):
+        """Ejecuta los post-procesadores propios con ffmpeg como subproceso asíncrono.
+
+        Avisa a los hooks igual que yt-dlp con los suyos, así que la telemetría y el progreso
+        ven la fase de post-procesado aunque ya no pase por la cadena de yt-dlp.
+        """
+        if not info.get('filepath'):
+            return info
+        for pp in self._postprocesadores(ydl):
+            self._avisar(hooks, 'started', pp, info)
+            borrar, info = await pp.ejecutar_async(info, turno_cpu=self._turno_cpu)
+            for archivo in borrar:
+                self._borrar_archivo(archivo)
+            self._avisar(hooks, 'finished', pp, info)
+        return info
+
+    def _turno_cpu(self):
+        return self.planificador.cpu.turno(self.PRIORIDAD)
+
+    @staticmethod
+    def _avisar(hooks, estado, pp, info):
+        for hook in hooks:
+            hook({'status': estado, 'postprocessor': pp.pp_key(), 'info_dict': info})
 
 class YouTubeVideoDownloader(MediaDownloader):
-    def validar_url(self, url):
-        patron_youtube = r'(https?://)?(www\.)?(youtube\.com|youtu\.be)/.+'
-        return bool(re.match(patron_youtube, url))
+    PLATAFORMA = YOUTUBE
+    # Primero streams que caben en MP4 sin re-codificar (H.264 + AAC), después cualquiera
+    FORMATO_PREFERIDO = 'bestvideo[ext=mp4][vcodec^=avc1]+bestaudio[ext=m4a]/best[ext=mp4][vcodec^=avc1]/best'
+    FORMATO_ALTERNATIVO = 'bestvideo+bestaudio/best'
 
-    def normalizar_url(self, url):
-        if 'youtu.be' in url:
-            video_id = url.split('/')[-1]
-            return f'https://www.youtube.com/watch?v={video_id}'
-        return url
+    def __init__(self, carpeta_destino="descargas", preset="veryfast", hilos=0, **kwargs):
+        super().__init__(carpeta_destino, **kwargs)
+        self.preset = preset
+        self.hilos = hilos
+
+    def _postprocesadores(self, ydl):
+        # Remux cuando los códecs ya sirven; re-codificar solo como último recurso
+        # Sin un número de hilos fijo, cada ffmpeg usa su parte de las CPUs según el pool de ffmpeg
+        return [ContenedorMP4PP(ydl, preset=self.preset, hilos=self.hilos or self.planificador.cpu.hilos)]
+
+    def _ajustes_postprocesado(self):
+        return {'contenedor': 'mp4', 'preset': self.preset, 'hilos': self.hilos}
 
     def _listar_formatos(self, url):
         """Lista los formatos disponibles para el video."""
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'skip_download': True,
-        }
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                print("\nFormatos disponibles:")
-                for f in info['formats']:
-                    if f.get('vcodec', 'none') != 'none':  # Solo formatos con video
-                        print(f"Formato: {f['format_id']} - {f.get('ext', 'N/A')} - {f.get('height', 'N/A')}p - {f.get('format_note', '')}")
+            info = self._extraer_info(url)
+            print("\nFormatos disponibles:")
+            for f in info.get('formats') or []:
+                if f.get('vcodec', 'none') != 'none':  # Solo formatos con video
+                    print(f"Formato: {f['format_id']} - {f.get('ext', 'N/A')} - {f.get('height', 'N/A')}p - {f.get('format_note', '')}")
         except Exception as e:
             print(f"Error al listar formatos: {str(e)}")
 
-    def descargar(self, url, intentos_maximos=3):
-        url = self.normalizar_url(url)
-        if not self.validar_url(url):
-            raise ValueError("URL de YouTube no válida")
-
-        # Primero intentamos con el formato más simple
-        ydl_opts = {
-            'format': 'best',  # Usamos el mejor formato disponible
-            'merge_output_format': 'mp4',
-            'outtmpl': os.path.join(self.carpeta_destino, '%(title)s.%(ext)s'),
-            'progress_hooks': [ProgressHook()],
+    def _opciones_descarga(self):
+        return {
+            'format': self.FORMATO_PREFERIDO,
+            'merge_output_format': 'mp4/mkv',
+            'outtmpl': '%(title)s.%(ext)s',
             'quiet': True,
             'no_warnings': True,
-            'postprocessors': [{
-                'key': 'FFmpegVideoConvertor',
-                'preferedformat': 'mp4',
-            }],
             'writethumbnail': True,
             'noplaylist': True,
         }
 
+    async def _descargar(self, url, intentos_maximos=3, recorte=None):
+        url = self._url_valida(url, "URL de YouTube no válida")
+
+        # Primero intentamos con formatos compatibles con MP4
+        ydl_opts = self._opciones_descarga()
+
         try:
-            return self._procesar_descarga(url, ydl_opts, intentos_maximos)
+            return await self._procesar_descarga(url, ydl_opts, intentos_maximos, recorte)
         except Exception as e:
+            if not es_error_de_formato(e) and not self.politica_reintentos.reintentable(e):
+                # Video privado, eliminado, bloqueado...: otro formato no lo arregla
+                raise
             print(f"\nError con el formato predeterminado: {str(e)}")
             print("\nIntentando listar formatos disponibles...")
-            self._listar_formatos(url)
+            await asyncio.to_thread(self._listar_formatos, url)
             
             # Intentamos con un formato alternativo
             print("\nIntentando con formato alternativo...")
-            ydl_opts['format'] = 'bestvideo+bestaudio/best'
+            ydl_opts['format'] = self.FORMATO_ALTERNATIVO
             try:
-                return self._procesar_descarga(url, ydl_opts, intentos_maximos)
+                return await self._procesar_descarga(url, ydl_opts, intentos_maximos, recorte)
             except Exception as e2:
                 print(f"\nError con formato alternativo: {str(e2)}")
-                raise Exception("No se pudo descargar el video. Por favor, revisa los formatos disponibles arriba.")
+                raise Exception("No se pudo descargar el video. Por favor, revisa los formatos disponibles arriba.") from e2
 
-class YouTubeAudioDownloader(MediaDownloader):
-    def validar_url(self, url):
-        patron_youtube = r'(https?://)?(www\.)?(youtube\.com|youtu\.be)/.+'
-        return bool(re.match(patron_youtube, url))
+class AudioDownloader(MediaDownloader):
+    """Base de las descargas de solo audio: un único paso de ffmpeg con etiquetas y portada.
 
-    def normalizar_url(self, url):
-        if 'youtu.be' in url:
-            video_id = url.split('/')[-1]
-            return f'https://www.youtube.com/watch?v={video_id}'
-        return url
+    Con `flujo` (por defecto) el audio se convierte mientras se descarga si el formato lo permite.
+    """
+    PRIORIDAD = PRIORIDAD_AUDIO
 
-    def descargar(self, url, intentos_maximos=3):
-        url = self.normalizar_url(url)
-        if not self.validar_url(url):
-            raise ValueError("URL de YouTube no válida")
+    def __init__(self, carpeta_destino="descargas", codec="mp3", calidad="192", transcodificar=True, flujo=True,
+                 **kwargs):
+        super().__init__(carpeta_destino, **kwargs)
+        self.codec = codec
+        self.calidad = calidad
+        self.transcodificar = transcodificar
+        self.flujo = flujo
 
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-            'outtmpl': os.path.join(self.carpeta_destino, '%(title)s.%(ext)s'),
-            'progress_hooks': [ProgressHook()],
+    def _postprocesadores(self, ydl):
+        return [AudioEtiquetadoPP(ydl, codec=self.codec, calidad=self.calidad, transcodificar=self.transcodificar)]
+
+    def _postprocesador_en_flujo(self, ydl):
+        # Copiar el audio sin re-codificar es casi instantáneo: no hay nada que solapar con la descarga
+        if not self.flujo or not self.transcodificar or ydl.params.get('download_ranges'):
+            return None
+        return self._postprocesadores(ydl)[0]
+
+    def _ajustes_postprocesado(self):
+        return {'audio': self.codec, 'calidad': self.calidad, 'transcodificar': self.transcodificar}
+
+    def _opciones_audio(self):
+        return {
+            # Sin transcodificar, un M4A (AAC) admite portada y lo reproduce cualquier dispositivo
+            'format': 'bestaudio/best' if self.transcodificar else 'bestaudio[ext=m4a]/bestaudio/best',
+            'outtmpl': '%(title)s.%(ext)s',
             'quiet': True,
             'no_warnings': True,
             'writethumbnail': True,
         }
 
-        media_info = self._procesar_descarga(url, ydl_opts, intentos_maximos)
-        if media_info and 'archivo' in media_info:
-            self._agregar_metadatos(media_info['archivo'], media_info)
-        return media_info
+class YouTubeAudioDownloader(AudioDownloader):
+    PLATAFORMA = YOUTUBE
 
-    def _agregar_metadatos(self, archivo_mp3, info):
-        try:
-            audio = MP3(archivo_mp3, ID3=EasyID3)
-            audio['title'] = info['titulo']
-            audio['artist'] = info.get('uploader', 'Unknown Artist')
-            audio['album'] = info.get('album', 'YouTube Audio')
-            audio['date'] = str(info.get('upload_date', ''))[:4]
-            audio.save()
-        except Exception as e:
-            print(f"Error al agregar metadatos: {str(e)}")
+    def _opciones_descarga(self):
+        return {**self._opciones_audio(), 'noplaylist': True}
 
-class SoundCloudDownloader(MediaDownloader):
-    def validar_url(self, url):
-        patron_soundcloud = r'(https?://)?(www\.)?soundcloud\.com/.+'
-        return bool(re.match(patron_soundcloud, url))
+    async def _descargar(self, url, intentos_maximos=3, recorte=None):
+        url = self._url_valida(url, "URL de YouTube no válida")
 
-    def descargar(self, url, intentos_maximos=3):
-        if not self.validar_url(url):
-            raise ValueError("URL de SoundCloud no válida")
+        return await self._procesar_descarga(url, self._opciones_descarga(), intentos_maximos, recorte)
 
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-            'outtmpl': os.path.join(self.carpeta_destino, '%(title)s.%(ext)s'),
-            'progress_hooks': [ProgressHook()],
-            'quiet': True,
-            'no_warnings': True,
-        }
+class SoundCloudDownloader(AudioDownloader):
+    PLATAFORMA = SOUNDCLOUD
+
+    def _opciones_descarga(self):
+        return self._opciones_audio()
+
+    async def _descargar(self, url, intentos_maximos=3, recorte=None):
+        url = self._url_valida(url, "URL de SoundCloud no válida")
 
-        return self._procesar_descarga(url, ydl_opts, intentos_maximos) 
\ No newline at end of file
+        return await self._procesar_descarga(url, self._opciones_descarga(), intentos_maximos, recorte)
@@ -0,0 +1,330 @@
+"""Post-procesadores propios de TubeGrab para yt-dlp."""
+import abc
+import asyncio
+import contextlib
+import os
+import subprocess
+
+from yt_dlp.postprocessor.common import PostProcessor
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor, FFmpegPostProcessorError
+from yt_dlp.utils import replace_extension
+
+# Códecs que un contenedor MP4 admite y que los navegadores reproducen sin problemas
+CODECS_VIDEO_MP4 = ('avc1', 'avc3', 'h264', 'hev1', 'hvc1', 'hevc', 'h265', 'av01', 'mp4v')
+CODECS_AUDIO_MP4 = ('mp4a', 'aac', 'mp3', 'ac-3', 'ec-3')
+
+SIN_CONVERSION = 'sin_conversion'
+REMUX = 'remux'
+TRANSCODIFICACION = 'transcodificacion'
+
+
+def _compatible(codec, compatibles):
+    """Indica si el stream se puede copiar tal cual; 'none' es que no hay stream de ese tipo.
+
+    Un códec desconocido (None) no cuenta como compatible: copiarlo podría dejar un MP4 que
+    los navegadores no reproducen.
+    """
+    if codec is None:
+        return False
+    codec = codec.lower()
+    return codec == 'none' or codec.startswith(compatibles)
+
+
+class _MetaPostProcesador(abc.ABCMeta, type(FFmpegPostProcessor)):
+    """Metaclase de los post-procesadores de yt-dlp con soporte de métodos abstractos."""
+
+
+class FFmpegDosModosPP(FFmpegPostProcessor, metaclass=_MetaPostProcesador):
+    """Post-procesador de una sola llamada a ffmpeg que funciona dentro y fuera de yt-dlp.
+
+    Las subclases deciden el comando en preparar() y rematan el resultado en terminar(). run()
+    es la versión de la cadena de yt-dlp; ejecutar_async() lanza ffmpeg con asyncio y, si se
+    cancela, termina el proceso hijo y borra la salida a medias.
+    """
+
+    # Segundos que se espera a que ffmpeg salga tras SIGTERM antes de matarlo
+    ESPERA_TERMINAR = 5
+
+    @abc.abstractmethod
+    def preparar(self, info):
+        """Devuelve (entradas, destino, opciones) o None si el archivo ya está como debe."""
+
+    @abc.abstractmethod
+    def terminar(self, info, destino):
+        """Ajusta info tras la conversión y devuelve (archivos a borrar, info)."""
+
+    def alternativa(self, info):
+        """Plan de repuesto (como el de preparar) si ffmpeg falla con el primero, o None si no lo hay."""
+        return None
+
+    def _plan_tras_fallo(self, info, error):
+        plan = self.alternativa(info)
+        if plan is None:
+            raise error
+        self.report_warning(f'{error}; se vuelve a intentar re-codificando')
+        return plan
+
+    def run(self, info):
+        plan = self.preparar(info)
+        if plan is None:
+            return [], info
+        try:
+            self.run_ffmpeg_multiple_files(*plan)
+        except FFmpegPostProcessorError as e:
+            plan = self._plan_tras_fallo(info, e)
+            self.run_ffmpeg_multiple_files(*plan)
+        return self.terminar(info, plan[1])
+
+    async def ejecutar_async(self, info, turno_cpu=None, bloques=None):
+        """Versión asíncrona de run().
+
+        `turno_cpu` es un context manager asíncrono (p. ej. PoolCPU.turno) que se toma antes de
+        lanzar ffmpeg cuando hay que re-codificar; los cambios de contenedor no esperan turno.
+        Con `bloques` (iterador asíncrono de bytes) la primera entrada llega por la entrada
+        estándar de ffmpeg según se descarga, en lugar de leerse del disco. Si ffmpeg falla y hay
+        alternativa(), se repite una vez con ella (salvo con `bloques`: el flujo ya se consumió).
+        """
+        plan = self.preparar(info)
+        if plan is None:
+            if bloques is not None:
+                raise FFmpegPostProcessorError('No hay conversión que hacer sobre el flujo')
+            return [], info
+        try:
+            await self._ejecutar_plan(info, plan, turno_cpu, bloques)
+        except FFmpegPostProcessorError as e:
+            if bloques is not None:
+                raise
+            plan = self._plan_tras_fallo(info, e)
+            await self._ejecutar_plan(info, plan, turno_cpu, None)
+        return self.terminar(info, plan[1])
+
+    async def _ejecutar_plan(self, info, plan, turno_cpu, bloques):
+        entradas, destino, opciones = plan
+        self.check_version()
+        comando = [self.executable, '-y', *(['-nostdin'] if bloques is None else []), '-loglevel', 'error']
+        for i, entrada in enumerate(entradas):
+            comando += ['-i', 'pipe:0' if bloques is not None and i == 0 else self._ffmpeg_filename_argument(entrada)]
+        comando += [*opciones, self._ffmpeg_filename_argument(destino)]
+
+        async with contextlib.AsyncExitStack() as pila:
+            if turno_cpu is not None and info.get('pipeline') == TRANSCODIFICACION:
+                await pila.enter_async_context(turno_cpu())
+            proceso = await asyncio.create_subprocess_exec(
+                *comando, stdin=subprocess.DEVNULL if bloques is None else subprocess.PIPE,
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            try:
+                if bloques is None:
+                    _, errores = await proceso.communicate()
+                else:
+                    errores = await self._alimentar(proceso, bloques)
+            except BaseException:
+                # Cancelación o fallo de la descarga que alimenta a ffmpeg
+                await self._detener(proceso)
+                self._borrar(destino)
+                raise
+        if proceso.returncode != 0:
+            self._borrar(destino)
+            lineas = errores.decode('utf-8', 'replace').strip().splitlines()
+            raise FFmpegPostProcessorError(lineas[-1] if lineas else f'ffmpeg terminó con código {proceso.returncode}')
+
+    @staticmethod
+    async def _alimentar(proceso, bloques):
+        """Pasa los bloques a ffmpeg por su entrada estándar y devuelve lo que escribió en stderr."""
+        errores = asyncio.ensure_future(proceso.stderr.read())
+        try:
+            try:
+                async for bloque in bloques:
+                    proceso.stdin.write(bloque)
+                    await proceso.stdin.drain()
+                proceso.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # ffmpeg salió antes de tiempo: su código de salida y stderr dicen por qué
+            finally:
+                await bloques.aclose()
+            await proceso.wait()
+            return await errores
+        finally:
+            errores.cancel()
+
+    async def _detener(self, proceso):
+        if proceso.returncode is not None:
+            return
+        # SIGTERM deja a ffmpeg cerrar sus archivos; si no responde, se le mata
+        proceso.terminate()
+        try:
+            await asyncio.wait_for(proceso.wait(), self.ESPERA_TERMINAR)
+        except asyncio.TimeoutError:
+            proceso.kill()
+            await proceso.wait()
+
+    @staticmethod
+    def _borrar(ruta):
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+
+class ContenedorMP4PP(FFmpegDosModosPP):
+    """Deja el archivo en MP4 con el mínimo trabajo posible.
+
+    Si los códecs ya son compatibles solo se cambia el contenedor (copia de streams);
+    únicamente se re-codifica el stream que no lo sea o cuyo códec se desconoce. Si ffmpeg no
+    puede copiar un stream, se re-codifica todo. La ruta elegida queda en info['pipeline'].
+    """
+
+    def __init__(self, downloader=None, preset='veryfast', hilos=0):
+        super().__init__(downloader)
+        self.preset = preset
+        self.hilos = hilos
+
+    def _opciones(self, copiar_video, copiar_audio):
+        yield from ('-map', '0:v?', '-map', '0:a?', '-dn', '-ignore_unknown')
+        if copiar_video:
+            yield from ('-c:v', 'copy')
+        else:
+            yield from ('-c:v', 'libx264', '-preset', self.preset, '-crf', '23', '-pix_fmt', 'yuv420p')
+        yield from ('-c:a', 'copy') if copiar_audio else ('-c:a', 'aac', '-b:a', '192k')
+        yield from ('-threads', str(self.hilos), '-movflags', '+faststart')
+
+    @PostProcessor._restrict_to(images=False)
+    def run(self, info):
+        return super().run(info)
+
+    def preparar(self, info):
+        ext = info['ext'].lower()
+        copiar_video = _compatible(info.get('vcodec'), CODECS_VIDEO_MP4)
+        copiar_audio = _compatible(info.get('acodec'), CODECS_AUDIO_MP4)
+
+        if ext == 'mp4' and copiar_video and copiar_audio:
+            info['pipeline'] = SIN_CONVERSION
+            return None
+
+        info['pipeline'] = REMUX if copiar_video and copiar_audio else TRANSCODIFICACION
+        return self._plan(info, copiar_video, copiar_audio)
+
+    def alternativa(self, info):
+        # Solo hay alternativa si el primer plan copiaba algún stream existente
+        if not any(_compatible(codec, compatibles) and codec.lower() != 'none' for codec, compatibles in
+                   ((info.get('vcodec'), CODECS_VIDEO_MP4), (info.get('acodec'), CODECS_AUDIO_MP4))):
+            return None
+        info['pipeline'] = TRANSCODIFICACION
+        return self._plan(info, False, False)
+
+    def _plan(self, info, copiar_video, copiar_audio):
+        ruta, ext = info['filepath'], info['ext'].lower()
+        destino = replace_extension(ruta, 'mp4', ext)
+        if destino == ruta:
+            destino = replace_extension(ruta, 'temp.mp4', ext)
+        self.to_screen(f'{info["pipeline"]} de {ext} a mp4; Destino: {destino}')
+        return [ruta], destino, list(self._opciones(copiar_video, copiar_audio))
+
+    def terminar(self, info, destino):
+        ruta = info['filepath']
+        if info['ext'].lower() == 'mp4':
+            # Mismo nombre de destino: se sustituye el original
+            os.replace(destino, ruta)
+            return [], info
+
+        info['filepath'] = destino
+        info['format'] = info['ext'] = 'mp4'
+        return [ruta], info
+
+
+# Códecs de audio que se pueden conservar sin re-codificar: (extensión de salida, admite portada)
+CONTENEDORES_AUDIO = {
+    'mp3': ('mp3', True),
+    'mp4a': ('m4a', True),
+    'aac': ('m4a', True),
+    'opus': ('opus', False),
+    'vorbis': ('ogg', False),
+}
+
+
+class AudioEtiquetadoPP(FFmpegDosModosPP):
+    """Extrae el audio y escribe etiquetas y portada en una única pasada de ffmpeg.
+
+    La miniatura que escribe yt-dlp (writethumbnail) entra como segunda entrada de ffmpeg, se
+    convierte a JPEG dentro de la misma ejecución y se borra después. Con transcodificar=False
+    el audio se copia tal cual si el códec original ya es aceptable (AAC, Opus, Vorbis, MP3).
+    """
+
+    def __init__(self, downloader=None, codec='mp3', calidad='192', transcodificar=True):
+        super().__init__(downloader)
+        self.codec = codec
+        self.calidad = calidad
+        self.transcodificar = transcodificar
+
+    @staticmethod
+    def _portada(info):
+        for miniatura in reversed(info.get('thumbnails') or []):
+            ruta = miniatura.get('filepath')
+            if ruta and os.path.exists(ruta):
+                return ruta
+        return None
+
+    @staticmethod
+    def _metadatos(info):
+        fecha = str(info.get('upload_date') or '')[:4]
+        etiquetas = {
+            'title': info.get('track') or info.get('title'),
+            'artist': info.get('artist') or info.get('creator') or info.get('uploader') or 'Unknown Artist',
+            'album': info.get('album') or 'YouTube Audio',
+            'date': fecha,
+            'comment': info.get('webpage_url'),
+        }
+        for clave, valor in etiquetas.items():
+            if valor:
+                yield from ('-metadata', f'{clave}={valor}')
+
+    def preparar(self, info):
+        ruta = info['filepath']
+        acodec = (info.get('acodec') or '').split('.')[0].lower()
+
+        if not self.transcodificar and acodec in CONTENEDORES_AUDIO:
+            ext, admite_portada = CONTENEDORES_AUDIO[acodec]
+            opciones_codec = ['-c:a', 'copy']
+            info['pipeline'] = REMUX
+        else:
+            ext, admite_portada = self.codec, self.codec in ('mp3', 'm4a')
+            codificador = {'mp3': 'libmp3lame', 'm4a': 'aac', 'opus': 'libopus'}.get(self.codec, self.codec)
+            opciones_codec = ['-c:a', codificador, '-b:a', f'{self.calidad}k']
+            info['pipeline'] = TRANSCODIFICACION
+
+        portada = self._portada(info)
+        entradas = [ruta]
+        opciones = ['-map', '0:a:0', *opciones_codec]
+        if portada and admite_portada:
+            entradas.append(portada)
+            opciones += [
+                '-map', '1:v:0', '-c:v', 'mjpeg', '-disposition:v:0', 'attached_pic',
+                '-metadata:s:v', 'title=Album cover', '-metadata:s:v', 'comment=Cover (front)',
+            ]
+        opciones += list(self._metadatos(info))
+        if ext == 'mp3':
+            opciones += ['-id3v2_version', '3']
+        elif ext == 'm4a':
+            opciones += ['-movflags', '+faststart']
+
+        destino = replace_extension(ruta, ext, info['ext'])
+        if destino == ruta:
+            destino = replace_extension(ruta, f'temp.{ext}', info['ext'])
+        self.to_screen(f'Audio {info["pipeline"]} a {ext} con etiquetas{" y portada" if len(entradas) > 1 else ""}; '
+                       f'Destino: {destino}')
+        return entradas, destino, opciones
+
+    def terminar(self, info, destino):
+        ruta = info['filepath']
+        ext = os.path.splitext(destino)[1].lstrip('.')
+        # La miniatura ya está dentro del archivo: no se deja suelta en la carpeta
+        portada = self._portada(info)
+        borrar = [portada] if portada else []
+        if destino.endswith(f'.temp.{ext}'):
+            os.replace(destino, ruta)
+            destino = ruta
+        else:
+            borrar.append(ruta)
+        info['filepath'] = destino
+        info['ext'] = ext
+        info.pop('thumbnails', None)
+        return borrar, info
@@ -0,0 +1,193 @@
+"""Registro compartido en SQLite (modo WAL) de archivos descargados y descargas en curso.
+
+Varias réplicas de la aplicación sobre el mismo volumen comparten `descargas/.cache/registro.db`:
+ven lo que las demás ya han descargado, no repiten una descarga que otra tiene en marcha y
+retoman las que dejó a medias una réplica caída.
+
+Cada descarga en curso tiene un propietario y un lease que el propietario renueva con latidos.
+Si el propietario muere, el lease caduca y la descarga queda huérfana: cualquier réplica puede
+reclamarla y reanudarla desde los `.part` del área temporal.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+# Segundos que dura un lease sin latidos; el propietario late cada tercio
+DURACION_LEASE = 60.0
+
+# Identifica a este proceso como propietario de sus descargas
+PROPIETARIO = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS artefactos (
+    clave TEXT PRIMARY KEY,
+    extractor TEXT,
+    video_id TEXT,
+    formato TEXT,
+    ruta TEXT NOT NULL,
+    tamaño INTEGER NOT NULL,
+    checksum TEXT,
+    media_info TEXT NOT NULL,
+    creado REAL NOT NULL,
+    ultimo_acceso REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS artefactos_video ON artefactos (extractor, video_id);
+CREATE INDEX IF NOT EXISTS artefactos_acceso ON artefactos (ultimo_acceso);
+
+CREATE TABLE IF NOT EXISTS trabajos (
+    clave TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    descargador TEXT,
+    opciones TEXT,
+    propietario TEXT NOT NULL,
+    lease_hasta REAL NOT NULL,
+    intentos INTEGER NOT NULL DEFAULT 1,
+    creado REAL NOT NULL,
+    actualizado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trabajos_lease ON trabajos (lease_hasta);
+"""
+
+_CONEXIONES = threading.local()
+_INICIALIZADOS = set()
+_LOCK = threading.Lock()
+
+
+class Registro:
+    """Acceso al registro de una carpeta de descargas. Cada hilo usa su propia conexión."""
+
+    def __init__(self, carpeta_destino, duracion_lease=DURACION_LEASE, propietario=PROPIETARIO):
+        self.ruta = os.path.join(carpeta_destino, '.cache', 'registro.db')
+        self.duracion_lease = duracion_lease
+        self.propietario = propietario
+
+    def _conexion(self):
+        conexiones = getattr(_CONEXIONES, 'porruta', None)
+        if conexiones is None:
+            conexiones = _CONEXIONES.porruta = {}
+        conexion = conexiones.get(self.ruta)
+        if conexion is None:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            # Autocommit: cada sentencia es su propia transacción, sin bloqueos retenidos entre llamadas
+            conexion = sqlite3.connect(self.ruta, timeout=10, isolation_level=None)
+            conexion.row_factory = sqlite3.Row
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('PRAGMA synchronous=NORMAL')
+            with _LOCK:
+                if self.ruta not in _INICIALIZADOS:
+                    conexion.executescript(ESQUEMA)
+                    _INICIALIZADOS.add(self.ruta)
+            conexiones[self.ruta] = conexion
+        return conexion
+
+    # Artefactos: archivos terminados
+
+    def artefacto(self, clave):
+        fila = self._conexion().execute('SELECT * FROM artefactos WHERE clave = ?', (clave,)).fetchone()
+        return _artefacto(fila) if fila else None
+
+    def artefactos_de(self, extractor, video_id):
+        """Archivos ya descargados de un video, del más usado recientemente al que menos."""
+        filas = self._conexion().execute(
+            'SELECT * FROM artefactos WHERE extractor = ? AND video_id = ? ORDER BY ultimo_acceso DESC',
+            (extractor, video_id)).fetchall()
+        return [_artefacto(fila) for fila in filas]
+
+    def guardar_artefacto(self, clave, media_info, tamaño, checksum=None, extractor=None, video_id=None,
+                          formato=None):
+        ahora = time.time()
+        self._conexion().execute(
+            'INSERT OR REPLACE INTO artefactos (clave, extractor, video_id, formato, ruta, tamaño, checksum, '
+            'media_info, creado, ultimo_acceso) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (clave, extractor, video_id, formato, media_info['archivo'], tamaño, checksum,
+             json.dumps(media_info, ensure_ascii=False), ahora, ahora))
+
+    def tocar_artefacto(self, clave):
+        self._conexion().execute('UPDATE artefactos SET ultimo_acceso = ? WHERE clave = ?', (time.time(), clave))
+
+    def borrar_artefacto(self, clave):
+        self._conexion().execute('DELETE FROM artefactos WHERE clave = ?', (clave,))
+
+    def tamaño_artefactos(self):
+        """Bytes que ocupan todos los artefactos registrados."""
+        return self._conexion().execute('SELECT COALESCE(SUM(tamaño), 0) FROM artefactos').fetchone()[0]
+
+    def artefactos_por_acceso(self, antes_de=None):
+        """(clave, ruta, tamaño) de los artefactos, del usado hace más tiempo al más reciente.
+
+        Con `antes_de`, solo los que no se usan desde entonces.
+        """
+        consulta = 'SELECT clave, ruta, tamaño FROM artefactos'
+        if antes_de is not None:
+            consulta += ' WHERE ultimo_acceso < ?'
+        filas = self._conexion().execute(consulta + ' ORDER BY ultimo_acceso',
+                                         () if antes_de is None else (antes_de,)).fetchall()
+        return [tuple(fila) for fila in filas]
+
+    # Trabajos: descargas en curso con lease
+
+    def reclamar(self, clave, url, descargador=None, opciones=None, duracion=None):
+        """Se apropia de la descarga si nadie la tiene o su lease caducó; False si la tiene otro."""
+        ahora = time.time()
+        cursor = self._conexion().execute(
+            'INSERT INTO trabajos (clave, url, descargador, opciones, propietario, lease_hasta, creado, actualizado) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (clave) DO UPDATE SET propietario = excluded.propietario, '
+            'lease_hasta = excluded.lease_hasta, actualizado = excluded.actualizado, '
+            'intentos = trabajos.intentos + (trabajos.propietario != excluded.propietario) '
+            'WHERE trabajos.propietario = excluded.propietario OR trabajos.lease_hasta < excluded.actualizado',
+            (clave, url, descargador, json.dumps(opciones or {}), self.propietario,
+             ahora + (duracion or self.duracion_lease), ahora, ahora))
+        return cursor.rowcount == 1
+
+    def latir(self, clave):
+        """Renueva el lease; False si ya no es de este propietario (caducó y lo reclamó otro)."""
+        ahora = time.time()
+        cursor = self._conexion().execute(
+            'UPDATE trabajos SET lease_hasta = ?, actualizado = ? WHERE clave = ? AND propietario = ?',
+            (ahora + self.duracion_lease, ahora, clave, self.propietario))
+        return cursor.rowcount == 1
+
+    def liberar(self, clave):
+        """Da la descarga por terminada (bien o mal): deja de estar en curso."""
+        self._conexion().execute('DELETE FROM trabajos WHERE clave = ? AND propietario = ?',
+                                 (clave, self.propietario))
+
+    def trabajo(self, clave):
+        fila = self._conexion().execute('SELECT * FROM trabajos WHERE clave = ?', (clave,)).fetchone()
+        return _trabajo(fila) if fila else None
+
+    def adoptar_huerfanos(self, duracion):
+        """Reclama las descargas con el lease caducado y las devuelve para volver a encolarlas.
+
+        `duracion` debe cubrir la espera en la cola: mientras, nadie late por ellas.
+        """
+        ahora = time.time()
+        conexion = self._conexion()
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            filas = conexion.execute('SELECT * FROM trabajos WHERE lease_hasta < ?', (ahora,)).fetchall()
+            conexion.executemany(
+                'UPDATE trabajos SET propietario = ?, lease_hasta = ?, actualizado = ?, intentos = intentos + 1 '
+                'WHERE clave = ?', [(self.propietario, ahora + duracion, ahora, fila['clave']) for fila in filas])
+            conexion.execute('COMMIT')
+        except BaseException:
+            conexion.execute('ROLLBACK')
+            raise
+        return [_trabajo(fila) for fila in filas]
+
+
+def _artefacto(fila):
+    artefacto = dict(fila)
+    artefacto['media_info'] = json.loads(artefacto['media_info'])
+    return artefacto
+
+
+def _trabajo(fila):
+    trabajo = dict(fila)
+    trabajo['opciones'] = json.loads(trabajo['opciones'] or '{}')
+    return trabajo
@@ -0,0 +1,198 @@
+"""Política de reintentos: clasificación de errores, espera exponencial con jitter y circuit breaker por host."""
+import random
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+REINTENTABLE = 'reintentable'
+PERMANENTE = 'permanente'
+
+# Errores que no se arreglan reintentando: el video no existe, es privado, está bloqueado...
+PATRON_PERMANENTE = re.compile(
+    r'private video|video unavailable|has been removed|account .*terminated|members[- ]only'
+    r'|sign in to confirm your age|age[- ]restricted|not available in your country|geo[- ]?restrict'
+    r'|copyright|unsupported url|is not a valid url|no video formats found|requested format is not available'
+    r'|this live event will begin|premieres in|http error (400|401|404|410)',
+    re.IGNORECASE)
+# Errores de la red o del servidor que no traen código HTTP
+PATRON_RED = re.compile(
+    r'timed? ?out|connection (reset|refused|aborted)|remote end closed|temporary failure|name resolution'
+    r'|network is unreachable|incomplete ?read|eof occurred|ssl|unable to download (webpage|video data|api)'
+    r'|got error|giving up after',
+    re.IGNORECASE)
+# Errores transitorios de red o de servidor
+PATRON_REINTENTABLE = re.compile(r'http error (403|408|429|5\d\d)|' + PATRON_RED.pattern, re.IGNORECASE)
+PATRON_FORMATO = re.compile(r'requested format is not available|no video formats found', re.IGNORECASE)
+
+
+def _cadena_causas(error):
+    """Recorre el error y las excepciones originales que yt-dlp guarda en exc_info/cause."""
+    vistos = set()
+    while error is not None and id(error) not in vistos:
+        vistos.add(id(error))
+        yield error
+        exc_info = getattr(error, 'exc_info', None)
+        error = (exc_info[1] if exc_info and exc_info[1] is not error else None) \
+            or getattr(error, 'cause', None) or error.__cause__
+
+
+def estado_http(error):
+    """Código HTTP del error (o de su causa), si lo hay."""
+    for causa in _cadena_causas(error):
+        estado = getattr(causa, 'status', None)
+        if isinstance(estado, int):
+            return estado
+    coincidencia = re.search(r'HTTP Error (\d{3})', str(error))
+    return int(coincidencia.group(1)) if coincidencia else None
+
+
+def clasificar_error(error):
+    """Devuelve REINTENTABLE o PERMANENTE según el error de yt-dlp."""
+    estado = estado_http(error)
+    if estado is not None:
+        return REINTENTABLE if estado in (403, 408, 429) or estado >= 500 else PERMANENTE
+    mensaje = ' '.join(str(causa) for causa in _cadena_causas(error))
+    if PATRON_PERMANENTE.search(mensaje):
+        return PERMANENTE
+    if PATRON_REINTENTABLE.search(mensaje):
+        return REINTENTABLE
+    for causa in _cadena_causas(error):
+        if isinstance(causa, (ConnectionError, TimeoutError)):
+            return REINTENTABLE
+        if getattr(causa, 'expected', False):
+            # ExtractorError(expected=True): el extractor sabe que el video no se puede obtener
+            return PERMANENTE
+    return REINTENTABLE
+
+
+def es_error_de_red(error):
+    """Indica si el error viene de la red o del servidor, no de ffmpeg, del disco o del extractor."""
+    if estado_http(error) is not None:
+        return True
+    for causa in _cadena_causas(error):
+        if isinstance(causa, (ConnectionError, TimeoutError)):
+            return True
+    return bool(PATRON_RED.search(' '.join(str(causa) for causa in _cadena_causas(error))))
+
+
+def es_error_de_formato(error):
+    return bool(PATRON_FORMATO.search(str(error)))
+
+
+def _retry_after(error):
+    """Segundos indicados por la cabecera Retry-After de una respuesta 429/503."""
+    for causa in _cadena_causas(error):
+        respuesta = getattr(causa, 'response', None)
+        valor = respuesta and respuesta.headers.get('Retry-After')
+        if valor and str(valor).isdigit():
+            return float(valor)
+    return None
+
+
+class PoliticaReintentos:
+    """Espera exponencial con jitter completo: un valor aleatorio entre 0 y base * factor ** intento."""
+
+    def __init__(self, base=1.0, factor=2.0, maximo=30.0):
+        self.base = base
+        self.factor = factor
+        self.maximo = maximo
+
+    def espera(self, intento, error=None):
+        retry_after = _retry_after(error) if error is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.maximo)
+        return random.uniform(0, min(self.maximo, self.base * self.factor ** intento))
+
+    @staticmethod
+    def reintentable(error):
+        return not isinstance(error, CircuitoAbierto) and clasificar_error(error) != PERMANENTE
+
+    def tras_fallo(self, error, intento, intentos_maximos, circuito):
+        """Segundos de espera antes del siguiente intento, o None si no hay que reintentar.
+
+        Solo los errores de red o HTTP cuentan para el circuit breaker del host: un fallo de
+        ffmpeg o del disco no dice nada de él.
+        """
+        if not self.reintentable(error):
+            return None
+        if es_error_de_red(error):
+            circuito.registrar_fallo()
+        if intento >= intentos_maximos - 1:
+            return None
+        return self.espera(intento, error)
+
+    def ejecutar(self, url, funcion, intentos_maximos=3, medicion=None):
+        """Llama a funcion() hasta que salga bien, con esperas entre intentos y el circuito del host de url."""
+        circuito = circuito_para(url)
+        for intento in range(intentos_maximos):
+            try:
+                print(f"\nIntento {intento + 1} de {intentos_maximos}")
+                circuito.comprobar()
+                resultado = funcion()
+                circuito.registrar_exito()
+                return resultado
+            except Exception as e:
+                print(f"\nError en intento {intento + 1}: {str(e)}")
+                espera = self.tras_fallo(e, intento, intentos_maximos, circuito)
+                if espera is None:
+                    raise
+                if medicion is not None:
+                    medicion.reintento(intento + 1, espera, e, clasificar_error(e))
+                print(f"Reintentando en {espera:.1f} segundos...")
+                time.sleep(espera)
+
+
+class CircuitoAbierto(Exception):
+    """El host ha fallado demasiadas veces seguidas; se rechaza la petición sin intentarla."""
+
+
+class CircuitBreaker:
+    """Tras `umbral` fallos reintentables seguidos deja de intentar durante `enfriamiento` segundos.
+
+    Pasado ese tiempo deja pasar un intento de prueba: si sale bien se cierra, si falla vuelve a abrirse.
+    """
+
+    def __init__(self, host, umbral=5, enfriamiento=60.0):
+        self.host = host
+        self.umbral = umbral
+        self.enfriamiento = enfriamiento
+        self._fallos = 0
+        self._abierto_desde = None
+        self._lock = threading.Lock()
+
+    def comprobar(self):
+        with self._lock:
+            if self._abierto_desde is None:
+                return
+            restante = self.enfriamiento - (time.monotonic() - self._abierto_desde)
+            if restante > 0:
+                raise CircuitoAbierto(
+                    f"Demasiados errores seguidos con {self.host}; se volverá a intentar en {restante:.0f} segundos")
+            # Semiabierto: se permite un intento de prueba
+            self._abierto_desde = time.monotonic()
+
+    def registrar_exito(self):
+        with self._lock:
+            self._fallos = 0
+            self._abierto_desde = None
+
+    def registrar_fallo(self):
+        with self._lock:
+            self._fallos += 1
+            if self._fallos >= self.umbral:
+                self._abierto_desde = time.monotonic()
+
+
+_CIRCUITOS = {}
+_LOCK_CIRCUITOS = threading.Lock()
+
+
+def circuito_para(url):
+    """Circuit breaker compartido por todos los trabajos que van al mismo host."""
+    host = urlparse(url if '//' in url else f'//{url}').hostname or url
+    host = host[4:] if host.startswith('www.') else host
+    with _LOCK_CIRCUITOS:
+        if host not in _CIRCUITOS:
+            _CIRCUITOS[host] = CircuitBreaker(host)
+        return _CIRCUITOS[host]
@@ -0,0 +1,262 @@
+"""Planificador de recursos compartidos: ancho de banda, procesos de ffmpeg y cola justa de trabajos."""
+import asyncio
+import contextlib
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from telemetry import TELEMETRIA
+
+# Menor número = antes. El audio es corto de descargar y de convertir: no debe esperar a una re-codificación de video
+PRIORIDAD_AUDIO = 0
+PRIORIDAD_VIDEO = 1
+
+
+class _Activa:
+    """Una descarga dentro del reparto de ancho de banda."""
+
+    def __init__(self, params):
+        self.params = params
+        self.cuota = None
+        # Bytes que informó el último hook (None hasta el primero) y momento en que la descarga
+        # quedará al día con su cuota
+        self.descargado = None
+        self.libre_en = 0.0
+
+
+class RepartoAncho:
+    """Reparte un límite global de bytes/s a partes iguales entre las descargas activas.
+
+    El límite lo aplica el hook de progreso frenar(): yt-dlp copia sus parámetros a los
+    descargadores de cada fragmento y cada uno aplicaría `ratelimit` por su cuenta, con el valor
+    del momento en que empezó. Los hooks, en cambio, reciben los bytes de toda la descarga y se
+    llaman en cada bloque, así que la parte de cada descarga cambia sobre la marcha cuando entran
+    o salen otras. Los descargadores externos (aria2c) no pasan por los hooks en cada bloque:
+    reciben su parte en `ratelimit` (--max-overall-download-limit) al arrancar.
+    """
+
+    def __init__(self, limite=None):
+        self.limite = limite
+        self._activas = []
+        self._lock = threading.Lock()
+
+    @property
+    def activas(self):
+        with self._lock:
+            return len(self._activas)
+
+    def cuota(self, params):
+        """Bytes/s que le tocan ahora a la descarga (None si no hay límite o no está activa)."""
+        with self._lock:
+            activa = self._buscar(params)
+            return activa and activa.cuota
+
+    @contextlib.contextmanager
+    def reparto(self, params):
+        """Incluye en el reparto los parámetros de una instancia de YoutubeDL mientras dura el bloque."""
+        self.entrar(params)
+        try:
+            yield
+        finally:
+            self.salir(params)
+
+    def entrar(self, params):
+        """Cuenta la instancia como descarga activa (si ya lo era, no cambia nada)."""
+        with self._lock:
+            if self._buscar(params) is None:
+                self._activas.append(_Activa(params))
+                self._repartir()
+
+    def salir(self, params):
+        """Deja de contar la instancia, p. ej. al acabar la transferencia aunque siga el post-procesado."""
+        with self._lock:
+            activa = self._buscar(params)
+            if activa is not None:
+                self._activas.remove(activa)
+                # La instancia vuelve al pool sin límite
+                params.pop('ratelimit', None)
+                self._repartir()
+
+    def frenar(self, params, d):
+        """Hook de progreso: espera lo necesario para que la descarga no pase de su parte."""
+        if d.get('status') != 'downloading':
+            return
+        descargado = d.get('downloaded_bytes') or 0
+        with self._lock:
+            activa = self._buscar(params)
+            if activa is None:
+                return
+            nuevos = descargado - (activa.descargado if activa.descargado is not None else descargado)
+            activa.descargado = descargado
+            # Menos bytes que antes: empieza otro archivo (p. ej. el audio tras el video)
+            if nuevos <= 0 or not activa.cuota:
+                return
+            ahora = time.monotonic()
+            activa.libre_en = max(activa.libre_en, ahora) + nuevos / activa.cuota
+            espera = activa.libre_en - ahora
+        time.sleep(espera)
+
+    def _buscar(self, params):
+        return next((activa for activa in self._activas if activa.params is params), None)
+
+    def _repartir(self):
+        cuota = max(int(self.limite / len(self._activas)), 1) if self.limite and self._activas else None
+        for activa in self._activas:
+            activa.cuota = cuota
+            if cuota and activa.params.get('external_downloader'):
+                activa.params['ratelimit'] = cuota
+            else:
+                activa.params.pop('ratelimit', None)
+
+
+class PoolCPU:
+    """Limita los procesos de ffmpeg que re-codifican a la vez; los turnos se dan por prioridad.
+
+    Sirve a la vez a varios bucles de eventos (cada descarga síncrona tiene el suyo en su hilo):
+    quien espera lo hace con un futuro de su propio bucle, sin ocupar un hilo.
+    """
+
+    def __init__(self, procesos=None, telemetria=None):
+        self.procesos = procesos or max(1, (os.cpu_count() or 2) // 2)
+        self.telemetria = telemetria
+        self._ocupados = 0
+        self._esperando = []
+        self._orden = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def hilos(self):
+        """Hilos de ffmpeg por proceso para no pasar del número de CPUs con el pool lleno."""
+        return max(1, (os.cpu_count() or 1) // self.procesos)
+
+    @property
+    def en_cola(self):
+        with self._lock:
+            return len(self._esperando)
+
+    @contextlib.asynccontextmanager
+    async def turno(self, prioridad=PRIORIDAD_VIDEO):
+        inicio = time.monotonic()
+        await self._tomar(prioridad)
+        if self.telemetria is not None:
+            self.telemetria.emitir('cola', cola='cpu', profundidad=self.en_cola, espera=time.monotonic() - inicio)
+        try:
+            yield
+        finally:
+            self._soltar()
+
+    async def _tomar(self, prioridad):
+        with self._lock:
+            if self._ocupados < self.procesos and not self._esperando:
+                self._ocupados += 1
+                return
+            bucle = asyncio.get_running_loop()
+            futuro = bucle.create_future()
+            entrada = (prioridad, next(self._orden), bucle, futuro)
+            heapq.heappush(self._esperando, entrada)
+        try:
+            await futuro
+        except asyncio.CancelledError:
+            with self._lock:
+                if entrada in self._esperando:
+                    self._esperando.remove(entrada)
+                    heapq.heapify(self._esperando)
+            # Si ya se le había concedido el turno, _conceder lo devuelve al ver el futuro cancelado
+            raise
+
+    def _soltar(self):
+        with self._lock:
+            while self._esperando:
+                _, _, bucle, futuro = heapq.heappop(self._esperando)
+                try:
+                    # El turno pasa directamente al siguiente: _ocupados no cambia
+                    bucle.call_soon_threadsafe(self._conceder, futuro)
+                    return
+                except RuntimeError:
+                    continue  # su bucle ya se cerró
+            self._ocupados -= 1
+
+    def _conceder(self, futuro):
+        if futuro.done():
+            self._soltar()
+        else:
+            futuro.set_result(None)
+
+
+class ColaJusta:
+    """Cola de trabajos con reparto justo entre sesiones.
+
+    Sale antes el trabajo de la sesión con menos trabajos en ejecución; a igualdad, el de mayor
+    prioridad y después el más antiguo. Así una sesión que encola muchas descargas no deja sin
+    turno a las demás.
+    """
+
+    def __init__(self):
+        self._pendientes = []
+        self._en_ejecucion = {}
+        self._orden = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pendientes)
+
+    def poner(self, elemento, sesion=None, prioridad=PRIORIDAD_VIDEO):
+        with self._lock:
+            self._pendientes.append((sesion, prioridad, next(self._orden), elemento))
+
+    def tomar(self):
+        """Saca el siguiente elemento y lo cuenta como en ejecución para su sesión (None si no hay)."""
+        with self._lock:
+            if not self._pendientes:
+                return None
+            entrada = min(self._pendientes, key=lambda e: self._clave(e, self._en_ejecucion))
+            self._pendientes.remove(entrada)
+            self._en_ejecucion[entrada[0]] = self._en_ejecucion.get(entrada[0], 0) + 1
+            return entrada[3]
+
+    def terminar(self, sesion=None):
+        with self._lock:
+            restantes = self._en_ejecucion.get(sesion, 0) - 1
+            if restantes > 0:
+                self._en_ejecucion[sesion] = restantes
+            else:
+                self._en_ejecucion.pop(sesion, None)
+
+    def orden(self):
+        """Elementos pendientes en el orden en que saldrían si no terminara ningún trabajo."""
+        with self._lock:
+            pendientes = list(self._pendientes)
+            en_ejecucion = dict(self._en_ejecucion)
+        orden = []
+        while pendientes:
+            entrada = min(pendientes, key=lambda e: self._clave(e, en_ejecucion))
+            pendientes.remove(entrada)
+            en_ejecucion[entrada[0]] = en_ejecucion.get(entrada[0], 0) + 1
+            orden.append(entrada[3])
+        return orden
+
+    @staticmethod
+    def _clave(entrada, en_ejecucion):
+        sesion, prioridad, llegada, _ = entrada
+        return en_ejecucion.get(sesion, 0), prioridad, llegada
+
+
+class Planificador:
+    """Recursos que comparten todas las descargas del proceso."""
+
+    def __init__(self, limite_ancho=None, procesos_cpu=None, telemetria=None):
+        self.ancho = RepartoAncho(limite_ancho)
+        self.cpu = PoolCPU(procesos_cpu, telemetria)
+
+
+def _planificador_por_defecto():
+    limite = float(os.environ.get('TUBEGRAB_ANCHO_BANDA_MB', '0')) * 1024 * 1024
+    procesos = int(os.environ.get('TUBEGRAB_PROCESOS_FFMPEG', '0'))
+    return Planificador(limite or None, procesos or None, TELEMETRIA)
+
+
+# Planificador compartido por todos los descargadores del proceso
+PLANIFICADOR = _planificador_por_defecto()
@@ -0,0 +1,108 @@
+"""Pool de instancias de YoutubeDL reutilizables, agrupadas por perfil de opciones."""
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class _Sesion:
+    """Una instancia de YoutubeDL cuyos hooks se redirigen al trabajo que la tiene prestada."""
+
+    def __init__(self, crear, opciones):
+        self.hooks_progreso = []
+        self.hooks_postprocesado = []
+        self.ydl = crear({
+            **opciones,
+            'progress_hooks': [self._progreso],
+            'postprocessor_hooks': [self._postprocesado],
+        })
+        self.ultimo_uso = time.monotonic()
+
+    def _progreso(self, d):
+        for hook in self.hooks_progreso:
+            hook(d)
+
+    def _postprocesado(self, d):
+        for hook in self.hooks_postprocesado:
+            hook(d)
+
+    def cerrar(self):
+        try:
+            self.ydl.close()
+        except Exception:
+            pass
+
+
+class PoolSesiones:
+    """Presta instancias de YoutubeDL ya construidas en lugar de crear una por descarga o reintento.
+
+    Cada instancia conserva su sesión HTTP (conexiones keep-alive), las cookies y el estado de los
+    extractores entre préstamos. Una instancia solo la usa un trabajo a la vez; las opciones que
+    cambian en cada descarga (carpeta de salida y hooks) se fijan al prestarla.
+    """
+
+    def __init__(self, max_por_perfil=4, max_inactividad=300):
+        self.max_por_perfil = max_por_perfil
+        self.max_inactividad = max_inactividad
+        self._libres = {}
+        self._lock = threading.Lock()
+        self.creadas = 0
+        self.reutilizadas = 0
+
+    @staticmethod
+    def perfil(opciones, *extra):
+        """Clave del perfil: todo lo que se fija al construir la instancia."""
+        datos = json.dumps([opciones, extra], sort_keys=True, default=repr)
+        return hashlib.sha256(datos.encode('utf-8')).hexdigest()
+
+    @contextmanager
+    def sesion(self, perfil, crear, opciones, rutas=None, progreso=(), postprocesado=()):
+        """Presta una instancia del perfil; `crear(opciones)` construye una nueva si no hay libres."""
+        sesion = self._tomar(perfil)
+        if sesion is None:
+            sesion = _Sesion(crear, opciones)
+            with self._lock:
+                self.creadas += 1
+        sesion.hooks_progreso = list(progreso)
+        sesion.hooks_postprocesado = list(postprocesado)
+        if rutas is not None:
+            sesion.ydl.params['paths'] = rutas
+        try:
+            yield sesion.ydl
+        finally:
+            sesion.hooks_progreso = []
+            sesion.hooks_postprocesado = []
+            self._devolver(perfil, sesion)
+
+    def _tomar(self, perfil):
+        ahora = time.monotonic()
+        caducadas = []
+        with self._lock:
+            for libres in self._libres.values():
+                # Las conexiones keep-alive ya las habrá cerrado el servidor
+                caducadas += [s for s in libres if ahora - s.ultimo_uso > self.max_inactividad]
+                libres[:] = [s for s in libres if ahora - s.ultimo_uso <= self.max_inactividad]
+            libres = self._libres.get(perfil)
+            sesion = libres.pop() if libres else None
+            if sesion is not None:
+                self.reutilizadas += 1
+        for caducada in caducadas:
+            caducada.cerrar()
+        return sesion
+
+    def _devolver(self, perfil, sesion):
+        sesion.ultimo_uso = time.monotonic()
+        with self._lock:
+            libres = self._libres.setdefault(perfil, [])
+            if len(libres) < self.max_por_perfil:
+                libres.append(sesion)
+                return
+        sesion.cerrar()
+
+    def cerrar(self):
+        with self._lock:
+            sesiones = [s for libres in self._libres.values() for s in libres]
+            self._libres.clear()
+        for sesion in sesiones:
+            sesion.cerrar()
@@ -0,0 +1,206 @@
+"""Gestión de la carpeta de descargas: área temporal, subcarpetas por ID, cuota de disco y limpieza."""
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+
+from yt_dlp.utils import sanitize_filename
+
+TEMPORAL = '.tmp'
+
+# Restos de descargas interrumpidas: .part, fragmentos, estado de reanudación y salidas intermedias de ffmpeg
+PATRON_PARCIAL = re.compile(r'\.(part|ytdl)$|\.part-Frag\d+|\.temp\.\w+$')
+EXTENSIONES_MINIATURA = ('.webp', '.jpg', '.jpeg', '.png')
+
+_BARRIDAS = set()
+_LOCK = threading.Lock()
+
+
+class Almacenamiento:
+    """Organiza la carpeta de descargas.
+
+    Cada descarga se escribe en `.tmp/<prefijo>/<id>/` y se mueve con un rename a
+    `<prefijo>/<id>/` cuando termina el post-procesado, así que el servidor de archivos nunca ve
+    un archivo a medias. El prefijo (dos caracteres de un hash) reparte los IDs en 256 carpetas.
+
+    Con un `registro`, la cuota se calcula con el tamaño y el último acceso de los artefactos
+    registrados en lugar de recorrer la carpeta (los archivos que no estén registrados no cuentan).
+    """
+
+    def __init__(self, carpeta, max_bytes=5 * 1024 ** 3, max_edad=7 * 24 * 3600, edad_parciales=6 * 3600,
+                 registro=None):
+        self.carpeta = carpeta
+        self.max_bytes = max_bytes
+        self.max_edad = max_edad
+        self.edad_parciales = edad_parciales
+        self.registro = registro
+
+    def subcarpeta(self, extractor, video_id):
+        """Ruta relativa de la subcarpeta de un video, p. ej. `3f/dQw4w9WgXcQ`."""
+        identificador = f'{extractor}:{video_id}'
+        resumen = hashlib.sha1(identificador.encode('utf-8')).hexdigest()
+        nombre = sanitize_filename(str(video_id), restricted=True)
+        if not nombre or len(nombre) > 40 or '/' in str(video_id):
+            # IDs que en realidad son URLs (extractor genérico)
+            nombre = resumen[:16]
+        return os.path.join(resumen[:2], nombre)
+
+    def rutas(self, extractor, video_id):
+        """Opción `paths` de yt-dlp: destino final y área temporal de la descarga."""
+        subcarpeta = self.subcarpeta(extractor, video_id)
+        return {
+            'home': os.path.join(self.carpeta, subcarpeta),
+            'temp': os.path.join(self.carpeta, TEMPORAL, subcarpeta),
+        }
+
+    def limpiar_temporal(self, rutas):
+        """Borra la subcarpeta temporal de una descarga terminada si quedó vacía."""
+        try:
+            os.removedirs(rutas['temp'])
+        except (KeyError, OSError):
+            pass
+
+    def tocar(self, archivo):
+        """Marca el archivo como usado ahora (la expulsión LRU se basa en la fecha de acceso)."""
+        try:
+            os.utime(archivo, (time.time(), os.stat(archivo).st_mtime))
+        except OSError:
+            pass
+
+    def barrer_al_iniciar(self):
+        """Limpia los restos de descargas interrumpidas una sola vez por proceso y carpeta."""
+        clave = os.path.realpath(self.carpeta)
+        with _LOCK:
+            if clave in _BARRIDAS:
+                return None
+            _BARRIDAS.add(clave)
+        return self.barrer()
+
+    def barrer(self):
+        """Borra parciales viejos, todo lo abandonado en el área temporal y miniaturas huérfanas.
+
+        Solo se tocan archivos más antiguos que `edad_parciales`, para no pisar descargas en curso
+        de otros procesos que compartan la carpeta.
+        """
+        limite = time.time() - self.edad_parciales
+        borrados, liberados = 0, 0
+        temporal = os.path.join(self.carpeta, TEMPORAL)
+        for raiz, carpetas, archivos in os.walk(self.carpeta, topdown=False):
+            relativa = os.path.relpath(raiz, self.carpeta)
+            en_temporal = relativa == TEMPORAL or relativa.startswith(TEMPORAL + os.sep)
+            if relativa != '.' and relativa.startswith('.') and not en_temporal:
+                continue
+            medios = [a for a in archivos if not PATRON_PARCIAL.search(a)
+                      and not a.lower().endswith(EXTENSIONES_MINIATURA)]
+            for archivo in archivos:
+                huerfano = archivo.lower().endswith(EXTENSIONES_MINIATURA) and not medios and relativa != '.'
+                if not (en_temporal or PATRON_PARCIAL.search(archivo) or huerfano):
+                    continue
+                ruta = os.path.join(raiz, archivo)
+                try:
+                    estado = os.stat(ruta)
+                    if estado.st_mtime > limite:
+                        continue
+                    os.remove(ruta)
+                except OSError:
+                    continue
+                borrados += 1
+                liberados += estado.st_size
+            if raiz not in (self.carpeta, temporal):
+                try:
+                    os.rmdir(raiz)  # solo si quedó vacía
+                except OSError:
+                    pass
+        if borrados:
+            print(f"Limpieza de descargas: {borrados} archivos temporales eliminados ({liberados / 1024 / 1024:.1f} MB)")
+        return borrados, liberados
+
+    def _unidades(self):
+        """Unidades de expulsión: cada subcarpeta de ID y los archivos sueltos de versiones anteriores."""
+        unidades = []
+        for entrada in os.scandir(self.carpeta):
+            if entrada.name.startswith('.'):
+                continue
+            if entrada.is_file():
+                estado = entrada.stat()
+                unidades.append((entrada.path, estado.st_size, estado.st_atime))
+            elif entrada.is_dir() and re.fullmatch(r'[0-9a-f]{2}', entrada.name):
+                for subcarpeta in os.scandir(entrada.path):
+                    tamaño, acceso = 0, 0.0
+                    for raiz, _, archivos in os.walk(subcarpeta.path):
+                        for archivo in archivos:
+                            try:
+                                estado = os.stat(os.path.join(raiz, archivo))
+                            except OSError:
+                                continue  # expulsado a la vez por otro proceso
+                            tamaño += estado.st_size
+                            acceso = max(acceso, estado.st_atime)
+                    unidades.append((subcarpeta.path, tamaño, acceso))
+        return unidades
+
+    def aplicar_cuota(self, proteger=()):
+        """Expulsa lo caducado y después lo menos usado hasta quedar por debajo de max_bytes."""
+        if not os.path.isdir(self.carpeta):
+            return
+        protegidas = [os.path.realpath(p) for p in proteger if p]
+        if self.registro:
+            self._aplicar_cuota_registro(protegidas)
+            return
+        ahora = time.time()
+        unidades = sorted(self._unidades(), key=lambda u: u[2])
+        total = sum(tamaño for _, tamaño, _ in unidades)
+        for ruta, tamaño, acceso in unidades:
+            if total <= self.max_bytes and ahora - acceso <= self.max_edad:
+                continue
+            real = os.path.realpath(ruta)
+            if any(p == real or p.startswith(real + os.sep) for p in protegidas):
+                continue
+            if os.path.isdir(ruta):
+                shutil.rmtree(ruta, ignore_errors=True)
+                try:
+                    os.rmdir(os.path.dirname(ruta))  # el prefijo, si era su último ID
+                except OSError:
+                    pass
+            else:
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    continue
+            total -= tamaño
+
+    def _aplicar_cuota_registro(self, protegidas):
+        """Cuota a partir del registro: si no hay nada que expulsar, son dos consultas por índice."""
+        for clave, ruta, _ in self.registro.artefactos_por_acceso(antes_de=time.time() - self.max_edad):
+            self._expulsar_artefacto(clave, ruta, protegidas)
+        total = self.registro.tamaño_artefactos()
+        if total <= self.max_bytes:
+            return
+        for clave, ruta, tamaño in self.registro.artefactos_por_acceso():
+            if total <= self.max_bytes:
+                break
+            if self._expulsar_artefacto(clave, ruta, protegidas):
+                total -= tamaño
+
+    def _expulsar_artefacto(self, clave, ruta, protegidas):
+        """Borra el archivo de un artefacto y lo olvida; quita su subcarpeta de ID y su prefijo si quedan vacías."""
+        if os.path.realpath(ruta) in protegidas:
+            return False
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass  # ya lo borró otro proceso: basta con olvidarlo
+        except OSError:
+            return False
+        self.registro.borrar_artefacto(clave)
+        carpeta = os.path.dirname(ruta)
+        for _ in range(2):
+            if os.path.realpath(carpeta) == os.path.realpath(self.carpeta):
+                break
+            try:
+                os.rmdir(carpeta)
+            except OSError:
+                break
+            carpeta = os.path.dirname(carpeta)
+        return True
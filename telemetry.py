@@ -0,0 +1,295 @@
+"""Telemetría de las descargas: eventos estructurados por fase y sumideros intercambiables."""
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+EXTRACCION = 'extraccion'
+DESCARGA = 'descarga'
+POSTPROCESADO = 'postprocesado'
+
+# Como mucho un evento de progreso cada tanto por descarga (yt-dlp llama al hook por cada bloque)
+INTERVALO_PROGRESO = 0.5
+
+
+class Telemetria:
+    """Reparte cada evento entre los sumideros registrados.
+
+    Un sumidero es cualquier callable que recibe el evento (un dict). Los fallos de un sumidero
+    se registran y se ignoran: la telemetría nunca interrumpe una descarga.
+    """
+
+    def __init__(self, sumideros=(), campos=None, padre=None):
+        self.sumideros = list(sumideros)
+        self.campos = campos or {}
+        self._padre = padre
+
+    def agregar(self, sumidero):
+        self.sumideros.append(sumidero)
+        return sumidero
+
+    def con(self, **campos):
+        """Telemetría hija que añade los campos dados a cada evento antes de reenviarlo a esta."""
+        return Telemetria(campos=campos, padre=self)
+
+    def emitir(self, evento, /, **campos):
+        # El nombre del evento es solo posicional: los campos pueden llamarse como sea (p. ej. `tipo`)
+        if self._padre is not None:
+            self._padre.emitir(evento, **{**self.campos, **campos})
+            return
+        evento = {'ts': time.time(), 'evento': evento, **self.campos, **campos}
+        for sumidero in list(self.sumideros):
+            try:
+                sumidero(evento)
+            except Exception as e:
+                print(f"Error en un sumidero de telemetría: {str(e)}")
+
+    def medicion(self, descarga, **campos):
+        """Empieza a medir una descarga; sus eventos llevan el identificador `descarga`."""
+        return Medicion(self, descarga, campos)
+
+
+class Medicion:
+    """Cronometra las fases de una descarga y traduce los hooks de yt-dlp a eventos."""
+
+    def __init__(self, telemetria, descarga, campos):
+        self.telemetria = telemetria
+        self.campos = {'descarga': descarga, **campos}
+        self.inicio = time.monotonic()
+        self.duraciones = defaultdict(float)
+        self._fase = None
+        self._inicio_fase = None
+        self._inicio_descarga = None
+        self._primer_byte = False
+        self._bytes = {}
+        self._ultimo_progreso = 0.0
+        self._emitir('inicio')
+
+    def _emitir(self, evento, /, **campos):
+        self.telemetria.emitir(evento, **{**self.campos, **campos})
+
+    def _abrir_fase(self, fase, **campos):
+        self._cerrar_fase()
+        self._fase, self._inicio_fase = fase, time.monotonic()
+        self._emitir('fase_inicio', fase=fase, **campos)
+
+    def _cerrar_fase(self, error=None):
+        if self._fase is None:
+            return
+        duracion = time.monotonic() - self._inicio_fase
+        self.duraciones[self._fase] += duracion
+        campos = {'error': type(error).__name__} if error else {}
+        self._emitir('fase', fase=self._fase, duracion=duracion, ok=error is None, **campos)
+        self._fase = None
+
+    @contextmanager
+    def fase(self, nombre):
+        self._abrir_fase(nombre)
+        try:
+            yield
+        except Exception as e:
+            self._cerrar_fase(error=e)
+            raise
+        self._cerrar_fase()
+
+    @property
+    def bytes(self):
+        return sum(self._bytes.values())
+
+    def iniciar_descarga(self):
+        """Marca el comienzo de la transferencia; el tiempo hasta el primer byte se mide desde aquí."""
+        self._inicio_descarga = time.monotonic()
+        self._primer_byte = False
+        self._abrir_fase(DESCARGA)
+
+    def hook_progreso(self, d):
+        if d['status'] == 'downloading':
+            descargado = d.get('downloaded_bytes') or 0
+            self._bytes[d.get('filename')] = descargado
+            ahora = time.monotonic()
+            if not self._primer_byte and descargado and self._inicio_descarga is not None:
+                self._primer_byte = True
+                self._emitir('primer_byte', ttfb=ahora - self._inicio_descarga)
+            if ahora - self._ultimo_progreso < INTERVALO_PROGRESO:
+                return
+            self._ultimo_progreso = ahora
+            self._emitir('progreso', descargado=self.bytes,
+                         total=d.get('total_bytes') or d.get('total_bytes_estimate'),
+                         velocidad=d.get('speed'), eta=d.get('eta'))
+        elif d['status'] == 'finished':
+            self._bytes[d.get('filename')] = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+            self._emitir('progreso', descargado=self.bytes, total=self.bytes, velocidad=d.get('speed'), eta=0)
+
+    def hook_postprocesado(self, d):
+        if d['status'] == 'started':
+            self._abrir_fase(POSTPROCESADO, postprocesador=d.get('postprocessor'))
+        elif d['status'] == 'finished':
+            self._cerrar_fase()
+
+    def reintento(self, intento, espera, error, clasificacion):
+        self._cerrar_fase(error=error)
+        self._emitir('reintento', intento=intento, espera=espera, error=type(error).__name__,
+                     clasificacion=clasificacion)
+
+    def terminar(self, error=None, clasificacion=None):
+        """Cierra la fase abierta y emite el resumen de la descarga."""
+        self._cerrar_fase(error=error)
+        duracion = time.monotonic() - self.inicio
+        transferencia = self.duraciones[DESCARGA]
+        campos = {'error': type(error).__name__, 'clasificacion': clasificacion} if error else {}
+        resultado = ('cancelado' if clasificacion == 'cancelada' else 'fallido') if error else 'completado'
+        self._emitir('fin', resultado=resultado, duracion=duracion,
+                     bytes=self.bytes, velocidad_media=self.bytes / transferencia if transferencia else None,
+                     fases=dict(self.duraciones), **campos)
+
+
+class SumideroJSONL:
+    """Añade cada evento como una línea JSON a un archivo."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+
+    def __call__(self, evento):
+        linea = json.dumps(evento, ensure_ascii=False, default=str)
+        with self._lock, open(self.ruta, 'a', encoding='utf-8') as f:
+            f.write(linea + '\n')
+
+
+class BufferEventos:
+    """Últimos eventos en memoria y estado vivo de las descargas en curso, para pintar el progreso."""
+
+    def __init__(self, capacidad=1000):
+        self._eventos = deque(maxlen=capacidad)
+        self._en_curso = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, evento):
+        with self._lock:
+            self._eventos.append(evento)
+            descarga = evento.get('descarga')
+            if descarga is None:
+                return
+            if evento['evento'] == 'fin':
+                self._en_curso.pop(descarga, None)
+                return
+            estado = self._en_curso.setdefault(descarga, {})
+            estado.update({k: v for k, v in evento.items() if k not in ('evento', 'duracion', 'ok')})
+            if evento['evento'] == 'fase':
+                estado.pop('fase', None)
+
+    def eventos(self, desde=0.0):
+        with self._lock:
+            return [e for e in self._eventos if e['ts'] > desde]
+
+    def en_curso(self, **filtro):
+        """Estado de las descargas activas cuyos campos coinciden con el filtro (p. ej. trabajo=...)."""
+        with self._lock:
+            return [dict(estado) for estado in self._en_curso.values()
+                    if all(estado.get(k) == v for k, v in filtro.items())]
+
+
+class MetricasPrometheus:
+    """Agrega los eventos en contadores y los expone en el formato de texto de Prometheus."""
+
+    def __init__(self):
+        self._contadores = defaultdict(float)
+        self._lock = threading.Lock()
+        self._en_curso = 0
+        self._profundidad = {}
+
+    def _sumar(self, nombre, etiquetas, valor=1.0):
+        self._contadores[(nombre, tuple(sorted(etiquetas.items())))] += valor
+
+    def __call__(self, evento):
+        tipo = evento['evento']
+        extractor = {'extractor': evento.get('extractor') or 'desconocido'}
+        with self._lock:
+            if tipo == 'inicio':
+                self._en_curso += 1
+            elif tipo == 'fin':
+                self._en_curso -= 1
+                self._sumar('tubegrab_descargas_total', {**extractor, 'resultado': evento['resultado']})
+                self._sumar('tubegrab_bytes_descargados_total', extractor, evento.get('bytes') or 0)
+            elif tipo == 'fase':
+                self._sumar('tubegrab_fase_segundos_sum', {'fase': evento['fase']}, evento['duracion'])
+                self._sumar('tubegrab_fase_segundos_count', {'fase': evento['fase']})
+            elif tipo == 'primer_byte':
+                self._sumar('tubegrab_primer_byte_segundos_sum', extractor, evento['ttfb'])
+                self._sumar('tubegrab_primer_byte_segundos_count', extractor)
+            elif tipo == 'reintento':
+                self._sumar('tubegrab_reintentos_total', {**extractor, 'clasificacion': evento['clasificacion']})
+            elif tipo == 'cache':
+                self._sumar('tubegrab_cache_total', {'resultado': 'acierto' if evento['acierto'] else 'fallo'})
+            elif tipo == 'cola':
+                self._profundidad[evento['cola']] = evento['profundidad']
+                if evento.get('espera') is not None:
+                    self._sumar('tubegrab_cola_espera_segundos_sum', {'cola': evento['cola']}, evento['espera'])
+                    self._sumar('tubegrab_cola_espera_segundos_count', {'cola': evento['cola']})
+
+    def texto(self):
+        tipos = {
+            'tubegrab_descargas_total': ('counter', 'Descargas terminadas por extractor y resultado'),
+            'tubegrab_bytes_descargados_total': ('counter', 'Bytes transferidos por extractor'),
+            'tubegrab_fase_segundos': ('summary', 'Tiempo por fase (extraccion, descarga, postprocesado)'),
+            'tubegrab_primer_byte_segundos': ('summary', 'Tiempo hasta el primer byte'),
+            'tubegrab_reintentos_total': ('counter', 'Reintentos por extractor y tipo de error'),
+            'tubegrab_cache_total': ('counter', 'Consultas a la caché de archivos'),
+            'tubegrab_cola_espera_segundos': ('summary', 'Tiempo de espera en la cola de trabajos y en la de ffmpeg'),
+        }
+        with self._lock:
+            contadores = sorted(self._contadores.items())
+            lineas = ['# HELP tubegrab_descargas_en_curso Descargas en curso',
+                      '# TYPE tubegrab_descargas_en_curso gauge',
+                      f'tubegrab_descargas_en_curso {self._en_curso}']
+            if self._profundidad:
+                lineas += ['# HELP tubegrab_cola_profundidad Trabajos esperando turno',
+                           '# TYPE tubegrab_cola_profundidad gauge']
+                lineas += [f'tubegrab_cola_profundidad{{cola="{_escapar(cola)}"}} {n}'
+                           for cola, n in sorted(self._profundidad.items())]
+        vistos = set()
+        for (nombre, etiquetas), valor in contadores:
+            base = nombre.rsplit('_', 1)[0] if nombre.endswith(('_sum', '_count')) else nombre
+            if base not in vistos and base in tipos:
+                vistos.add(base)
+                tipo, ayuda = tipos[base]
+                lineas += [f'# HELP {base} {ayuda}', f'# TYPE {base} {tipo}']
+            texto_etiquetas = ','.join(f'{k}="{_escapar(v)}"' for k, v in etiquetas)
+            lineas.append(f'{nombre}{{{texto_etiquetas}}} {valor:g}' if etiquetas else f'{nombre} {valor:g}')
+        return '\n'.join(lineas) + '\n'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class BarraConsola:
+    """Barra de progreso tqdm por descarga para la versión de línea de comandos."""
+
+    def __init__(self):
+        from tqdm import tqdm  # solo la necesita la línea de comandos
+        self._tqdm = tqdm
+        self._barras = {}
+
+    def __call__(self, evento):
+        descarga, tipo = evento.get('descarga'), evento['evento']
+        if tipo == 'progreso':
+            barra = self._barras.get(descarga)
+            if barra is None:
+                barra = self._barras[descarga] = self._tqdm(total=evento.get('total') or 0, unit='B',
+                                                      unit_scale=True, desc="Descargando")
+            if evento.get('total'):
+                barra.total = max(evento['total'], barra.total or 0)
+            barra.update(evento['descargado'] - barra.n)
+        elif tipo == 'fase' and evento['fase'] == DESCARGA or tipo == 'fin':
+            barra = self._barras.pop(descarga, None)
+            if barra:
+                barra.close()
+                print("\nDescarga completada, procesando archivo...")
+
+
+# Telemetría compartida por todas las descargas del proceso
+BUFFER = BufferEventos()
+METRICAS = MetricasPrometheus()
+TELEMETRIA = Telemetria([BUFFER, METRICAS])
@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pytest
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [RAIZ, os.path.join(RAIZ, 'benchmarks')]
+
+from servidor_medios import ServidorMedios  # noqa: E402
+
+
+@pytest.fixture
+def servidor():
+    """Servidor local de medios de los benchmarks; cuenta las peticiones que recibe."""
+    medios = ServidorMedios().iniciar()
+    yield medios
+    medios.cerrar()
+
+
+@pytest.fixture
+def carpeta(tmp_path):
+    return str(tmp_path / 'descargas')
+
+
+FFMPEG_FALSO = r'''#!{python}
+"""ffmpeg de prueba: copia la primera entrada (archivo, URL o pipe:0) en la salida y anota cuál fue.
+
+Con FFMPEG_FALSO_SIN_COPIA falla como ffmpeg cuando no puede copiar un stream (-c copy).
+Con FFMPEG_FALSO_PAUSA anota su pid, deja la salida a medias y se queda esperando esos segundos.
+"""
+import os, shutil, sys, time, urllib.request
+argumentos = sys.argv[1:]
+if argumentos and argumentos[0] in ('-version', '-bsfs'):
+    print('ffmpeg version 6.0 Copyright')
+    print('libavformat 60. 3.100 / 60. 3.100')
+    sys.exit(0)
+if os.environ.get('FFMPEG_FALSO_SIN_COPIA') and 'copy' in argumentos:
+    sys.exit('Could not write header: codec not currently supported in container')
+if os.environ.get('FFMPEG_FALSO_PAUSA'):
+    with open(os.path.join(os.path.dirname(__file__), 'pid.log'), 'w') as registro:
+        registro.write(str(os.getpid()))
+    with open(argumentos[-1].removeprefix('file:'), 'wb') as destino:
+        destino.write(b'a medias')
+    time.sleep(float(os.environ['FFMPEG_FALSO_PAUSA']))
+entrada = argumentos[argumentos.index('-i') + 1]
+with open(os.path.join(os.path.dirname(__file__), 'entradas.log'), 'a') as registro:
+    registro.write(entrada.split(':')[0] + '\n')
+with open(argumentos[-1].removeprefix('file:'), 'wb') as destino:
+    if entrada == 'pipe:0':
+        shutil.copyfileobj(sys.stdin.buffer, destino)
+    elif entrada.startswith(('http:', 'https:')):
+        with urllib.request.urlopen(entrada) as origen:
+            shutil.copyfileobj(origen, destino)
+    else:
+        with open(entrada.removeprefix('file:'), 'rb') as origen:
+            shutil.copyfileobj(origen, destino)
+'''
+
+
+@pytest.fixture
+def ffmpeg_falso(tmp_path, monkeypatch):
+    """Pone en el PATH un ffmpeg que copia sin convertir; devuelve una función con las entradas usadas."""
+    carpeta = tmp_path / 'bin'
+    carpeta.mkdir()
+    ejecutable = carpeta / 'ffmpeg'
+    ejecutable.write_text(FFMPEG_FALSO.replace('{python}', sys.executable))
+    ejecutable.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{carpeta}{os.pathsep}{os.environ['PATH']}")
+    # yt-dlp recuerda por proceso la versión de cada ejecutable; sin esto valdría la de un test anterior
+    monkeypatch.setattr(FFmpegPostProcessor, '_version_cache', {None: None})
+    monkeypatch.setattr(FFmpegPostProcessor, '_features_cache', {})
+
+    def entradas():
+        registro = carpeta / 'entradas.log'
+        return registro.read_text().split() if registro.exists() else []
+    return entradas
@@ -0,0 +1,13 @@
+import pytest
+
+from bench_arranque import medir, puntos_de_entrada
+
+PUNTOS = puntos_de_entrada()
+
+
+@pytest.mark.parametrize('punto', PUNTOS)
+def test_arranque_sin_modulos_pesados(punto):
+    _, pesados = medir(PUNTOS[punto])
+
+    # yt-dlp, tqdm, PIL y mutagen solo se importan al empezar una descarga
+    assert pesados == []
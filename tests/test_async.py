@@ -0,0 +1,72 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from descargadores_prueba import AudioPrueba, DescargadorPrueba
+
+TAMAÑO = 400_000
+
+
+def test_async_for_recorre_el_progreso_y_await_da_el_resultado(carpeta, servidor):
+    downloader = DescargadorPrueba(carpeta, cache=False, cache_info=False)
+
+    async def descargar():
+        descarga = downloader.descargar_async(servidor.url('/ver/a1', tamaño=TAMAÑO))
+        eventos = [evento async for evento in descarga]
+        return eventos, await descarga
+
+    eventos, media_info = asyncio.run(descargar())
+
+    # Progreso de la transferencia y, detrás, el de los post-procesadores
+    transferencia = [e for e in eventos if 'postprocessor' not in e]
+    assert transferencia[-1]['status'] == 'finished'
+    assert transferencia[-1]['downloaded_bytes'] == TAMAÑO
+    assert any(e['status'] == 'downloading' for e in transferencia)
+    assert os.path.getsize(media_info['archivo']) == TAMAÑO
+
+
+def test_cancel_corta_la_transferencia(carpeta, servidor):
+    downloader = DescargadorPrueba(carpeta, cache=False, cache_info=False)
+
+    async def descargar():
+        # 100 KB/s: la descarga completa tardaría cuatro segundos
+        descarga = downloader.descargar_async(servidor.url('/ver/a2', tamaño=TAMAÑO, velocidad=100_000))
+        async for evento in descarga:
+            if evento['status'] == 'downloading':
+                descarga.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await descarga
+        return descarga
+
+    descarga = asyncio.run(descargar())
+
+    assert descarga.done()
+    # El .part queda para reanudar; el hilo de la transferencia ya no escribe en él
+    archivos = [os.path.join(raiz, n) for raiz, _, nombres in os.walk(carpeta) for n in nombres if n.startswith('a2')]
+    assert [os.path.basename(a) for a in archivos] == ['a2.mp4.part']
+    tamaño = os.path.getsize(archivos[0])
+    time.sleep(0.3)
+    assert os.path.getsize(archivos[0]) == tamaño < TAMAÑO
+
+
+def test_cancel_mata_el_ffmpeg_en_curso_y_borra_su_salida(carpeta, servidor, ffmpeg_falso, tmp_path, monkeypatch):
+    monkeypatch.setenv('FFMPEG_FALSO_PAUSA', '60')
+    registro_pid = tmp_path / 'bin' / 'pid.log'
+    downloader = AudioPrueba(carpeta, cache=False, cache_info=False)
+
+    async def descargar():
+        descarga = downloader.descargar_async(servidor.url('/ver/a3', tamaño=200_000))
+        while not registro_pid.exists() or not registro_pid.read_text():
+            assert not descarga.done()
+            await asyncio.sleep(0.05)
+        descarga.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(descarga, 10)
+
+    asyncio.run(descargar())
+
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(registro_pid.read_text()), 0)
+    assert not [n for _, _, nombres in os.walk(carpeta) for n in nombres if n.endswith('.mp3')]
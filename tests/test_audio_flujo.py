@@ -0,0 +1,39 @@
+import os
+
+from descargadores_prueba import AudioPrueba
+
+TAMAÑO = 1_000_000
+
+
+def descargar(carpeta, servidor, video_id, **parametros):
+    downloader = AudioPrueba(carpeta, cache=False, cache_info=False, tamaño_chunk_http=300_000)
+    return downloader.descargar(servidor.url(f'/ver/{video_id}', perfil='audio_webm', tamaño=TAMAÑO, **parametros))
+
+
+def test_convierte_durante_la_descarga_por_rangos(carpeta, servidor, ffmpeg_falso):
+    media_info = descargar(carpeta, servidor, 'f1')
+
+    assert ffmpeg_falso() == ['pipe']
+    assert media_info['archivo'].endswith('f1.mp3')
+    with open(media_info['archivo'], 'rb') as f:
+        assert f.read() == servidor.datos(TAMAÑO)
+    # Rangos de 300 KB, como el HttpFD de yt-dlp: ninguna petición sin rango al archivo
+    assert servidor.contador['rangos'] == 4
+
+
+def test_un_corte_se_reanuda_desde_el_ultimo_byte(carpeta, servidor, ffmpeg_falso):
+    media_info = descargar(carpeta, servidor, 'f2', fallo='corte', fallo_cada=100)
+
+    # Un único ffmpeg: el rango cortado se repite desde donde iba en lugar de empezar de cero
+    assert ffmpeg_falso() == ['pipe']
+    with open(media_info['archivo'], 'rb') as f:
+        assert f.read() == servidor.datos(TAMAÑO)
+    assert servidor.contador['fallos'] == 1
+
+
+def test_mp4_sigue_por_la_descarga_completa(carpeta, servidor, ffmpeg_falso):
+    downloader = AudioPrueba(carpeta, cache=False, cache_info=False)
+    media_info = downloader.descargar(servidor.url('/ver/f3', tamaño=200_000))
+
+    assert ffmpeg_falso() == ['file']
+    assert os.path.basename(media_info['archivo']) == 'f3.mp3'
@@ -0,0 +1,27 @@
+import os
+
+from descargadores_prueba import DescargadorPrueba
+from registry import Registro
+
+
+def test_sin_registro_compartido_no_se_crea_la_base_de_datos(carpeta, servidor):
+    downloader = DescargadorPrueba(carpeta, registro_compartido=False, cache_info=False)
+    media_info = downloader.descargar(servidor.url('/ver/c1', tamaño=50_000))
+
+    assert os.path.exists(media_info['archivo'])
+    assert downloader.cache is None
+    assert not os.path.exists(Registro(carpeta).ruta)
+
+
+def test_guardar_no_recorre_los_demas_artefactos(carpeta, servidor):
+    downloader = DescargadorPrueba(carpeta, cache_info=False)
+    primero = downloader.descargar(servidor.url('/ver/c2', tamaño=50_000))
+    os.remove(primero['archivo'])
+
+    downloader.descargar(servidor.url('/ver/c3', tamaño=50_000))
+
+    # La entrada del archivo borrado se olvida al pedirla, no al guardar otra
+    clave = downloader._clave_cache(primero['url'], downloader._opciones_descarga())
+    assert downloader.cache.registro.artefacto(clave) is not None
+    assert downloader.cache.obtener(clave) is None
+    assert downloader.cache.registro.artefacto(clave) is None
@@ -0,0 +1,21 @@
+import pytest
+
+from bench_urls import CORPUS
+from canonical_url import canonicalizar, url_canonica
+
+
+@pytest.mark.parametrize('url, esperado', CORPUS, ids=[repr(url) for url, _ in CORPUS])
+def test_corpus_de_variantes(url, esperado):
+    assert canonicalizar(url) == esperado
+
+
+@pytest.mark.parametrize('url, normalizada', [
+    ('https://soundcloud.com/artista/cancion/s-AbC123xYz?si=1', 'https://soundcloud.com/artista/cancion/s-AbC123xYz'),
+    ('https://soundcloud.com/artista/sets/album/s-QwErTy9', 'https://soundcloud.com/artista/sets/album/s-QwErTy9'),
+    ('https://www.youtube.com/clip/UgkxU2HSeGL_NvmDJ-nQJrlLwllwMDBdGZFs', None),
+])
+def test_url_canonica_conserva_lo_que_hace_falta_para_descargar(url, normalizada):
+    canonica = canonicalizar(url)
+
+    assert canonica is not None
+    assert url_canonica(canonica) == normalizada
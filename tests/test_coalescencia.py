@@ -0,0 +1,53 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from coalescing import bloqueo_archivo_async
+from descargadores_prueba import DescargadorPrueba
+
+PETICIONES = 8
+TAMAÑO = 1024 * 1024
+
+
+def test_peticiones_identicas_comparten_una_descarga(carpeta, servidor):
+    # Entrega lenta (1 s) para que todas las peticiones coincidan en el tiempo
+    lento = {'tamaño': TAMAÑO, 'velocidad': TAMAÑO}
+    eventos = []
+
+    def pedir(url):
+        return DescargadorPrueba(carpeta, progreso=eventos.append).descargar(url)
+
+    pedir(servidor.url('/ver/referencia', **lento))
+    por_descarga = servidor.contador['GET']
+    servidor.reiniciar_contador()
+
+    url = servidor.url('/ver/compartido', **lento)
+    with ThreadPoolExecutor(max_workers=PETICIONES) as pool:
+        resultados = list(pool.map(pedir, [url] * PETICIONES))
+
+    assert all(resultados)
+    assert len({r['archivo'] for r in resultados}) == 1
+    assert servidor.contador['GET'] == por_descarga
+    assert servidor.contador['extracciones'] == 1
+    # Los bloqueos de archivo se borran al soltarse
+    assert os.listdir(os.path.join(carpeta, '.locks')) == []
+
+
+def test_el_bloqueo_de_archivo_es_exclusivo_aunque_se_borre_al_soltarlo(tmp_path):
+    registro = []
+
+    async def turno(i):
+        async with bloqueo_archivo_async(str(tmp_path), 'clave'):
+            registro.append(i)
+            await asyncio.sleep(0.01)
+            registro.append(i)
+
+    async def todos():
+        await asyncio.gather(*(turno(i) for i in range(5)))
+
+    asyncio.run(todos())
+
+    # Cada turno entra y sale sin que otro se cuele en medio
+    assert [registro[j] for j in range(0, 10, 2)] == [registro[j] for j in range(1, 10, 2)]
+    assert sorted(set(registro)) == list(range(5))
+    assert os.listdir(tmp_path / '.locks') == []
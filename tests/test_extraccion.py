@@ -0,0 +1,74 @@
+import functools
+import os
+
+import yt_dlp
+
+from descargadores_prueba import DescargadorPrueba, VideoPrueba
+from servidor_medios import MedioFalsoIE
+
+
+class VideoSinFormatoPreferido(VideoPrueba):
+    """El descargador de video real con un formato preferido que el medio de prueba no tiene."""
+    FORMATO_PREFERIDO = 'formato_inexistente'
+
+
+class FragmentosGeneradosIE(MedioFalsoIE):
+    """Como YouTube con los directos desde el inicio: los fragmentos DASH los genera un callable al descargar."""
+
+    def _real_extract(self, url):
+        info = super()._real_extract(url)
+        for formato in info['formats']:
+            formato['fragments'] = functools.partial(self._fragmentos, formato['fragments'])
+            formato['is_from_start'] = True
+        return info
+
+    def _fragmentos(self, fragmentos, ctx):
+        yield from fragmentos
+
+
+class DescargadorFragmentosGenerados(DescargadorPrueba):
+    def _crear_ydl(self, ydl_opts):
+        ydl = yt_dlp.YoutubeDL(ydl_opts, auto_init=False)
+        ydl.add_info_extractor(FragmentosGeneradosIE())
+        return ydl
+
+
+def test_una_sola_extraccion_por_descarga(carpeta, servidor):
+    media_info = DescargadorPrueba(carpeta).descargar(servidor.url('/ver/e1', tamaño=100_000))
+
+    assert servidor.contador['extracciones'] == 1
+    # La ruta sale de la información post-procesada, no del título
+    assert os.path.basename(media_info['archivo']) == 'e1.mp4'
+    with open(media_info['archivo'], 'rb') as f:
+        assert f.read() == servidor.datos(100_000)
+
+
+def test_los_reintentos_reutilizan_la_extraccion(carpeta, servidor):
+    media_info = DescargadorPrueba(carpeta).descargar(
+        servidor.url('/ver/e2', tamaño=100_000, fallo='503', fallo_cada=2))
+
+    assert os.path.exists(media_info['archivo'])
+    assert servidor.contador['fallos'] == 1
+    assert servidor.contador['extracciones'] == 1
+
+
+def test_el_formato_alternativo_y_la_lista_de_formatos_reutilizan_la_extraccion(carpeta, servidor, ffmpeg_falso,
+                                                                                capsys):
+    media_info = VideoSinFormatoPreferido(carpeta).descargar(servidor.url('/ver/e3', tamaño=100_000))
+
+    salida = capsys.readouterr().out
+    assert "Formato: progresivo - mp4" in salida  # _listar_formatos
+    assert os.path.exists(media_info['archivo'])
+    assert servidor.contador['extracciones'] == 1
+
+
+def test_la_descarga_no_usa_la_copia_aligerada_de_la_cache(carpeta, servidor):
+    descargador = DescargadorFragmentosGenerados(carpeta)
+    url = servidor.url('/ver/e4', perfil='dash', fragmentos=3, tamaño_fragmento=10_000)
+    # La vista previa deja en la caché una copia JSON en la que el callable es un texto
+    assert descargador.obtener_info(url)['titulo'] == 'Medio de prueba e4'
+
+    media_info = descargador.descargar(url)
+
+    assert os.path.getsize(media_info['archivo']) == 30_000
+    assert servidor.contador['extracciones'] == 2
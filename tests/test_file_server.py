@@ -0,0 +1,16 @@
+import urllib.request
+
+from file_server import ServidorArchivos
+
+
+def test_por_defecto_solo_escucha_en_local(carpeta, tmp_path):
+    (tmp_path / 'descargas').mkdir()
+    (tmp_path / 'descargas' / 'a.mp3').write_bytes(b'0123456789')
+    servidor = ServidorArchivos(carpeta, puerto=0).iniciar()
+    try:
+        assert servidor.solo_local
+        peticion = urllib.request.Request(f'http://127.0.0.1:{servidor.puerto}/a.mp3', headers={'Range': 'bytes=2-4'})
+        with urllib.request.urlopen(peticion) as respuesta:
+            assert respuesta.status == 206 and respuesta.read() == b'234'
+    finally:
+        servidor.detener()
@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+import job_manager
+from descargadores_prueba import DescargadorPrueba
+from job_manager import COMPLETADO, GestorTrabajos
+from registry import Registro
+from telemetry import TELEMETRIA
+
+
+class DescargadorFalso:
+    """Descargador sin red que mide la descarga con la telemetría que le da el gestor."""
+
+    def __init__(self, carpeta, progreso=None, telemetria=None):
+        self.progreso = progreso
+        self.telemetria = telemetria
+
+    def descargar(self, url, **recorte):
+        self.recorte = recorte
+        medicion = self.telemetria.medicion(url)
+        self.progreso({'status': 'downloading', 'downloaded_bytes': 5, 'total_bytes': 10})
+        medicion.terminar()
+        return {'titulo': 'Prueba', 'archivo': 'prueba.mp4'}
+
+
+def esperar(gestor, trabajo_id, limite=10.0):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        trabajo = gestor.obtener(trabajo_id)
+        if not trabajo.activo:
+            return trabajo
+        time.sleep(0.02)
+    pytest.fail(f"El trabajo sigue en estado {trabajo.estado}")
+
+
+@pytest.fixture
+def gestor(carpeta, monkeypatch):
+    monkeypatch.setattr(job_manager, 'clase_descargador', lambda tipo: DescargadorPrueba)
+    gestor = GestorTrabajos(max_trabajadores=2, carpeta_destino=carpeta)
+    yield gestor
+    gestor.cerrar(esperar=True)
+
+
+def test_trabajo_completo_con_telemetria_del_trabajo(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_manager, 'clase_descargador', lambda tipo: DescargadorFalso)
+    gestor = GestorTrabajos(max_trabajadores=1, carpeta_destino=str(tmp_path))
+    eventos = []
+    sumidero = TELEMETRIA.agregar(eventos.append)
+    try:
+        trabajo_id = gestor.enviar('audio', 'https://www.youtube.com/watch?v=prueba')
+        trabajo = esperar(gestor, trabajo_id)
+    finally:
+        TELEMETRIA.sumideros.remove(sumidero)
+        gestor.cerrar(esperar=True)
+
+    assert trabajo.estado == COMPLETADO, trabajo.error
+    assert trabajo.resultado['archivo'] == 'prueba.mp4'
+    fin = [e for e in eventos if e['evento'] == 'fin' and e.get('trabajo') == trabajo_id]
+    assert fin and fin[0]['tipo'] == 'audio'
+
+
+def test_un_fallo_al_empezar_no_deja_el_trabajo_en_cola(gestor, servidor, monkeypatch, capsys):
+    def romper(trabajo):
+        raise RuntimeError("descargador roto")
+
+    monkeypatch.setattr(gestor, '_ejecutar', romper)
+    trabajo_id = gestor.enviar('audio', servidor.url('/ver/j2'), sesion='s1')
+    trabajo = esperar(gestor, trabajo_id)
+
+    assert trabajo.estado == 'fallido' and trabajo.error == "descargador roto"
+    # La sesión no se queda con una descarga en marcha fantasma que le reste turnos
+    gestor.cerrar(esperar=True)
+    assert gestor._cola._en_ejecucion == {}
+    assert "descargador roto" in capsys.readouterr().out
+
+
+def test_un_huerfano_reanudado_se_libera_al_terminar(gestor, servidor):
+    # Otra réplica cayó con la descarga a medias: su lease ya caducó
+    otra_replica = Registro(gestor.carpeta_destino, propietario='replica-caida')
+    otra_replica.reclamar('huerfano-1', servidor.url('/ver/j3'), descargador='YouTubeAudioDownloader', duracion=-1)
+
+    [trabajo_id] = gestor.reanudar_huerfanos()
+    trabajo = esperar(gestor, trabajo_id)
+
+    assert trabajo.estado == COMPLETADO, trabajo.error
+    # La descarga se hizo con otra clave: la reclamación no queda colgada hasta que caduque
+    gestor.cerrar(esperar=True)
+    assert gestor.registro.trabajo('huerfano-1') is None
+
+
+def test_el_fragmento_se_valida_al_encolar_y_llega_al_descargador(tmp_path, monkeypatch):
+    descargadores = []
+
+    def crear(carpeta, **kwargs):
+        descargadores.append(DescargadorFalso(carpeta, **kwargs))
+        return descargadores[-1]
+
+    monkeypatch.setattr(job_manager, 'clase_descargador', lambda tipo: crear)
+    gestor = GestorTrabajos(max_trabajadores=1, carpeta_destino=str(tmp_path))
+    try:
+        with pytest.raises(ValueError):
+            gestor.enviar('video', 'https://www.youtube.com/watch?v=prueba', inicio='2:00', fin='1:00')
+        trabajo = esperar(gestor, gestor.enviar('video', 'https://www.youtube.com/watch?v=prueba',
+                                                inicio='1:30', fin='2:00', corte_preciso=True))
+    finally:
+        gestor.cerrar(esperar=True)
+
+    assert trabajo.estado == COMPLETADO, trabajo.error
+    assert descargadores[-1].recorte == {'inicio': '1:30', 'fin': '2:00', 'corte_preciso': True}
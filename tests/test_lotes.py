@@ -0,0 +1,107 @@
+import os
+
+import pytest
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+
+from descargadores_prueba import AudioPrueba, DescargadorPrueba
+from media_downloader import SoundCloudDownloader
+from servidor_medios import MedioFalsoIE
+
+
+class CanalPruebaIE(InfoExtractor):
+    """Canal como el de YouTube: una playlist de pestañas, cada una con sus videos."""
+    _VALID_URL = r'https://canal\.prueba/(?P<id>[^/]+)(?:/(?P<pestaña>videos|shorts))?$'
+
+    def _real_extract(self, url):
+        canal, pestaña = self._match_valid_url(url).group('id', 'pestaña')
+        if pestaña is None:
+            return self.playlist_result(
+                [self.url_result(f'https://canal.prueba/{canal}/{p}', CanalPruebaIE) for p in ('videos', 'shorts')],
+                canal, canal)
+        return self.playlist_result(
+            [self.url_result(f'https://canal.prueba/ver/{pestaña}{i}', 'VideoPrueba', f'{pestaña}{i}') for i in range(2)],
+            f'{canal}-{pestaña}', pestaña)
+
+
+class VideoPruebaIE(InfoExtractor):
+    _VALID_URL = r'https://canal\.prueba/ver/(?P<id>\w+)'
+
+
+class ConCanal(DescargadorPrueba):
+    def _crear_ydl(self, ydl_opts):
+        ydl = yt_dlp.YoutubeDL(ydl_opts, auto_init=False)
+        ydl.add_info_extractor(CanalPruebaIE())
+        ydl.add_info_extractor(VideoPruebaIE())
+        ydl.add_default_info_extractors()
+        return ydl
+
+
+def test_un_canal_se_expande_a_los_videos_de_sus_pestañas(carpeta):
+    elementos = ConCanal(carpeta).expandir_lote('https://canal.prueba/c1')
+
+    assert [e['id'] for e in elementos] == ['videos0', 'videos1', 'shorts0', 'shorts1']
+    assert {e['extractor'] for e in elementos} == {'VideoPrueba'}
+
+
+class SetPruebaIE(InfoExtractor):
+    """Set como los de SoundCloud: entradas transparentes a URLs internas, no a enlaces públicos."""
+    _VALID_URL = r'https://soundcloud\.com/(?P<id>[^/]+/sets/[^/]+)'
+
+    def _real_extract(self, url):
+        base = self._downloader.params['base_prueba']
+        return self.playlist_result(
+            [self.url_result(f'{base}/ver/pista{i}?tamaño=50000', MedioFalsoIE, f'pista{i}', url_transparent=True)
+             for i in range(2)],
+            self._match_id(url))
+
+
+class SoundCloudPrueba(SoundCloudDownloader):
+    """El descargador de SoundCloud real, con su validación de URLs, sobre el servidor local."""
+
+    def __init__(self, carpeta_destino, base, **kwargs):
+        self.base = base
+        super().__init__(carpeta_destino, descargador_externo=None, cache_info=False, **kwargs)
+
+    def _crear_ydl(self, ydl_opts):
+        ydl = yt_dlp.YoutubeDL({**ydl_opts, 'base_prueba': self.base}, auto_init=False)
+        ydl.add_info_extractor(SetPruebaIE())
+        ydl.add_info_extractor(MedioFalsoIE())
+        ydl.add_default_info_extractors()
+        return ydl
+
+
+def test_las_entradas_de_un_set_se_descargan_con_su_extractor(carpeta, servidor, ffmpeg_falso):
+    downloader = SoundCloudPrueba(carpeta, servidor.url(''))
+    elementos = downloader.expandir_lote('https://soundcloud.com/artista/sets/album')
+    assert {e['ie_key'] for e in elementos} == {'MedioFalso'}
+
+    resultados = list(downloader.descargar_lote(elementos))
+
+    assert [r['estado'] for r in resultados] == ['completado', 'completado'], resultados
+    # Fuera de un lote, la misma URL sigue sin ser de SoundCloud
+    with pytest.raises(ValueError):
+        downloader.descargar(elementos[0]['url'])
+
+
+def estados(downloader, urls):
+    return {r['url']: r for r in downloader.descargar_lote(urls, max_trabajadores=2)}
+
+
+def test_omite_lo_que_ya_descargo_este_mismo_descargador(carpeta, servidor, ffmpeg_falso):
+    urls = [servidor.url(f'/ver/l{i}', tamaño=50_000) for i in range(2)]
+    AudioPrueba(carpeta, cache_info=False).descargar(urls[0])
+
+    # El MP3 de un descargador de audio no cuenta como el video del mismo enlace
+    video = DescargadorPrueba(carpeta, cache_info=False)
+    assert {r['estado'] for r in estados(video, urls).values()} == {'completado'}
+
+    resultados = estados(video, urls)
+    assert {r['estado'] for r in resultados.values()} == {'omitido'}
+    assert os.path.exists(resultados[urls[0]]['info']['archivo'])
+
+    # Un archivo borrado (p. ej. por la cuota) se vuelve a descargar
+    os.remove(resultados[urls[1]]['info']['archivo'])
+    resultados = estados(video, urls)
+    assert resultados[urls[0]]['estado'] == 'omitido'
+    assert resultados[urls[1]]['estado'] == 'completado'
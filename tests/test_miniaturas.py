@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from PIL import Image
+
+import thumbnail_cache
+from descargadores_prueba import AudioPrueba
+from thumbnail_cache import ANCHO_FICHA, ANCHO_VISTA_PREVIA, CacheMiniaturas
+
+
+def anchos(cache, url):
+    return {ancho: Image.open(cache.ruta(url, ancho)).width for ancho in cache.anchos}
+
+
+def test_la_vista_previa_baja_la_miniatura_una_sola_vez(carpeta, servidor):
+    cache = CacheMiniaturas(carpeta)
+    remota = servidor.url('/miniatura/m1.jpg')
+
+    ruta = cache.obtener('https://youtu.be/dQw4w9WgXcQ', ANCHO_VISTA_PREVIA, remota=remota)
+    assert ruta.startswith(os.path.join(carpeta, '.cache', 'miniaturas'))
+    assert anchos(cache, 'https://youtu.be/dQw4w9WgXcQ') == {ANCHO_FICHA: ANCHO_FICHA,
+                                                             ANCHO_VISTA_PREVIA: ANCHO_VISTA_PREVIA}
+
+    # La clave es el ID del video: otra forma de la misma URL y el otro ancho salen de la copia local
+    otra_url = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=5'
+    assert cache.obtener(otra_url, ANCHO_FICHA, remota=remota)
+    assert cache.obtener(otra_url, ANCHO_VISTA_PREVIA, remota=remota) == ruta
+    assert servidor.contador['miniaturas'] == 1
+
+
+def test_las_peticiones_simultaneas_comparten_la_preparacion(carpeta, servidor):
+    cache = CacheMiniaturas(carpeta)
+    remota = servidor.url('/miniatura/m2.jpg', latencia=0.2)
+    rutas = []
+    hilos = [threading.Thread(target=lambda: rutas.append(cache.obtener('https://youtu.be/m2', ANCHO_FICHA,
+                                                                         remota=remota)))
+             for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert len(set(rutas)) == 1 and rutas[0]
+    assert servidor.contador['miniaturas'] == 1
+
+
+def test_no_amplia_las_miniaturas_pequenas(carpeta, servidor):
+    cache = CacheMiniaturas(carpeta)
+    cache.obtener('https://youtu.be/m3', ANCHO_FICHA, remota=servidor.url('/miniatura/m3.jpg', ancho=400, alto=300))
+
+    assert anchos(cache, 'https://youtu.be/m3') == {ANCHO_FICHA: 400, ANCHO_VISTA_PREVIA: ANCHO_VISTA_PREVIA}
+
+
+def test_sin_miniatura_devuelve_none(carpeta, servidor):
+    cache = CacheMiniaturas(carpeta)
+
+    assert cache.obtener('https://youtu.be/m4', ANCHO_FICHA) is None
+    assert cache.obtener('https://youtu.be/m4', ANCHO_FICHA, remota=servidor.url('/archivo/m4.jpg')) is None
+    assert cache.preparar('https://youtu.be/m4', origen=os.path.join(carpeta, 'no_existe.jpg')).exception()
+
+
+def test_expulsa_las_variantes_menos_usadas(carpeta, tmp_path):
+    origen = tmp_path / 'origen.jpg'
+    Image.linear_gradient('L').resize((1280, 720)).convert('RGB').save(origen, 'JPEG')
+    cache = CacheMiniaturas(carpeta)
+    for i in range(3):
+        cache.preparar(f'https://youtu.be/lru{i}', origen=str(origen)).result(timeout=10)
+        time.sleep(0.05)
+    tamaño = sum(entrada.stat().st_size for entrada in os.scandir(cache.carpeta))
+
+    # Se usa la primera: la menos usada pasa a ser la segunda
+    time.sleep(0.05)
+    assert cache.ruta('https://youtu.be/lru0', ANCHO_FICHA)
+    assert cache.ruta('https://youtu.be/lru0', ANCHO_VISTA_PREVIA)
+    # Caben tres miniaturas: al preparar la cuarta sale la menos usada
+    cache.max_bytes = tamaño
+    cache.preparar('https://youtu.be/lru3', origen=str(origen)).result(timeout=10)
+
+    assert cache.ruta('https://youtu.be/lru1', ANCHO_FICHA) is None
+    for video in ('lru0', 'lru2', 'lru3'):
+        assert cache.ruta(f'https://youtu.be/{video}', ANCHO_FICHA)
+
+
+class EjecutorInmediato:
+    """Ejecuta la tarea al enviarla: el futuro ya está terminado cuando se le añaden callbacks."""
+
+    def submit(self, funcion, *args):
+        futuro = Future()
+        futuro.set_result(funcion(*args))
+        return futuro
+
+
+def test_preparar_no_se_bloquea_si_la_miniatura_ya_esta_lista(carpeta, tmp_path, monkeypatch):
+    monkeypatch.setattr(thumbnail_cache, '_EJECUTOR', EjecutorInmediato())
+    origen = tmp_path / 'origen.jpg'
+    Image.new('RGB', (8, 8)).save(origen, 'JPEG')
+    cache = CacheMiniaturas(carpeta)
+
+    hilo = threading.Thread(target=lambda: cache.preparar('https://youtu.be/r1', origen=str(origen)), daemon=True)
+    hilo.start()
+    hilo.join(timeout=5)
+    assert not hilo.is_alive()
+    assert cache.ruta('https://youtu.be/r1', ANCHO_FICHA)
+    assert not thumbnail_cache._EN_CURSO
+
+
+def test_la_descarga_deja_la_miniatura_en_la_cache(carpeta, servidor, ffmpeg_falso):
+    downloader = AudioPrueba(carpeta, cache=False, cache_info=False)
+    url = servidor.url('/ver/m5', tamaño=100_000)
+    downloader.descargar(url)
+
+    # La ficha del archivo no vuelve a pedir la miniatura aunque el post-procesado ya la haya borrado
+    ruta = downloader.miniaturas.obtener(url, ANCHO_FICHA, remota=servidor.url('/miniatura/m5.jpg'))
+    assert ruta and Image.open(ruta).width == ANCHO_FICHA
+    assert servidor.contador['miniaturas'] == 1
@@ -0,0 +1,92 @@
+import asyncio
+import os
+
+import pytest
+
+from postprocessors import AudioEtiquetadoPP, ContenedorMP4PP, FFmpegDosModosPP
+
+
+def test_los_modos_de_ffmpeg_exigen_preparar_y_terminar():
+    with pytest.raises(TypeError):
+        FFmpegDosModosPP()
+
+
+def test_mp4_lleva_faststart_una_sola_vez(tmp_path, ffmpeg_falso, monkeypatch):
+    origen = tmp_path / 'v.webm'
+    origen.write_bytes(b'datos')
+    comandos = []
+    lanzar = asyncio.create_subprocess_exec
+
+    async def registrar(*comando, **opciones):
+        comandos.append(comando)
+        return await lanzar(*comando, **opciones)
+
+    monkeypatch.setattr(asyncio, 'create_subprocess_exec', registrar)
+    info = {'filepath': str(origen), 'ext': 'webm', 'vcodec': 'vp9', 'acodec': 'opus'}
+    _, info = asyncio.run(ContenedorMP4PP(hilos=1).ejecutar_async(info))
+
+    assert info['filepath'].endswith('v.mp4')
+    assert comandos[0].count('-movflags') == 1
+
+
+def test_el_audio_m4a_tambien_lleva_faststart(tmp_path):
+    info = {'filepath': str(tmp_path / 'a.webm'), 'ext': 'webm', 'acodec': 'opus'}
+    _, _, opciones = AudioEtiquetadoPP(codec='m4a').preparar(info)
+
+    assert opciones[opciones.index('-movflags') + 1] == '+faststart'
+
+
+@pytest.mark.parametrize('ext, vcodec, acodec, pipeline, copia_video, copia_audio', [
+    ('mkv', 'avc1.64001f', 'mp4a.40.2', 'remux', True, True),
+    ('webm', 'vp9', 'opus', 'transcodificacion', False, False),
+    ('mkv', 'avc1.64001f', 'opus', 'transcodificacion', True, False),
+    ('webm', 'none', 'mp4a.40.2', 'remux', True, True),
+    # Códecs desconocidos: se re-codifica ese stream en lugar de copiarlo a ciegas
+    ('mp4', None, 'mp4a.40.2', 'transcodificacion', False, True),
+    ('flv', 'avc1', None, 'transcodificacion', True, False),
+])
+def test_el_contenedor_mp4_solo_copia_los_codecs_conocidos(tmp_path, ext, vcodec, acodec, pipeline, copia_video,
+                                                          copia_audio):
+    info = {'filepath': str(tmp_path / f'v.{ext}'), 'ext': ext, 'vcodec': vcodec, 'acodec': acodec}
+    _, _, opciones = ContenedorMP4PP().preparar(info)
+
+    assert info['pipeline'] == pipeline
+    assert (opciones[opciones.index('-c:v') + 1] == 'copy') == copia_video
+    assert (opciones[opciones.index('-c:a') + 1] == 'copy') == copia_audio
+
+
+def test_un_mp4_con_codecs_compatibles_no_se_toca(tmp_path):
+    info = {'filepath': str(tmp_path / 'v.mp4'), 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a.40.2'}
+
+    assert ContenedorMP4PP().preparar(info) is None
+    assert info['pipeline'] == 'sin_conversion'
+
+
+def test_si_el_remux_falla_se_recodifica_una_vez(tmp_path, ffmpeg_falso, monkeypatch):
+    monkeypatch.setenv('FFMPEG_FALSO_SIN_COPIA', '1')
+    origen = tmp_path / 'v.mkv'
+    origen.write_bytes(b'datos')
+    info = {'filepath': str(origen), 'ext': 'mkv', 'vcodec': 'avc1', 'acodec': 'mp4a.40.2'}
+    _, info = asyncio.run(ContenedorMP4PP(hilos=1).ejecutar_async(info))
+
+    assert info['pipeline'] == 'transcodificacion'
+    assert info['filepath'].endswith('v.mp4')
+    assert os.path.exists(info['filepath'])
+
+
+def test_la_cadena_de_yt_dlp_tambien_recodifica_si_el_remux_falla(tmp_path, ffmpeg_falso, monkeypatch):
+    monkeypatch.setenv('FFMPEG_FALSO_SIN_COPIA', '1')
+    origen = tmp_path / 'v.mkv'
+    origen.write_bytes(b'datos')
+    info = {'filepath': str(origen), 'ext': 'mkv', 'vcodec': 'avc1', 'acodec': 'mp4a.40.2'}
+    _, info = ContenedorMP4PP(hilos=1).run(info)
+
+    assert info['pipeline'] == 'transcodificacion'
+    assert os.path.exists(info['filepath'])
+
+
+def test_sin_streams_que_copiar_no_hay_segundo_intento(tmp_path, ffmpeg_falso, monkeypatch):
+    monkeypatch.setenv('FFMPEG_FALSO_SIN_COPIA', '1')
+    info = {'filepath': str(tmp_path / 'v.webm'), 'ext': 'webm', 'vcodec': 'vp9', 'acodec': 'opus'}
+
+    assert ContenedorMP4PP().alternativa(info) is None
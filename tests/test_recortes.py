@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from canonical_url import Recorte, recorte_temporal
+from descargadores_prueba import DescargadorPrueba
+
+
+@pytest.mark.parametrize('inicio, fin, recorte', [
+    ('1:30', '2m', Recorte(90, 120, False)),
+    (90, None, Recorte(90, None, False)),
+    (None, '1h2m3s', Recorte(0, 3723, False)),
+    ('0', '', None),
+    (None, None, None),
+])
+def test_recorte_temporal_acepta_segundos_y_relojes(inicio, fin, recorte):
+    assert recorte_temporal(inicio, fin) == recorte
+
+
+@pytest.mark.parametrize('inicio, fin', [('2:00', '1:30'), (30, 30), ('pronto', None), (-5, None)])
+def test_recorte_temporal_rechaza_los_tiempos_no_validos(inicio, fin):
+    with pytest.raises(ValueError):
+        recorte_temporal(inicio, fin)
+
+
+def test_el_recorte_da_nombre_y_rango_de_yt_dlp():
+    assert Recorte(90, None, False).rango == (90, float('inf'))
+    assert Recorte(90, 120.5, True).etiqueta == '90s-120.5s'
+
+
+def test_un_fragmento_no_pisa_al_archivo_completo(carpeta, servidor, ffmpeg_falso):
+    downloader = DescargadorPrueba(carpeta, cache_info=False)
+    url = servidor.url('/ver/c1', tamaño=100_000)
+
+    recorte = downloader.descargar(url, inicio='0:10', fin=20)
+    # yt-dlp descarga los rangos con ffmpeg directamente desde la URL del formato
+    assert ffmpeg_falso() == ['http']
+    assert os.path.basename(recorte['archivo']) == 'c1 [10s-20s].mp4'
+    assert recorte['recorte'] == (10, 20)
+
+    completo = downloader.descargar(url)
+    assert os.path.basename(completo['archivo']) == 'c1.mp4' and 'recorte' not in completo
+    assert os.path.exists(recorte['archivo'])
+
+    # Cada fragmento tiene su propia entrada en la caché
+    assert downloader.descargar(url, inicio=10, fin='20s')['archivo'] == recorte['archivo']
+    assert ffmpeg_falso() == ['http']
@@ -0,0 +1,117 @@
+import io
+
+import pytest
+from yt_dlp.networking import Response
+from yt_dlp.networking.exceptions import HTTPError
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessorError
+from yt_dlp.utils import DownloadError, ExtractorError
+
+import retry_policy
+from retry_policy import (CircuitBreaker, CircuitoAbierto, PERMANENTE, PoliticaReintentos, REINTENTABLE,
+                          clasificar_error, es_error_de_red)
+
+
+def error_http(estado, **cabeceras):
+    """Un DownloadError como los de yt-dlp, con el HTTPError original en exc_info."""
+    causa = HTTPError(Response(io.BytesIO(b''), 'https://ejemplo.com/v', cabeceras, status=estado))
+    return DownloadError(f'ERROR: {causa}', exc_info=(type(causa), causa, None))
+
+
+@pytest.mark.parametrize('error, clasificacion', [
+    (error_http(403), REINTENTABLE),
+    (error_http(429), REINTENTABLE),
+    (error_http(503), REINTENTABLE),
+    (error_http(404), PERMANENTE),
+    (DownloadError('ERROR: [youtube] abc: Private video. Sign in if you have been granted access'), PERMANENTE),
+    (DownloadError('ERROR: Requested format is not available'), PERMANENTE),
+    (ExtractorError('Este video no existe', expected=True), PERMANENTE),
+    (ConnectionResetError('Connection reset by peer'), REINTENTABLE),
+    (DownloadError('ERROR: unable to download video data: <urlopen error timed out>'), REINTENTABLE),
+])
+def test_clasificar_error(error, clasificacion):
+    assert clasificar_error(error) == clasificacion
+
+
+@pytest.mark.parametrize('error, de_red', [
+    (error_http(503), True),
+    (TimeoutError(), True),
+    (DownloadError('ERROR: Got error: The read operation timed out'), True),
+    (FFmpegPostProcessorError('Conversion failed!'), False),
+    (OSError(28, 'No space left on device'), False),
+])
+def test_es_error_de_red(error, de_red):
+    assert es_error_de_red(error) == de_red
+
+
+def test_la_espera_crece_con_jitter_y_tiene_tope():
+    politica = PoliticaReintentos(base=1.0, factor=2.0, maximo=5.0)
+
+    for intento, tope in [(0, 1.0), (1, 2.0), (2, 4.0), (5, 5.0)]:
+        esperas = [politica.espera(intento) for _ in range(200)]
+        assert all(0 <= espera <= tope for espera in esperas)
+        assert max(esperas) > tope / 2
+
+
+def test_la_espera_respeta_retry_after_hasta_el_maximo():
+    assert PoliticaReintentos(maximo=30).espera(0, error_http(429, **{'Retry-After': '7'})) == 7
+    assert PoliticaReintentos(maximo=5).espera(0, error_http(429, **{'Retry-After': '120'})) == 5
+
+
+def test_el_circuito_se_abre_tras_el_umbral_y_deja_pasar_una_prueba(monkeypatch):
+    ahora = [100.0]
+    monkeypatch.setattr(retry_policy.time, 'monotonic', lambda: ahora[0])
+    circuito = CircuitBreaker('ejemplo.com', umbral=2, enfriamiento=60)
+
+    circuito.registrar_fallo()
+    circuito.comprobar()
+    circuito.registrar_fallo()
+    with pytest.raises(CircuitoAbierto):
+        circuito.comprobar()
+
+    ahora[0] += 61
+    circuito.comprobar()  # intento de prueba
+    with pytest.raises(CircuitoAbierto):
+        circuito.comprobar()  # mientras dura la prueba no pasa nadie más
+    circuito.registrar_exito()
+    circuito.comprobar()
+
+
+def test_solo_los_errores_de_red_cuentan_para_el_circuito():
+    politica = PoliticaReintentos(base=0, maximo=0)
+    circuito = CircuitBreaker('ejemplo.com', umbral=1)
+
+    # ffmpeg falla: se reintenta, pero el host no tiene la culpa
+    assert politica.tras_fallo(FFmpegPostProcessorError('Conversion failed!'), 0, 3, circuito) == 0
+    circuito.comprobar()
+    # Un error permanente no se reintenta ni cuenta
+    assert politica.tras_fallo(error_http(404), 0, 3, circuito) is None
+    circuito.comprobar()
+    # El último intento no espera, pero el fallo de red sí cuenta
+    assert politica.tras_fallo(error_http(503), 2, 3, circuito) is None
+    with pytest.raises(CircuitoAbierto):
+        circuito.comprobar()
+
+
+def test_ejecutar_reintenta_hasta_que_sale_bien(monkeypatch):
+    monkeypatch.setattr(retry_policy, '_CIRCUITOS', {})
+    fallos = [error_http(503), ConnectionResetError('Connection reset by peer')]
+
+    def funcion():
+        if fallos:
+            raise fallos.pop(0)
+        return 'hecho'
+
+    assert PoliticaReintentos(base=0.01, maximo=0.01).ejecutar('https://ejemplo.com/v', funcion) == 'hecho'
+
+
+def test_ejecutar_no_reintenta_los_errores_permanentes(monkeypatch):
+    monkeypatch.setattr(retry_policy, '_CIRCUITOS', {})
+    llamadas = []
+
+    def funcion():
+        llamadas.append(1)
+        raise error_http(404)
+
+    with pytest.raises(DownloadError):
+        PoliticaReintentos(base=0.01).ejecutar('https://ejemplo.com/v', funcion, intentos_maximos=3)
+    assert len(llamadas) == 1
@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+import pytest
+import yt_dlp
+from yt_dlp.downloader.external import Aria2cFD
+
+import scheduler
+from descargadores_prueba import DescargadorPrueba
+from scheduler import Planificador, PoolCPU, RepartoAncho
+from telemetry import MetricasPrometheus, Telemetria
+
+
+def test_reparto_entrar_y_salir_son_idempotentes():
+    reparto = RepartoAncho(limite=1000)
+    a, b = {}, {}
+    reparto.entrar(a)
+    reparto.entrar(a)
+    reparto.entrar(b)
+    assert reparto.activas == 2 and reparto.cuota(a) == 500
+    reparto.salir(b)
+    reparto.salir(b)
+    assert reparto.activas == 1 and reparto.cuota(a) == 1000 and reparto.cuota(b) is None
+
+
+def test_el_limite_se_reparte_a_partes_iguales_entre_las_activas():
+    reparto = RepartoAncho(limite=900)
+    descargas = [{}, {}, {}]
+    for params in descargas:
+        reparto.entrar(params)
+    assert [reparto.cuota(params) for params in descargas] == [300, 300, 300]
+
+    reparto.salir(descargas[0])
+    assert [reparto.cuota(params) for params in descargas[1:]] == [450, 450]
+    assert RepartoAncho().cuota(descargas[1]) is None
+
+
+@pytest.fixture
+def esperas(monkeypatch):
+    registro = []
+    monkeypatch.setattr(scheduler.time, 'sleep', registro.append)
+    return registro
+
+
+def test_frenar_aplica_la_parte_actual_a_toda_la_descarga(esperas):
+    reparto = RepartoAncho(limite=100_000)
+    a, b = {}, {}
+    reparto.entrar(a)
+    # El primer aviso solo marca el punto de partida (p. ej. lo que ya había en el .part)
+    reparto.frenar(a, {'status': 'downloading', 'downloaded_bytes': 500_000})
+    reparto.frenar(a, {'status': 'downloading', 'downloaded_bytes': 550_000})
+    assert esperas[-1] == pytest.approx(0.5, abs=0.05)
+
+    # Entra otra descarga: la parte de `a` baja a la mitad en el siguiente bloque
+    reparto.entrar(b)
+    esperas.clear()
+    reparto.frenar(a, {'status': 'downloading', 'downloaded_bytes': 575_000})
+    assert esperas[-1] == pytest.approx(0.5 + 0.5, abs=0.05)
+
+
+def test_frenar_no_cuenta_los_archivos_nuevos_ni_las_descargas_fuera_del_reparto(esperas):
+    reparto = RepartoAncho(limite=100_000)
+    a = {}
+    reparto.entrar(a)
+    reparto.frenar(a, {'status': 'downloading', 'downloaded_bytes': 10_000})
+    # Empieza el audio tras el video: downloaded_bytes vuelve a contar desde cero
+    reparto.frenar(a, {'status': 'downloading', 'downloaded_bytes': 1_000})
+    reparto.frenar(a, {'status': 'finished', 'downloaded_bytes': 900_000})
+    reparto.frenar({}, {'status': 'downloading', 'downloaded_bytes': 900_000})
+    assert esperas == []
+
+
+def test_aria2c_recibe_su_parte_al_arrancar():
+    reparto = RepartoAncho(limite=1000)
+    nativa = {}
+    ydl = yt_dlp.YoutubeDL({'external_downloader': {'default': 'aria2c'}, 'quiet': True})
+    reparto.entrar(nativa)
+    reparto.entrar(ydl.params)
+
+    comando = Aria2cFD(ydl, ydl.params)._make_cmd('video.mp4.part', {'url': 'https://ejemplo.com/v.mp4'})
+    assert comando[comando.index('--max-overall-download-limit') + 1] == '500'
+    # Las descargas de yt-dlp no llevan ratelimit: sus fragmentos se quedarían con el valor de ahora
+    assert 'ratelimit' not in nativa
+    reparto.salir(ydl.params)
+    assert 'ratelimit' not in ydl.params
+
+
+def transferencia(downloader, url):
+    """Segundos entre el primer y el último aviso de progreso de la descarga."""
+    momentos = []
+    downloader.progreso = lambda d: momentos.append(time.monotonic()) if 'postprocessor' not in d else None
+    assert downloader.descargar(url)
+    return momentos[-1] - momentos[0]
+
+
+@pytest.mark.parametrize('perfil', ['dash', 'hls'])
+def test_el_limite_vale_para_los_fragmentos_en_paralelo(carpeta, servidor, perfil):
+    # 800 KB en 8 fragmentos, 4 a la vez, con 1 MB/s: cada fragmento a 1 MB/s lo haría en 0,2 s
+    downloader = DescargadorPrueba(carpeta, planificador=Planificador(limite_ancho=1_000_000),
+                                   fragmentos_concurrentes=4, cache=False, cache_info=False)
+    url = servidor.url(f'/ver/l{perfil}', perfil=perfil, fragmentos=8, tamaño_fragmento=100_000)
+
+    assert transferencia(downloader, url) > 0.6
+
+
+def test_el_post_procesado_no_cuenta_como_descarga_activa(carpeta, servidor):
+    class ConPostprocesado(DescargadorPrueba):
+        async def _postprocesar(self, ydl, info, hooks):
+            self.activas_al_postprocesar = self.planificador.ancho.activas
+            return info
+
+    planificador = Planificador(limite_ancho=100 * 1024 * 1024)
+    downloader = ConPostprocesado(carpeta, planificador=planificador, cache=False, cache_info=False)
+    assert downloader.descargar(servidor.url('/ver/r1', tamaño=100_000))
+    assert downloader.activas_al_postprocesar == 0
+    assert planificador.ancho.activas == 0
+
+
+def test_la_espera_por_ffmpeg_llega_a_las_metricas():
+    metricas = MetricasPrometheus()
+    pool = PoolCPU(procesos=1, telemetria=Telemetria([metricas]))
+
+    async def convertir():
+        async with pool.turno():
+            await asyncio.sleep(0.1)
+
+    async def dos_a_la_vez():
+        await asyncio.gather(convertir(), convertir())
+
+    asyncio.run(dos_a_la_vez())
+
+    texto = metricas.texto()
+    assert 'tubegrab_cola_profundidad{cola="cpu"} 0' in texto
+    assert 'tubegrab_cola_espera_segundos_count{cola="cpu"} 2' in texto
+    espera = float(next(linea for linea in texto.splitlines()
+                        if linea.startswith('tubegrab_cola_espera_segundos_sum')).split()[-1])
+    assert espera >= 0.1
@@ -0,0 +1,94 @@
+import media_downloader
+from descargadores_prueba import DescargadorPrueba
+from session_pool import PoolSesiones
+
+
+class YdlFalso:
+    """Lo justo de YoutubeDL para el pool: sus parámetros y close()."""
+
+    def __init__(self, params):
+        self.params = params
+        self.cerrado = False
+
+    def close(self):
+        self.cerrado = True
+
+
+def test_reutiliza_la_instancia_del_mismo_perfil():
+    pool = PoolSesiones()
+    perfil = PoolSesiones.perfil({'format': 'best'})
+
+    with pool.sesion(perfil, YdlFalso, {'format': 'best'}) as primera:
+        pass
+    with pool.sesion(perfil, YdlFalso, {'format': 'best'}) as segunda:
+        pass
+    with pool.sesion(PoolSesiones.perfil({'format': 'bestaudio'}), YdlFalso, {'format': 'bestaudio'}) as otra:
+        pass
+
+    assert segunda is primera and otra is not primera
+    assert (pool.creadas, pool.reutilizadas) == (2, 1)
+
+
+def test_una_instancia_solo_la_usa_un_trabajo_a_la_vez():
+    pool = PoolSesiones()
+    perfil = PoolSesiones.perfil({})
+
+    with pool.sesion(perfil, YdlFalso, {}) as primera:
+        with pool.sesion(perfil, YdlFalso, {}) as segunda:
+            assert segunda is not primera
+    assert pool.creadas == 2
+
+
+def test_los_hooks_y_las_rutas_son_del_trabajo_que_la_tiene_prestada():
+    pool = PoolSesiones()
+    perfil = PoolSesiones.perfil({})
+    eventos_a, eventos_b = [], []
+
+    with pool.sesion(perfil, YdlFalso, {}, rutas={'home': 'a'}, progreso=[eventos_a.append]) as ydl:
+        assert ydl.params['paths'] == {'home': 'a'}
+        ydl.params['progress_hooks'][0]({'status': 'downloading'})
+    # Ya devuelta, los avisos no llegan a nadie
+    ydl.params['progress_hooks'][0]({'status': 'downloading'})
+    with pool.sesion(perfil, YdlFalso, {}, rutas={'home': 'b'}, progreso=[eventos_b.append]) as ydl:
+        assert ydl.params['paths'] == {'home': 'b'}
+        ydl.params['progress_hooks'][0]({'status': 'finished'})
+
+    assert eventos_a == [{'status': 'downloading'}]
+    assert eventos_b == [{'status': 'finished'}]
+
+
+def test_cierra_las_que_sobran_y_las_inactivas():
+    pool = PoolSesiones(max_por_perfil=1, max_inactividad=0)
+    perfil = PoolSesiones.perfil({})
+
+    with pool.sesion(perfil, YdlFalso, {}) as primera:
+        with pool.sesion(perfil, YdlFalso, {}) as segunda:
+            pass
+    # La segunda ocupó el único hueco; la primera ya no cabía
+    assert primera.cerrado and not segunda.cerrado
+
+    with pool.sesion(perfil, YdlFalso, {}) as tercera:
+        pass
+    # Sin tiempo de inactividad permitido, la libre caduca antes de prestarse
+    assert segunda.cerrado and tercera is not segunda
+    pool.cerrar()
+    assert tercera.cerrado
+
+
+def descargar_varias(monkeypatch, carpeta, servidor, pool, ronda):
+    monkeypatch.setattr(media_downloader, 'POOL', pool)
+    servidor.reiniciar_contador()
+    downloader = DescargadorPrueba(carpeta, cache=False, cache_info=False)
+    for i in range(3):
+        assert downloader.descargar(servidor.url(f'/ver/{ronda}{i}', tamaño=50_000))
+    pool.cerrar()
+    return servidor.contador['conexiones']
+
+
+def test_las_descargas_seguidas_comparten_instancia_y_conexiones(monkeypatch, carpeta, servidor):
+    sin_pool = descargar_varias(monkeypatch, carpeta, servidor, PoolSesiones(max_por_perfil=0), 's')
+    pool = PoolSesiones()
+    con_pool = descargar_varias(monkeypatch, carpeta, servidor, pool, 'p')
+
+    assert (pool.creadas, pool.reutilizadas) == (1, 2)
+    assert con_pool < sin_pool
@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+import storage
+from descargadores_prueba import DescargadorPrueba
+from registry import Registro
+from storage import Almacenamiento
+
+
+def test_la_cuota_expulsa_lo_menos_usado_sin_recorrer_la_carpeta(carpeta, servidor, monkeypatch):
+    cuota = Almacenamiento(carpeta, max_bytes=250_000, registro=Registro(carpeta))
+    downloader = DescargadorPrueba(carpeta, almacenamiento=cuota, cache_info=False)
+    monkeypatch.setattr(storage.os, 'walk', lambda *a, **k: pytest.fail("recorrido de la carpeta"))
+
+    archivos = [downloader.descargar(servidor.url(f'/ver/q{i}', tamaño=100_000))['archivo'] for i in range(3)]
+
+    assert [os.path.exists(a) for a in archivos] == [False, True, True]
+    assert cuota.registro.tamaño_artefactos() == 200_000
+    # La subcarpeta del ID expulsado no queda vacía en disco
+    assert not os.path.exists(os.path.dirname(archivos[0]))
@@ -0,0 +1,112 @@
+import json
+
+from descargadores_prueba import DescargadorPrueba
+from telemetry import BufferEventos, MetricasPrometheus, SumideroJSONL, Telemetria
+
+
+def telemetria_con_registro():
+    eventos = []
+    return Telemetria([eventos.append]), eventos
+
+
+def test_hija_añade_sus_campos_aunque_se_llamen_tipo():
+    telemetria, eventos = telemetria_con_registro()
+    telemetria.con(trabajo='t1', tipo='audio').emitir('fin', resultado='completado')
+
+    assert eventos[0]['evento'] == 'fin'
+    assert eventos[0]['tipo'] == 'audio'
+    assert eventos[0]['trabajo'] == 't1'
+
+
+def test_medicion_cronometra_fases_y_resume_al_terminar():
+    telemetria, eventos = telemetria_con_registro()
+    medicion = telemetria.con(trabajo='t1').medicion('d1', extractor='prueba')
+    with medicion.fase('extraccion'):
+        pass
+    medicion.iniciar_descarga()
+    medicion.hook_progreso({'status': 'downloading', 'filename': 'a', 'downloaded_bytes': 10})
+    medicion.hook_progreso({'status': 'finished', 'filename': 'a', 'total_bytes': 100})
+    medicion.terminar()
+
+    tipos = [e['evento'] for e in eventos]
+    assert tipos[0] == 'inicio' and tipos[-1] == 'fin'
+    assert 'primer_byte' in tipos
+    fin = eventos[-1]
+    assert fin['resultado'] == 'completado' and fin['bytes'] == 100
+    assert set(fin['fases']) == {'extraccion', 'descarga'}
+    assert all(e['descarga'] == 'd1' and e['trabajo'] == 't1' for e in eventos)
+
+
+def test_fase_con_error_se_cierra_como_fallida():
+    telemetria, eventos = telemetria_con_registro()
+    medicion = telemetria.medicion('d1')
+    try:
+        with medicion.fase('extraccion'):
+            raise ValueError("sin formatos")
+    except ValueError:
+        pass
+    medicion.terminar(error=ValueError("sin formatos"), clasificacion='permanente')
+
+    fase = next(e for e in eventos if e['evento'] == 'fase')
+    assert fase['ok'] is False and fase['error'] == 'ValueError'
+    assert eventos[-1]['resultado'] == 'fallido'
+
+
+def test_un_sumidero_roto_no_interrumpe_a_los_demas():
+    eventos = []
+
+    def roto(evento):
+        raise RuntimeError("disco lleno")
+
+    Telemetria([roto, eventos.append]).emitir('inicio')
+    assert len(eventos) == 1
+
+
+def test_sumidero_jsonl_escribe_una_linea_por_evento(tmp_path):
+    ruta = tmp_path / 'eventos.jsonl'
+    telemetria = Telemetria([SumideroJSONL(str(ruta))])
+    telemetria.emitir('inicio', descarga='d1')
+    telemetria.emitir('fin', descarga='d1', resultado='completado')
+
+    lineas = [json.loads(linea) for linea in ruta.read_text(encoding='utf-8').splitlines()]
+    assert [e['evento'] for e in lineas] == ['inicio', 'fin']
+
+
+def test_buffer_olvida_las_descargas_terminadas():
+    buffer = BufferEventos()
+    telemetria = Telemetria([buffer]).con(trabajo='t1')
+    medicion = telemetria.medicion('d1')
+    medicion.iniciar_descarga()
+
+    assert buffer.en_curso(trabajo='t1')[0]['fase'] == 'descarga'
+    assert buffer.en_curso(trabajo='otro') == []
+    medicion.terminar()
+    assert buffer.en_curso() == []
+
+
+def test_metricas_prometheus_cuentan_descargas_por_resultado():
+    metricas = MetricasPrometheus()
+    telemetria = Telemetria([metricas])
+    telemetria.medicion('d1', extractor='youtube').terminar()
+    telemetria.medicion('d2', extractor='youtube').terminar(error=OSError(), clasificacion='reintentable')
+
+    texto = metricas.texto()
+    assert 'tubegrab_descargas_en_curso 0' in texto
+    assert 'tubegrab_descargas_total{extractor="youtube",resultado="completado"} 1' in texto
+    assert 'tubegrab_descargas_total{extractor="youtube",resultado="fallido"} 1' in texto
+
+
+def test_una_descarga_llega_a_todos_los_sumideros(tmp_path, carpeta, servidor):
+    ruta, metricas = tmp_path / 'eventos.jsonl', MetricasPrometheus()
+    telemetria = Telemetria([SumideroJSONL(str(ruta)), metricas])
+    downloader = DescargadorPrueba(carpeta, telemetria=telemetria, cache=False, cache_info=False)
+    downloader.descargar(servidor.url('/ver/t1', tamaño=300_000))
+
+    eventos = [json.loads(linea) for linea in ruta.read_text(encoding='utf-8').splitlines()]
+    assert eventos[0]['evento'] == 'inicio' and eventos[-1]['evento'] == 'fin'
+    assert {e['fase'] for e in eventos if e['evento'] == 'fase'} >= {'extraccion', 'descarga'}
+    assert eventos[-1]['resultado'] == 'completado' and eventos[-1]['bytes'] == 300_000
+    texto, extractor = metricas.texto(), eventos[-1]['extractor']
+    assert 'tubegrab_descargas_en_curso 0' in texto
+    assert f'tubegrab_descargas_total{{extractor="{extractor}",resultado="completado"}} 1' in texto
+    assert f'tubegrab_bytes_descargados_total{{extractor="{extractor}"}} 300000' in texto
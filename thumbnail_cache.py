@@ -0,0 +1,166 @@
+"""Caché local de miniaturas por ID de video, con variantes ya redimensionadas para la interfaz."""
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from canonical_url import canonicalizar
+
+# Anchos que pinta la interfaz: vista previa y ficha del archivo descargado
+ANCHO_VISTA_PREVIA = 320
+ANCHO_FICHA = 480
+ANCHOS = (ANCHO_VISTA_PREVIA, ANCHO_FICHA)
+
+MAX_BYTES_ORIGEN = 5 * 1024 * 1024
+
+# Decodificar y redimensionar no debe ocupar el hilo de la interfaz ni el de una descarga
+_EJECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix='miniaturas')
+_EN_CURSO = {}
+_LOCK = threading.Lock()
+_FORMATO = None
+
+
+def clave_miniatura(url):
+    """Clave de la miniatura: el ID del video si la URL es de una plataforma conocida, si no la URL."""
+    canonica = canonicalizar(url)
+    identificador = f'{canonica.plataforma}:{canonica.id}' if canonica and canonica.id else url
+    return hashlib.sha256(identificador.encode('utf-8')).hexdigest()[:32]
+
+
+def _formato():
+    """(formato de PIL, extensión): WebP si Pillow lo soporta, si no JPEG."""
+    global _FORMATO
+    if _FORMATO is None:
+        from PIL import features
+
+        _FORMATO = ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+    return _FORMATO
+
+
+class CacheMiniaturas:
+    """Variantes JPEG/WebP de cada miniatura en `.cache/miniaturas/`, con expulsión LRU por tamaño.
+
+    El origen es la miniatura que yt-dlp ya escribió al descargar o, para la vista previa, la URL
+    remota descargada una sola vez. La fecha de acceso de cada variante marca su último uso.
+    """
+
+    def __init__(self, carpeta_destino, max_bytes=50 * 1024 * 1024, anchos=ANCHOS):
+        self.carpeta = os.path.join(carpeta_destino, '.cache', 'miniaturas')
+        self.max_bytes = max_bytes
+        self.anchos = tuple(sorted(anchos, reverse=True))
+
+    def ruta(self, url, ancho):
+        """Ruta de la variante si ya existe (y la marca como usada), o None."""
+        ruta = self._ruta(clave_miniatura(url), ancho)
+        try:
+            os.utime(ruta, None)
+        except OSError:
+            return None
+        return ruta
+
+    def obtener(self, url, ancho, remota=None, espera=5.0):
+        """Ruta local de la variante; la prepara si hace falta. None si no se pudo a tiempo."""
+        ruta = self.ruta(url, ancho)
+        if ruta or not remota:
+            return ruta
+        try:
+            return self.preparar(url, remota=remota).result(timeout=espera).get(ancho)
+        except Exception as e:
+            print(f"No se pudo preparar la miniatura: {str(e)}")
+            return None
+
+    def preparar(self, url, origen=None, remota=None):
+        """Genera en segundo plano las variantes de la miniatura; devuelve un Future con {ancho: ruta}.
+
+        `origen` (una miniatura ya descargada) se lee en el momento: el post-procesado de audio la
+        borra en cuanto la incrusta en el archivo.
+        """
+        clave = clave_miniatura(url)
+        rutas = {ancho: self._ruta(clave, ancho) for ancho in self.anchos}
+        if all(os.path.exists(ruta) for ruta in rutas.values()):
+            futuro = Future()
+            futuro.set_result(rutas)
+            return futuro
+        datos = None
+        if origen:
+            try:
+                with open(origen, 'rb') as f:
+                    datos = f.read(MAX_BYTES_ORIGEN)
+            except OSError:
+                pass
+        if datos is None and not remota:
+            futuro = Future()
+            futuro.set_exception(FileNotFoundError("No hay miniatura de origen"))
+            return futuro
+        with _LOCK:
+            # Varias sesiones pueden pedir a la vez la misma miniatura: se prepara una sola vez
+            futuro = _EN_CURSO.get(clave)
+            nuevo = futuro is None
+            if nuevo:
+                futuro = _EJECUTOR.submit(self._generar, clave, rutas, datos, remota)
+                _EN_CURSO[clave] = futuro
+        if nuevo:
+            # Fuera del lock: si el futuro ya terminó, el callback se ejecuta aquí mismo
+            futuro.add_done_callback(lambda f: self._olvidar(clave, f))
+        return futuro
+
+    @staticmethod
+    def _olvidar(clave, futuro):
+        with _LOCK:
+            if _EN_CURSO.get(clave) is futuro:
+                del _EN_CURSO[clave]
+
+    def _generar(self, clave, rutas, datos, remota):
+        from PIL import Image
+
+        if datos is None:
+            import urllib.request
+
+            with urllib.request.urlopen(remota, timeout=10) as respuesta:
+                datos = respuesta.read(MAX_BYTES_ORIGEN)
+        imagen = Image.open(io.BytesIO(datos))
+        # Con JPEG, decodifica directamente a una escala reducida cercana al ancho mayor
+        imagen.draft('RGB', (self.anchos[0], self.anchos[0]))
+        imagen = imagen.convert('RGB')
+        formato, _ = _formato()
+        os.makedirs(self.carpeta, exist_ok=True)
+        # De la variante más grande a la más pequeña, cada una a partir de la anterior
+        for ancho in self.anchos:
+            if imagen.width > ancho:
+                imagen = imagen.resize((ancho, max(1, round(imagen.height * ancho / imagen.width))),
+                                       Image.Resampling.LANCZOS)
+            temporal = f"{rutas[ancho]}.{os.getpid()}.{threading.get_ident()}.tmp"
+            imagen.save(temporal, formato, quality=82)
+            os.replace(temporal, rutas[ancho])
+        self._podar(proteger=rutas.values())
+        return rutas
+
+    def _podar(self, proteger=()):
+        """Borra las variantes menos usadas hasta quedar por debajo de max_bytes."""
+        try:
+            entradas = [e for e in os.scandir(self.carpeta) if e.is_file() and not e.name.endswith('.tmp')]
+        except OSError:
+            return
+        variantes = []
+        for entrada in entradas:
+            try:
+                estado = entrada.stat()
+            except OSError:
+                continue
+            variantes.append((estado.st_atime, estado.st_size, entrada.path))
+        total = sum(tamaño for _, tamaño, _ in variantes)
+        protegidas = set(proteger)
+        for _, tamaño, ruta in sorted(variantes):
+            if total <= self.max_bytes:
+                break
+            if ruta in protegidas:
+                continue
+            try:
+                os.remove(ruta)
+            except OSError:
+                continue
+            total -= tamaño
+
+    def _ruta(self, clave, ancho):
+        return os.path.join(self.carpeta, f"{clave}_{ancho}.{_formato()[1]}")
@@ -1,39 +1,21 @@
-import yt_dlp
 import os
-import re
-import time
-from tqdm import tqdm
+from canonical_url import canonicalizar, recorte_temporal, url_canonica, YOUTUBE
+from retry_policy import PoliticaReintentos, clasificar_error, es_error_de_formato
+from session_pool import PoolSesiones
+from telemetry import BarraConsola, EXTRACCION, TELEMETRIA
+
+# La instancia de YoutubeDL (cookies y conexiones abiertas) se conserva entre reintentos y descargas
+POOL = PoolSesiones(max_por_perfil=1)
 
 def validar_url_youtube(url):
     """Valida si la URL es de YouTube"""
-    patron_youtube = r'(https?://)?(www\.)?(youtube\.com|youtu\.be)/.+'
-    return bool(re.match(patron_youtube, url))
+    canonica = canonicalizar(url)
+    return canonica is not None and canonica.plataforma == YOUTUBE
 
 def normalizar_url(url):
-    """Normaliza la URL de YouTube"""
-    if 'youtu.be' in url:
-        video_id = url.split('/')[-1]
-        return f'https://www.youtube.com/watch?v={video_id}'
-    return url
-
-class ProgressHook:
-    def __init__(self):
-        self.pbar = None
-
-    def __call__(self, d):
-        if d['status'] == 'downloading':
-            if self.pbar is None:
-                total = d.get('total_bytes', 0) or d.get('total_bytes_estimate', 0)
-                self.pbar = tqdm(total=total, unit='B', unit_scale=True, desc="Descargando")
-            
-            downloaded = d.get('downloaded_bytes', 0)
-            self.pbar.update(downloaded - self.pbar.n)
-            
-        elif d['status'] == 'finished':
-            if self.pbar:
-                self.pbar.close()
-                self.pbar = None
-            print("\nDescarga completada, procesando video...")
+    """Normaliza la URL de YouTube (youtu.be, shorts, embed, m., music., parámetros de seguimiento...)"""
+    canonica = canonicalizar(url)
+    return (canonica and url_canonica(canonica)) or url
 
 def formatear_tamaño(tamaño_bytes):
     """Formatea el tamaño en bytes a una cadena legible"""
@@ -45,7 +27,19 @@ def formatear_tamaño(tamaño_bytes):
         tamaño_bytes /= 1024
     return f"{tamaño_bytes:.1f}TB"
 
-def descargar_video(url, carpeta_destino="descargas", intentos_maximos=3):
+def pedir_fragmento(url):
+    """Pregunta qué fragmento descargar; devuelve (inicio, fin) o (None, None) para el video completo"""
+    canonica = canonicalizar(url)
+    sugerencia = f" (la URL empieza en {canonica.inicio} s)" if canonica and canonica.inicio else ""
+    respuesta = input(f"Fragmento a descargar, p. ej. 1:30-2:00 o 90- (Enter para el video completo){sugerencia}: ").strip()
+    if not respuesta:
+        return None, None
+    inicio, _, fin = respuesta.partition('-')
+    return inicio.strip() or None, fin.strip() or None
+
+def descargar_video(url, carpeta_destino="descargas", intentos_maximos=3, inicio=None, fin=None, corte_preciso=False):
+    import yt_dlp  # se importa con la primera descarga, no al mostrar el menú
+
     try:
         # Normalizar la URL
         url = normalizar_url(url)
@@ -60,73 +54,119 @@ def descargar_video(url, carpeta_destino="descargas", intentos_maximos=3):
             os.makedirs(carpeta_destino)
 
         # Configurar opciones de yt-dlp
+        medicion = TELEMETRIA.medicion(canonicalizar(url).id or url, url=url, extractor='Youtube')
         ydl_opts = {
             'format': 'best[ext=mp4]/best',  # Simplificado para mejor compatibilidad
             'outtmpl': os.path.join(carpeta_destino, '%(title)s.%(ext)s'),
-            'progress_hooks': [ProgressHook()],
             'quiet': True,
             'no_warnings': True,
             'extract_flat': False,
+            'concurrent_fragment_downloads': 4,  # Fragmentos DASH/HLS en paralelo
+            'http_chunk_size': 10 * 1024 * 1024,  # Descarga por rangos de 10 MB
         }
+        recorte = recorte_temporal(inicio, fin, corte_preciso)
+        if recorte:
+            # Solo se descargan los fragmentos o bytes del intervalo pedido
+            ydl_opts['download_ranges'] = yt_dlp.utils.download_range_func(None, [recorte.rango])
+            ydl_opts['force_keyframes_at_cuts'] = recorte.preciso
+            ydl_opts['outtmpl'] = os.path.join(carpeta_destino, f'%(title)s [{recorte.etiqueta}].%(ext)s')
 
-        for intento in range(intentos_maximos):
-            try:
-                print(f"\nIntento {intento + 1} de {intentos_maximos}")
-                print("Conectando con YouTube...")
+        def descargar(ydl_opts):
+            print("Conectando con YouTube...")
+            with POOL.sesion(PoolSesiones.perfil(ydl_opts), yt_dlp.YoutubeDL, ydl_opts,
+                             progreso=[medicion.hook_progreso],
+                             postprocesado=[medicion.hook_postprocesado]) as ydl:
+                # Obtener información del video
+                with medicion.fase(EXTRACCION):
+                    info = ydl.extract_info(url, download=False, process=False)
+                print(f"\nTítulo: {info['title']}")
+                print(f"Duración: {info['duration']} segundos")
+                print(f"Vistas: {info.get('view_count', 'N/A'):,}")
                 
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    # Obtener información del video
-                    info = ydl.extract_info(url, download=False)
-                    print(f"\nTítulo: {info['title']}")
-                    print(f"Duración: {info['duration']} segundos")
-                    print(f"Vistas: {info.get('view_count', 'N/A'):,}")
-                    
-                    # Mostrar formatos disponibles
-                    print("\nFormatos disponibles:")
-                    formatos_mp4 = [f for f in info['formats'] if f.get('ext') == 'mp4' and f.get('format_note')]
-                    for f in formatos_mp4:
-                        tamaño = f.get('filesize', 0) or f.get('filesize_approx', 0)
-                        print(f"• {f.get('format_note', 'N/A')} - {formatear_tamaño(tamaño)}")
-                    
-                    print("\nIniciando descarga...")
-                    # Descargar el video
-                    ydl.download([url])
-                    
-                    print(f"\n¡Descarga completada! El video se ha guardado en la carpeta '{carpeta_destino}'")
-                    return  # Si llegamos aquí, la descarga fue exitosa
+                # Mostrar formatos disponibles
+                print("\nFormatos disponibles:")
+                formatos_mp4 = [f for f in info['formats'] if f.get('ext') == 'mp4' and f.get('format_note')]
+                for f in formatos_mp4:
+                    tamaño = f.get('filesize', 0) or f.get('filesize_approx', 0)
+                    print(f"• {f.get('format_note', 'N/A')} - {formatear_tamaño(tamaño)}")
                 
+                print("\nIniciando descarga...")
+                # Descargar el video a partir de la información ya extraída
+                medicion.iniciar_descarga()
+                ydl.process_ie_result(info, download=True)
+
+        def intento():
+            try:
+                descargar(ydl_opts)
             except Exception as e:
-                error_msg = str(e)
-                print(f"\nError en intento {intento + 1}: {error_msg}")
-                
-                if "Requested format is not available" in error_msg:
-                    print("Intentando con formato alternativo...")
-                    ydl_opts['format'] = 'best'  # Intentar con el mejor formato disponible
-                    continue
-                
-                if intento < intentos_maximos - 1:
-                    print("Reintentando en 3 segundos...")
-                    time.sleep(3)
-                else:
-                    print("\nSe agotaron los intentos de descarga.")
-                    print("\nSugerencias:")
-                    print("1. Verifica tu conexión a internet")
-                    print("2. Asegúrate de que el video esté disponible en tu región")
-                    print("3. Intenta con otro video")
-                    print("4. Verifica que el video no esté restringido por edad")
-                    print("5. Intenta usar una VPN si el video está restringido en tu región")
-                    print("6. Verifica que el video no sea privado o esté eliminado")
+                if not es_error_de_formato(e) or ydl_opts['format'] == 'best':
+                    raise
+                print(f"\nError con el formato predeterminado: {str(e)}")
+                print("Intentando con formato alternativo...")
+                ydl_opts['format'] = 'best'  # Intentar con el mejor formato disponible
+                descargar(ydl_opts)
+
+        politica = PoliticaReintentos()
+        try:
+            politica.ejecutar(url, intento, intentos_maximos, medicion)
+        except Exception as e:
+            medicion.terminar(error=e, clasificacion=clasificar_error(e))
+            print("\nSe agotaron los intentos de descarga." if politica.reintentable(e) else "\nNo se pudo descargar el video.")
+            print("\nSugerencias:")
+            print("1. Verifica tu conexión a internet")
+            print("2. Asegúrate de que el video esté disponible en tu región")
+            print("3. Intenta con otro video")
+            print("4. Verifica que el video no esté restringido por edad")
+            print("5. Intenta usar una VPN si el video está restringido en tu región")
+            print("6. Verifica que el video no sea privado o esté eliminado")
+            return
+        medicion.terminar()
+        print(f"\n¡Descarga completada! El video se ha guardado en la carpeta '{carpeta_destino}'")
         
     except Exception as e:
         print(f"\nError inesperado: {str(e)}")
         print("Por favor, intenta nuevamente o usa una URL diferente")
 
+def es_lote(url):
+    """Indica si la entrada es una playlist, un canal o varias URLs"""
+    if len(url.split()) > 1:
+        return True
+    canonica = canonicalizar(url)
+    return bool(canonica and canonica.playlist_id)
+
+def descargar_lote(urls, carpeta_destino="descargas"):
+    """Descarga una playlist, un canal o varias URLs mostrando cada resultado al terminar"""
+    from media_downloader import YouTubeVideoDownloader
+
+    downloader = YouTubeVideoDownloader(carpeta_destino)
+    try:
+        elementos = downloader.expandir_lote(urls)
+    except Exception as e:
+        print(f"\nError al leer la playlist: {str(e)}")
+        return
+
+    print(f"\nSe encontraron {len(elementos)} videos")
+    resumen = {'completado': 0, 'omitido': 0, 'fallido': 0}
+    for numero, resultado in enumerate(downloader.descargar_lote(elementos), 1):
+        resumen[resultado['estado']] += 1
+        titulo = resultado.get('titulo') or resultado['url']
+        if resultado['estado'] == 'completado':
+            print(f"[{numero}/{len(elementos)}] ✓ {titulo}")
+        elif resultado['estado'] == 'omitido':
+            print(f"[{numero}/{len(elementos)}] = {titulo} (ya descargado)")
+        else:
+            print(f"[{numero}/{len(elementos)}] ✗ {titulo}: {resultado['error']}")
+
+    print(f"\nLote terminado: {resumen['completado']} descargados, "
+          f"{resumen['omitido']} ya descargados, {resumen['fallido']} con error")
+
 def main():
+    TELEMETRIA.agregar(BarraConsola())
     print("=== Convertidor de YouTube a MP4 ===")
     print("Nota: Si encuentras errores, asegúrate de que la URL sea correcta y que tengas una buena conexión a internet")
     
     while True:
-        url = input("\nIngresa la URL del video de YouTube (o 'salir' para terminar): ").strip()
+        url = input("\nIngresa la URL del video, playlist o canal de YouTube (o 'salir' para terminar): ").strip()
         
         if url.lower() == 'salir':
             print("\n¡Gracias por usar el convertidor!")
@@ -136,7 +176,11 @@ def main():
             print("Por favor, ingresa una URL válida.")
             continue
             
-        descargar_video(url)
+        if es_lote(url):
+            descargar_lote(url)
+        else:
+            inicio, fin = pedir_fragmento(url)
+            descargar_video(url, inicio=inicio, fin=fin)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file